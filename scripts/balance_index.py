@@ -0,0 +1,208 @@
+import argparse
+import calendar
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ledger import load_ledger, parse_date, to_cents
+
+AUDIT_PERIODS = {
+    'January-June': (1, 6),
+    'July-December': (7, 12),
+}
+
+class _Fenwick:
+    """Prefix-sum tree over a fixed number of integer slots"""
+
+    def __init__(self, values: List[int]):
+        # Linear-time construction from point values
+        self.size = len(values)
+        self.tree = [0] + list(values)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+
+    def add(self, slot: int, delta: int):
+        i = slot + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def prefix(self, slot: int) -> int:
+        """Sum of slots 0..slot inclusive"""
+        total = 0
+        i = min(slot + 1, self.size)
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+class BalanceIndex:
+    """
+    Running balance keyed by date.
+
+    Amounts are held in integer cents in two prefix-sum trees (money in and
+    money out) with one slot per day from `start`. Inserting, updating or
+    removing an entry and asking for the balance as of any date are O(log n),
+    so a back-dated entry does not mean re-summing everything after it.
+    """
+
+    def __init__(self, opening_cents: int = 0, start: Optional[date] = None, days: int = 366):
+        self.opening_cents = opening_cents
+        self._start = (start or date.today()).toordinal()
+        self._entries: Dict[Any, Tuple[int, int]] = {}
+        self._credits_by_day = [0] * days
+        self._debits_by_day = [0] * days
+        self._credits = _Fenwick(self._credits_by_day)
+        self._debits = _Fenwick(self._debits_by_day)
+
+    @classmethod
+    def from_ledger(cls, rows: Iterable[Dict[str, Any]], opening_cents: int = 0) -> 'BalanceIndex':
+        """Builds an index from ledger rows (see ledger.load_ledger) in linear time"""
+        rows = list(rows)
+        if not rows:
+            return cls(opening_cents)
+        first = min(r['date'] for r in rows)
+        last = max(r['date'] for r in rows)
+        start = date(first.year, 1, 1).toordinal()
+        index = cls(opening_cents)
+        for r in rows:
+            index._entries[r['row']] = (r['date'].toordinal(), r['cents'])
+        index._rebuild(start, last.toordinal() - start + 1)
+        return index
+
+    def _rebuild(self, start: int, days: int):
+        credits = [0] * days
+        debits = [0] * days
+        for day, cents in self._entries.values():
+            if cents >= 0:
+                credits[day - start] += cents
+            else:
+                debits[day - start] -= cents
+        self._start = start
+        self._credits_by_day, self._debits_by_day = credits, debits
+        self._credits = _Fenwick(credits)
+        self._debits = _Fenwick(debits)
+
+    def _slot(self, day: int) -> int:
+        """Returns the slot for a day, growing the index (amortized) when it falls outside"""
+        size = len(self._credits_by_day)
+        if day < self._start:
+            start = min(day, self._start - size)
+            self._rebuild(start, size + (self._start - start))
+        elif day >= self._start + size:
+            self._rebuild(self._start, max(size * 2, day - self._start + 1))
+        return day - self._start
+
+    def _apply(self, day: int, cents: int, sign: int):
+        slot = self._slot(day)
+        if cents >= 0:
+            self._credits_by_day[slot] += sign * cents
+            self._credits.add(slot, sign * cents)
+        else:
+            self._debits_by_day[slot] -= sign * cents
+            self._debits.add(slot, -sign * cents)
+
+    def add(self, entry_id, entry_date: date, cents: int):
+        """Adds an entry; a positive amount is income, a negative amount an expense"""
+        if entry_id in self._entries:
+            raise ValueError(f"Entry already indexed: {entry_id}")
+        day = entry_date.toordinal()
+        self._apply(day, cents, 1)
+        self._entries[entry_id] = (day, cents)
+
+    def remove(self, entry_id):
+        day, cents = self._entries.pop(entry_id)
+        self._apply(day, cents, -1)
+
+    def update(self, entry_id, entry_date: Optional[date] = None, cents: Optional[int] = None):
+        """Moves an entry to a new date and/or amount"""
+        day, old_cents = self._entries[entry_id]
+        new_date = entry_date or date.fromordinal(day)
+        self.remove(entry_id)
+        self.add(entry_id, new_date, old_cents if cents is None else cents)
+
+    def _prefix(self, tree: _Fenwick, day: int) -> int:
+        if day < self._start:
+            return 0
+        return tree.prefix(day - self._start)
+
+    def totals_between(self, start: date, end: date) -> Tuple[int, int]:
+        """Income and expense cents (both positive) for start..end inclusive"""
+        before, last = start.toordinal() - 1, end.toordinal()
+        income = self._prefix(self._credits, last) - self._prefix(self._credits, before)
+        expenses = self._prefix(self._debits, last) - self._prefix(self._debits, before)
+        return income, expenses
+
+    def balance_as_of(self, as_of: date) -> int:
+        """Balance in cents at the end of `as_of`"""
+        day = as_of.toordinal()
+        return self.opening_cents + self._prefix(self._credits, day) - self._prefix(self._debits, day)
+
+def monthly_balance_sheet(index: BalanceIndex, year: int) -> List[Dict[str, int]]:
+    """Opening balance, income, expenses and closing balance for each month of a year"""
+    months = []
+    for month in range(1, 13):
+        start = date(year, month, 1)
+        end = date(year, month, calendar.monthrange(year, month)[1])
+        income, expenses = index.totals_between(start, end)
+        months.append({
+            'month': month,
+            'opening': index.balance_as_of(date.fromordinal(start.toordinal() - 1)),
+            'income': income,
+            'expenses': expenses,
+            'closing': index.balance_as_of(end),
+        })
+    return months
+
+def audit_cash_on_hand(index: BalanceIndex, year: int, period: str) -> Dict[str, int]:
+    """Cash figures for a semi-annual audit period (January-June or July-December)"""
+    if period not in AUDIT_PERIODS:
+        raise ValueError('Invalid period. Must be January-June or July-December')
+    first_month, last_month = AUDIT_PERIODS[period]
+    start = date(year, first_month, 1)
+    end = date(year, last_month, calendar.monthrange(year, last_month)[1])
+    income, expenses = index.totals_between(start, end)
+    return {
+        'cash_on_hand_start': index.balance_as_of(date.fromordinal(start.toordinal() - 1)),
+        'income': income,
+        'expenses': expenses,
+        'cash_on_hand_end': index.balance_as_of(end),
+    }
+
+def _dollars(cents: int) -> str:
+    return f"{cents / 100:,.2f}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Running balance, balance sheet and audit cash figures for the ledger')
+    parser.add_argument('--ledger', default='2025 Council 15857 Finances - Transactions.csv',
+                        help='Sheets CSV export, financial_entries.json or ledger JSON Lines')
+    parser.add_argument('--opening', default='0', help='Opening balance before the first ledger entry')
+    parser.add_argument('--year', type=int, help='Year for the balance sheet (default: latest ledger year)')
+    parser.add_argument('--as_of', help='Print the balance as of this date (MM/DD/YYYY)')
+    args = parser.parse_args(argv)
+
+    rows = load_ledger(args.ledger)
+    index = BalanceIndex.from_ledger(rows, to_cents(args.opening))
+    year = args.year or max((r['date'].year for r in rows), default=date.today().year)
+    print(f"Indexed {len(rows)} ledger entries")
+
+    print(f"\nBalance Sheet {year}:")
+    print("=" * 50)
+    print(f"{'Month':<10}{'Opening':>12}{'Income':>12}{'Expenses':>12}{'Closing':>12}")
+    for m in monthly_balance_sheet(index, year):
+        print(f"{calendar.month_abbr[m['month']]:<10}{_dollars(m['opening']):>12}{_dollars(m['income']):>12}"
+              f"{_dollars(m['expenses']):>12}{_dollars(m['closing']):>12}")
+
+    for period in AUDIT_PERIODS:
+        figures = audit_cash_on_hand(index, year, period)
+        print(f"\nAudit {period} {year}:")
+        for key, cents in figures.items():
+            print(f"  {key}: {_dollars(cents)}")
+
+    if args.as_of:
+        as_of = parse_date(args.as_of).date()
+        print(f"\nBalance as of {as_of}: {_dollars(index.balance_as_of(as_of))}")
+
+if __name__ == '__main__':
+    main()
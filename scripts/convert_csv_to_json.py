@@ -1,48 +1,226 @@
 import csv
+import hashlib
+import io
 import json
 import os
+from collections import Counter
+from typing import Any, Dict, List, Optional
 
-# Convert CSV to JSON for Firestore import
-csv_file = "2025 Council 15857 Finances - Transactions.csv"
-json_file = "financial_entries.json"
+from validation import DeadLetterFile, ValidationStage, csv_row_validator
 
-with open(csv_file, "r") as f:
-    reader = csv.reader(f)
-    # Read header row and remove leading empty field
-    header_row = next(reader)
-    header = [h.strip() for h in header_row[1:]]
-    print("Found header:", header)
+STATE_VERSION = 2
+# Row fingerprints are stored back to back in a binary side file
+FINGERPRINT_SIZE = 8
 
-    row_count = 0
-    entries = []
+def read_sheet_rows(reader, header, start: int = 0):
+    # Yields (row number, header -> value dict) for each non-empty data row
+    row_count = start
     for row in reader:
         row_count += 1
         # Skip empty rows
         if not row or len(row) < 2:
             continue
         # Remove leading empty field
-        row = row[1:]
-        if len(row) < len(header):
-            print(f"Skipping row {row_count}: Not enough fields")
-            continue
-        data = dict(zip(header, row))
-        # Skip rows missing required fields
-        if not all(data.get(field) for field in ['Category', 'Date', 'Amount']):
-            print(f"Skipping row {row_count}: Missing required fields")
-            continue
+        yield row_count, dict(zip(header, row[1:]))
+
+def clean_entries(rows):
+    for _, data in rows:
         # Clean up the data
-        if 'Amount' in data:
-            data['Amount'] = data['Amount'].replace('$', '').replace(',', '')
-        entries.append(data)
+        data['Amount'] = data['Amount'].replace('$', '').replace(',', '')
+        yield data
+
+def row_fingerprint(row: List[str]) -> bytes:
+    return hashlib.blake2b('\x1f'.join(row).encode('utf-8'), digest_size=FINGERPRINT_SIZE).digest()
+
+def state_paths(json_file: str):
+    base = os.path.splitext(json_file)[0]
+    return f"{base}.convert_state.json", f"{base}.convert_rows"
+
+def file_digest(path: str) -> Dict[str, Any]:
+    """Size and SHA-256 of a file, saved with the state to tell whether the output was rewritten since"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return {'size': os.path.getsize(path), 'sha256': digest.hexdigest()}
+
+def clear_state(json_file: str):
+    """Removes the incremental state of json_file, so the next incremental run reconverts in full"""
+    for path in state_paths(json_file):
+        if os.path.exists(path):
+            os.remove(path)
+
+def convert_csv_to_json(csv_file: str, json_file: str, dead_letter_file: str = None,
+                        incremental: bool = False, delta_file: str = None):
+    # Convert CSV to JSON for Firestore import
+    # Rejected rows go to <json_file>_rejected.jsonl unless another path is given
+    # With incremental, only rows appended since the last run are parsed (see convert_incremental)
+    dead_letter_file = dead_letter_file or f"{os.path.splitext(json_file)[0]}_rejected.jsonl"
+    if incremental:
+        return convert_incremental(csv_file, json_file, dead_letter_file, delta_file)
+    with open(csv_file, "rb") as f:
+        data = f.read()
+    entries, validate, _, _ = _convert_full(csv_file, data, json_file, dead_letter_file)
+    # The output no longer matches what an earlier incremental run recorded
+    clear_state(json_file)
+
+    print("\nConversion complete:")
+    print(f"Total rows processed: {validate.accepted + validate.rejected}")
+    print(f"Total entries converted: {len(entries)}")
+    print(f"Output written to: {json_file}")
+    validate.print_summary()
+
+    if entries:
+        print("\nExample entry:")
+        print(json.dumps(entries[0], indent=2))
+
+    return entries
+
+def _convert_full(csv_file: str, data: bytes, json_file: str, dead_letter_file: str, save_state: bool = False):
+    # Parses the whole export and writes the JSON, saving the incremental state if asked
+    rows = list(csv.reader(io.StringIO(data.decode('utf-8'), newline='')))
+    # Read header row and remove leading empty field
+    header = [h.strip() for h in rows[0][1:]] if rows else []
+    print("Found header:", header)
+    with DeadLetterFile(dead_letter_file, source=csv_file) as dead_letter:
+        validate = ValidationStage(csv_row_validator(header), dead_letter)
+        accepted = list(validate(read_sheet_rows(rows[1:], header)))
+    entries = list(clean_entries(accepted))
+
+    with open(json_file, "w") as f:
+        json.dump(entries, f, indent=2)
+    if save_state:
+        _save_state(json_file, csv_file, data, header, rows[1:], append=False)
+    return entries, validate, rows[1:], [row for row, _ in accepted]
+
+def _save_state(json_file: str, csv_file: str, data: bytes, header: List[str], rows: List[List[str]],
+                append: bool, previous: Optional[Dict[str, Any]] = None):
+    state_path, rows_path = state_paths(json_file)
+    with open(rows_path, 'ab' if append else 'wb') as f:
+        f.write(b''.join(row_fingerprint(row) for row in rows))
+    state = {
+        'version': STATE_VERSION,
+        'source': os.path.abspath(csv_file),
+        'header': header,
+        'offset': len(data),
+        'prefix_sha256': hashlib.sha256(data).hexdigest(),
+        'ends_with_newline': data.endswith(b'\n') or data.endswith(b'\r'),
+        'rows': (previous['rows'] if append else 0) + len(rows),
+        'output': file_digest(json_file),
+    }
+    with open(state_path, 'w') as f:
+        json.dump(state, f, indent=2)
+
+def _load_state(json_file: str, csv_file: str) -> Optional[Dict[str, Any]]:
+    state_path, rows_path = state_paths(json_file)
+    if not (os.path.exists(state_path) and os.path.exists(rows_path) and os.path.exists(json_file)):
+        return None
+    with open(state_path, 'r') as f:
+        state = json.load(f)
+    if state.get('version') != STATE_VERSION or state.get('source') != os.path.abspath(csv_file):
+        return None
+    return state
+
+def append_json_entries(json_file: str, entries: List[Dict[str, Any]]) -> bool:
+    """
+    Appends entries to a JSON array written by json.dump(indent=2) without
+    rewriting it. Returns False when the file does not end like one.
+    """
+    with open(json_file, 'r+b') as f:
+        f.seek(0, os.SEEK_END)
+        size = f.tell()
+        f.seek(max(0, size - 2))
+        tail = f.read()
+        if tail == b'[]':
+            f.seek(size - 2)
+            f.truncate()
+            f.write(json.dumps(entries, indent=2).encode())
+            return True
+        if tail != b'\n]':
+            return False
+        f.seek(size - 2)
+        f.truncate()
+        body = ',\n'.join('\n'.join('  ' + line for line in json.dumps(entry, indent=2).split('\n'))
+                          for entry in entries)
+        f.write((',\n' + body + '\n]').encode())
+    return True
+
+def convert_incremental(csv_file: str, json_file: str, dead_letter_file: str,
+                        delta_file: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Converts only what changed since the last run of the same CSV into json_file.
+
+    The state saved next to json_file holds the byte offset already converted
+    and a SHA-256 of those bytes. When the export still starts with exactly
+    those bytes, only the appended rows are parsed, validated and appended to
+    the JSON array in place. When an earlier row was edited, inserted or
+    deleted, the whole export is reconverted and diffed against the saved row
+    fingerprints. Returns the new (or changed) entries, which are also written
+    to delta_file when given.
+    """
+    with open(csv_file, 'rb') as f:
+        data = f.read()
+    state = _load_state(json_file, csv_file)
+
+    reason = None
+    if state is None:
+        reason = 'no saved state'
+    elif file_digest(json_file) != state['output']:
+        # Rewritten by a plain or parallel conversion (or by hand) since the state was saved
+        reason = 'output was modified'
+    elif len(data) < state['offset'] or hashlib.sha256(data[:state['offset']]).hexdigest() != state['prefix_sha256']:
+        reason = 'earlier rows changed'
+    new_data = data[state['offset']:] if reason is None else b''
+    if reason is None and new_data and not state['ends_with_newline']:
+        # The last converted row had no line break; new rows must start with one
+        if new_data.startswith(b'\r\n'):
+            new_data = new_data[2:]
+        elif new_data[:1] in (b'\n', b'\r'):
+            new_data = new_data[1:]
+        else:
+            reason = 'last row was extended'
+
+    if reason is None:
+        new_rows = list(csv.reader(io.StringIO(new_data.decode('utf-8'), newline='')))
+        with DeadLetterFile(dead_letter_file, source=csv_file, mode='a') as dead_letter:
+            validate = ValidationStage(csv_row_validator(state['header']), dead_letter)
+            entries = list(clean_entries(validate(read_sheet_rows(new_rows, state['header'], state['rows']))))
+        if entries and not append_json_entries(json_file, entries):
+            reason = 'output was modified'
+        else:
+            _save_state(json_file, csv_file, data, state['header'], new_rows, append=True, previous=state)
+            print(f"Incremental conversion: {len(data) - state['offset']} new bytes, {len(new_rows)} new rows, "
+                  f"{len(entries)} entries appended to {json_file}")
+            validate.print_summary()
 
-with open(json_file, "w") as f:
-    json.dump(entries, f, indent=2)
+    if reason is not None:
+        print(f"Full conversion ({reason})")
+        previous = Counter()
+        if state is not None:
+            with open(state_paths(json_file)[1], 'rb') as f:
+                fingerprints = f.read()
+            previous.update(fingerprints[i:i + FINGERPRINT_SIZE]
+                            for i in range(0, len(fingerprints), FINGERPRINT_SIZE))
+        all_entries, validate, rows, entry_rows = _convert_full(csv_file, data, json_file, dead_letter_file,
+                                                                save_state=True)
+        validate.print_summary()
+        # Rows whose content did not exist in the last run; unmatched old rows were edited or removed
+        changed = set()
+        for number, row in enumerate(rows, 1):
+            key = row_fingerprint(row)
+            if previous[key] > 0:
+                previous[key] -= 1
+            else:
+                changed.add(number)
+        entries = [entry for entry, number in zip(all_entries, entry_rows) if number in changed]
+        removed = sum(count for count in previous.values() if count > 0)
+        print(f"Diff against previous run: {len(entries)} new or changed, {removed} removed or changed rows")
 
-print("\nConversion complete:")
-print(f"Total rows processed: {row_count}")
-print(f"Total entries converted: {len(entries)}")
-print(f"Output written to: {json_file}")
+    if delta_file:
+        with open(delta_file, 'w') as f:
+            json.dump(entries, f, indent=2)
+        print(f"New entries written to: {delta_file}")
+    return entries
 
-if entries:
-    print("\nExample entry:")
-    print(json.dumps(entries[0], indent=2)) 
\ No newline at end of file
+if __name__ == '__main__':
+    convert_csv_to_json("2025 Council 15857 Finances - Transactions.csv", "financial_entries.json")
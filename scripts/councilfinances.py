@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Single entry point for the council finance scripts.
+
+Each subcommand imports its module (and that module's heavy dependencies such
+as firebase_admin, pdfplumber or PIL) only when it runs, so lightweight commands
+start in roughly bare interpreter time. Commands that talk to Firestore share
+one Firebase app through firebase_app.get_db().
+"""
+import argparse
+import json
+import sys
+
+# Subcommands that forward their remaining arguments to a script's own main()
+PASSTHROUGH_COMMANDS = {
+    'export': ('export_financial_entries', 'Export an organization ledger from Firestore'),
+    'mirror': ('local_mirror', 'Sync the local SQLite mirror'),
+    'reconcile': ('reconcile_bank', 'Reconcile a bank statement against the ledger'),
+    'balance': ('balance_index', 'Running balance, balance sheet and audit cash figures'),
+    'match': ('program_matcher', 'Map Sheets categories to programs'),
+    'import-councils': ('import_councils', 'Import many organizations from a manifest'),
+    'sync-programs': ('program_catalog', 'Sync the programs collection with the local catalog files'),
+    'serve': ('report_service', 'Serve the report fill endpoints locally'),
+    'form1728': ('form1728_rollup', 'Roll the ledger up into Form 1728 survey lines'),
+    'word-cache': ('word_cache', 'Pre-extract or clear cached PDF page words'),
+    'duplicates': ('duplicate_detector', 'Find duplicate and near-duplicate ledger entries'),
+    'search': ('search_index', 'Full-text search over the mirrored ledger'),
+    'verify': ('ledger_merkle', 'Diff the local ledger against Firestore with per-year hash trees'),
+    'statements': ('statement_extractor', 'Extract transactions from bank statement PDFs'),
+    'identify': ('pdf_field_identifier', 'Catalog form fields by filling each with its own name'),
+    'bench-import': ('fake_firestore', 'Benchmark an entries import against an in-memory Firestore'),
+    'previews': ('form_preview', 'Render filled form previews and diff them against their templates'),
+    'query': ('ledger_query', 'Query the Firestore ledger with filters pushed down to Firestore'),
+}
+
+def cmd_convert(args):
+    if args.workers > 1:
+        from parallel_convert import convert_csv_parallel
+        convert_csv_parallel(args.csv_file, args.output, args.dead_letter, args.workers)
+        return
+    from convert_csv_to_json import convert_csv_to_json
+    convert_csv_to_json(args.csv_file, args.output, args.dead_letter, args.incremental, args.delta)
+
+def cmd_import(args):
+    if args.what == 'entries':
+        from import_financial_entries import import_financial_entries
+        import_financial_entries(args.organization_id, args.input or 'financial_entries.json', args.mirror,
+                                 dead_letter_file=args.dead_letter, duplicates=args.duplicates,
+                                 fuzzy_programs=args.fuzzy_programs)
+    elif args.what == 'programs':
+        from import_custom_programs import import_custom_programs
+        import_custom_programs(args.organization_id, args.input or 'assets/data/custom_programs.json')
+    else:
+        from create_missing_programs import create_missing_programs
+        create_missing_programs(args.organization_id)
+
+def cmd_analyze(args):
+    from pdf_analyzer import analyze_pdf_form, print_analysis, save_analysis
+    analysis = analyze_pdf_form(args.pdf)
+    if not analysis:
+        print("No analysis generated.")
+        return
+    print_analysis(analysis)
+    output = args.output or f"{args.pdf}_analysis.json"
+    save_analysis(analysis, output)
+    print(f"\nAnalysis saved to: {output}")
+
+def cmd_map(args):
+    from pdf_field_mapper import map_pdf_fields
+    map_pdf_fields(args.pdf, args.output or args.pdf.replace('.pdf', '_mapped.pdf'))
+
+def cmd_fill(args):
+    from pdf_form_filler import create_sample_data, fill_pdf_form
+    if args.data:
+        with open(args.data, 'r') as f:
+            data = json.load(f)
+    else:
+        data = create_sample_data()
+    fill_pdf_form(args.pdf, args.output or args.pdf.replace('.pdf', '_filled.pdf'), data, args.incremental)
+
+def cmd_read(args):
+    from pdf_reader import read_pdf_form
+    read_pdf_form(args.pdf, args.mapping)
+
+def cmd_icons(args):
+    import os
+    from generate_icons import generate_android_icons, generate_ios_icons
+    if not os.path.exists(args.input):
+        print(f"Error: {args.input} not found!")
+        return
+    print("Generating Android icons...")
+    generate_android_icons(args.input)
+    print("Generating iOS icons...")
+    generate_ios_icons(args.input)
+    print("Icon generation complete!")
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='councilfinances', description='Council finance tools')
+    parser.add_argument('--credentials', help='Firebase service account JSON (default: repository root file)')
+    parser.add_argument('--fake_firestore', metavar='OPTIONS',
+                        help='Use an in-memory Firestore: "1" or options like "latency=0.02,throttle=0.05"')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    convert = commands.add_parser('convert', help='Convert the Sheets CSV export to JSON')
+    convert.add_argument('csv_file', nargs='?', default='2025 Council 15857 Finances - Transactions.csv')
+    convert.add_argument('--output', default='financial_entries.json')
+    convert.add_argument('--dead_letter', help='Rejected rows JSON Lines (default: <output>_rejected.jsonl)')
+    convert.add_argument('--incremental', action='store_true',
+                         help='Only convert rows appended since the last incremental run')
+    convert.add_argument('--delta', help='Also write just the new or changed entries to this JSON file')
+    convert.add_argument('--workers', type=int, default=1,
+                         help='Parse large exports in parallel chunks on this many processes (not with --incremental)')
+    convert.set_defaults(func=cmd_convert)
+
+    imp = commands.add_parser('import', help='Import data into Firestore')
+    imp.add_argument('what', choices=['entries', 'programs', 'missing-programs'])
+    imp.add_argument('--organization_id', default='C015857')
+    imp.add_argument('--input', help='Input JSON file')
+    imp.add_argument('--mirror', help='Resolve programs from this local SQLite mirror (entries only)')
+    imp.add_argument('--dead_letter', help='Rejected entries JSON Lines (entries only, default: <input>_rejected.jsonl)')
+    imp.add_argument('--duplicates', choices=['warn', 'skip', 'off'], default='warn',
+                     help='Report duplicates, or also skip entries already in the mirror (entries only)')
+    imp.add_argument('--fuzzy_programs', action='store_true',
+                     help='Fall back to the best fuzzy program match, logging each (entries only)')
+    imp.set_defaults(func=cmd_import)
+
+    analyze = commands.add_parser('analyze', help='Analyze the form fields of a PDF')
+    analyze.add_argument('pdf')
+    analyze.add_argument('--output', help='Analysis JSON path (default: <pdf>_analysis.json)')
+    analyze.set_defaults(func=cmd_analyze)
+
+    map_cmd = commands.add_parser('map', help='Map PDF form fields and draw their locations')
+    map_cmd.add_argument('pdf')
+    map_cmd.add_argument('--output', help='Mapped PDF path (default: <pdf>_mapped.pdf)')
+    map_cmd.set_defaults(func=cmd_map)
+
+    fill = commands.add_parser('fill', help='Fill a PDF form from a JSON file of field values')
+    fill.add_argument('pdf')
+    fill.add_argument('--data', help='JSON object of field name to value (default: sample data)')
+    fill.add_argument('--output', help='Filled PDF path (default: <pdf>_filled.pdf)')
+    fill.add_argument('--incremental', action='store_true',
+                      help='Append the filled fields as an incremental update instead of rewriting the PDF')
+    fill.set_defaults(func=cmd_fill)
+
+    read = commands.add_parser('read', help='Read the field values of a filled PDF form')
+    read.add_argument('pdf')
+    read.add_argument('--mapping', help='Field mapping JSON used to interpret fields')
+    read.set_defaults(func=cmd_read)
+
+    icons = commands.add_parser('icons', help='Generate Android and iOS app icons')
+    icons.add_argument('--input', default='knights1.png')
+    icons.set_defaults(func=cmd_icons)
+
+    for name, (_, help_text) in PASSTHROUGH_COMMANDS.items():
+        commands.add_parser(name, help=help_text, add_help=False)
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args, extra = parser.parse_known_args(argv)
+    if extra and args.command not in PASSTHROUGH_COMMANDS:
+        parser.error(f"unrecognized arguments: {' '.join(extra)}")
+    if args.command == 'convert' and args.incremental and args.workers > 1:
+        # Incremental runs only parse the appended rows, serially
+        parser.error("convert: --workers cannot be combined with --incremental")
+    if args.credentials:
+        from firebase_app import set_credentials_path
+        set_credentials_path(args.credentials)
+    if args.fake_firestore:
+        # Through the environment so import-councils worker processes get their own fake too
+        import os
+        from firebase_app import FAKE_FIRESTORE_ENV
+        os.environ[FAKE_FIRESTORE_ENV] = args.fake_firestore
+
+    if args.command in PASSTHROUGH_COMMANDS:
+        import importlib
+        module = importlib.import_module(PASSTHROUGH_COMMANDS[args.command][0])
+        return module.main(extra)
+    return args.func(args)
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,213 @@
+import argparse
+import json
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from ledger import from_ledger_entry, load_ledger
+from program_matcher import normalize, trigrams
+
+DATE_WINDOW_DAYS = 3
+MIN_SIMILARITY = 0.6
+
+def description_similarity(a: frozenset, b: frozenset) -> float:
+    """Trigram Dice similarity, which tolerates typos and reordered words"""
+    if not a or not b:
+        return 1.0 if a == b else 0.0
+    return 2 * len(a & b) / (len(a) + len(b))
+
+def find_duplicates(entries: Sequence[Dict[str, Any]], window_days: int = DATE_WINDOW_DAYS,
+                    min_similarity: float = MIN_SIMILARITY, first_new: int = 0) -> Dict[str, Any]:
+    """
+    Finds exact and near-duplicate ledger rows.
+
+    Rows are bucketed by (amount in cents, program), so only rows that could be
+    the same transaction are ever compared. Within a bucket, rows with the same
+    date and description are exact duplicates and collapse into one group; the
+    group representatives are then scanned in date order, and each is compared
+    only with the rows at most `window_days` later, scoring descriptions by
+    trigram similarity. Ledgers repeat the same few programs and descriptions,
+    so normalized texts and pair scores are computed once per distinct value.
+
+    Rows before index `first_new` are existing entries: groups and pairs made
+    only of existing rows are left out, so a batch can be checked against the
+    ledger it is about to be imported into.
+    """
+    normalized: Dict[str, str] = {}
+
+    def norm(text: str) -> str:
+        if text not in normalized:
+            normalized[text] = normalize(text)
+        return normalized[text]
+
+    buckets = defaultdict(list)
+    for i, entry in enumerate(entries):
+        buckets[(entry['cents'], norm(entry['category']))].append(i)
+
+    exact = []
+    near = []
+    tokens: Dict[str, frozenset] = {}
+    scores: Dict[Tuple[str, str], float] = {}
+    for indices in buckets.values():
+        if len(indices) < 2:
+            continue
+        groups = defaultdict(list)
+        for i in indices:
+            entry = entries[i]
+            groups[(entry['date'].toordinal(), norm(entry['description']))].append(i)
+        for members in groups.values():
+            if len(members) > 1 and members[-1] >= first_new:
+                exact.append(members)
+        if len(groups) < 2:
+            continue
+
+        keys = sorted(groups)
+        days = [day for day, _ in keys]
+        texts = [text for _, text in keys]
+        # First member and whether the group holds a new row
+        firsts = [groups[key][0] for key in keys]
+        new = [groups[key][-1] >= first_new for key in keys]
+        count = len(keys)
+        for a in range(count):
+            day, text, is_new = days[a], texts[a], new[a]
+            b = a + 1
+            while b < count and days[b] - day <= window_days:
+                if is_new or new[b]:
+                    pair = (text, texts[b])
+                    score = scores.get(pair)
+                    if score is None:
+                        for t in pair:
+                            if t not in tokens:
+                                tokens[t] = frozenset(trigrams(t)) if t else frozenset()
+                        score = scores[pair] = description_similarity(tokens[text], tokens[texts[b]])
+                    if score >= min_similarity:
+                        near.append((firsts[a], firsts[b], round(score, 3), days[b] - day))
+                b += 1
+
+    exact.sort()
+    near.sort()
+    return {'exact': exact, 'near': near}
+
+def build_report(entries: Sequence[Dict[str, Any]], result: Dict[str, Any]) -> Dict[str, Any]:
+    """Review report with the rows of every exact group and near-duplicate pair"""
+    return {
+        'entries': len(entries),
+        'exact_groups': [[entries[i] for i in members] for members in result['exact']],
+        'near_pairs': [{'first': entries[a], 'second': entries[b], 'similarity': score, 'days_apart': days}
+                       for a, b, score, days in result['near']],
+    }
+
+def _format_cents(cents: int) -> str:
+    sign = '-' if cents < 0 else ''
+    return f"{sign}${abs(cents) / 100:,.2f}"
+
+def _describe(entry: Dict[str, Any]) -> str:
+    return (f"row {entry['row']}: {entry['date']} {_format_cents(entry['cents'])} "
+            f"{entry['category']} - {entry['description']}")
+
+def print_report(report: Dict[str, Any], limit: int = 20):
+    """Prints a duplicate summary and the first `limit` groups and pairs"""
+    print("\nDuplicate Report:")
+    print("=" * 50)
+    print(f"Entries checked: {report['entries']}")
+    print(f"Exact duplicate groups: {len(report['exact_groups'])} "
+          f"({sum(len(g) - 1 for g in report['exact_groups'])} extra rows)")
+    print(f"Near-duplicate pairs: {len(report['near_pairs'])}")
+
+    for group in report['exact_groups'][:limit]:
+        print(f"\n  Exact x{len(group)}")
+        for entry in group:
+            print(f"    {_describe(entry)}")
+    for pair in report['near_pairs'][:limit]:
+        print(f"\n  Near (similarity {pair['similarity']}, {pair['days_apart']} days apart)")
+        print(f"    {_describe(pair['first'])}")
+        print(f"    {_describe(pair['second'])}")
+
+def mirror_ledger(conn, organization_id: str) -> List[Dict[str, Any]]:
+    """An organization's mirrored entries as ledger rows; `row` is the Firestore document id"""
+    rows = conn.execute('SELECT id, date, amount_cents, program_name, description, payment_method '
+                        'FROM entries WHERE organization_id = ?', (organization_id,))
+    return [{
+        'row': row['id'],
+        'date': datetime.fromtimestamp(row['date'], tz=timezone.utc).date(),
+        'cents': row['amount_cents'],
+        'category': row['program_name'] or '',
+        'description': row['description'] or '',
+        'paymentMethod': row['payment_method'] or '',
+        'cleared': False,
+        'combinedTotal': '',
+    } for row in rows]
+
+class DuplicateGuard:
+    """
+    Pre-import check of a batch of (row, compact ledger entry) pairs (the
+    financial_entries.json format) against the existing ledger and itself.
+
+    An incoming entry that exactly matches an existing entry is a repeat
+    import; with several identical entries on both sides, only as many
+    incoming copies as there are existing ones count as repeats. Identical
+    entries within the batch and near duplicates are only reported, since
+    e.g. two members paying dues on the same day look exactly alike.
+    """
+
+    def __init__(self, incoming: List[Tuple[int, Dict[str, Any]]],
+                 existing: Optional[List[Dict[str, Any]]] = None,
+                 window_days: int = DATE_WINDOW_DAYS, min_similarity: float = MIN_SIMILARITY):
+        existing = existing or []
+        self.rows = existing + [from_ledger_entry(entry, row) for row, entry in incoming]
+        first_new = len(existing)
+        self.result = find_duplicates(self.rows, window_days, min_similarity, first_new)
+        # Incoming row -> existing row it repeats
+        self.repeats: Dict[int, Any] = {}
+        self.batch_groups = 0
+        for members in self.result['exact']:
+            old = [i for i in members if i < first_new]
+            new = [i for i in members if i >= first_new]
+            for i, j in zip(new, old):
+                self.repeats[self.rows[i]['row']] = self.rows[j]['row']
+            if len(new) > 1:
+                self.batch_groups += 1
+        self.near = [(a, b) for a, b, _, _ in self.result['near']]
+
+    def reason(self, row: int) -> Optional[str]:
+        """Dead-letter reason for an incoming row that repeats an existing entry"""
+        if row in self.repeats:
+            return f"duplicate: same date, amount, program and description as existing entry {self.repeats[row]}"
+        return None
+
+    def print_summary(self):
+        print(f"Duplicate check: {len(self.repeats)} entries already in the ledger, "
+              f"{self.batch_groups} identical groups within the batch, {len(self.near)} near-duplicate pairs")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Find duplicate and near-duplicate ledger entries')
+    parser.add_argument('ledger', nargs='?', default='2025 Council 15857 Finances - Transactions.csv',
+                        help='Sheets CSV export, financial_entries.json or ledger JSON Lines')
+    parser.add_argument('--mirror', help='Check the entries in this local SQLite mirror instead')
+    parser.add_argument('--organization_id', default='C015857', help='Organization to check in the mirror')
+    parser.add_argument('--window_days', type=int, default=DATE_WINDOW_DAYS,
+                        help='Maximum days between near-duplicate dates')
+    parser.add_argument('--min_similarity', type=float, default=MIN_SIMILARITY,
+                        help='Minimum description similarity (0-1) for a near duplicate')
+    parser.add_argument('--report', default='duplicate_report.json', help='Path for the JSON report')
+    args = parser.parse_args(argv)
+
+    if args.mirror:
+        from local_mirror import open_mirror
+        entries = mirror_ledger(open_mirror(args.mirror), args.organization_id)
+    else:
+        entries = load_ledger(args.ledger)
+    print(f"Loaded {len(entries)} ledger entries")
+
+    start = time.perf_counter()
+    result = find_duplicates(entries, args.window_days, args.min_similarity)
+    print(f"Checked in {time.perf_counter() - start:.2f}s")
+    report = build_report(entries, result)
+    print_report(report)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\nReport saved to: {args.report}")
+
+if __name__ == '__main__':
+    main()
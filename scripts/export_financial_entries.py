@@ -0,0 +1,144 @@
+import argparse
+import json
+import queue
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from firebase_app import get_db
+from ledger import FINANCE_TYPES, finance_ref, to_json_safe, to_ledger_entry
+
+# Only the fields the ledger needs are fetched from Firestore
+LEDGER_FIELDS = [
+    'date', 'amount', 'description', 'programId', 'programName', 'program',
+    'paymentMethod', 'checkNumber', 'isExpense', 'createdAt', 'updatedAt',
+    'createdBy', 'updatedBy',
+]
+
+PAGE_SIZE = 500
+MAX_WORKERS = 8
+
+# Marks the end of a partition on the results queue
+_DONE = object()
+
+def list_partitions(db, organization_id: str, years: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+    """Lists the (type, year) partitions of an organization's ledger"""
+    finance = finance_ref(db, organization_id)
+    partitions = []
+    for entry_type in FINANCE_TYPES:
+        for year_ref in finance.document(entry_type).collections():
+            if years and year_ref.id not in years:
+                continue
+            partitions.append((entry_type, year_ref.id))
+    return sorted(partitions, key=lambda p: (p[1], p[0]))
+
+def iter_partition_pages(db, organization_id: str, entry_type: str, year: str,
+                         page_size: int = PAGE_SIZE, fields: Optional[List[str]] = LEDGER_FIELDS) -> Iterator[list]:
+    """Pages through one partition with a document-id cursor, yielding lists of snapshots"""
+    query = finance_ref(db, organization_id).document(entry_type).collection(year).order_by('__name__')
+    if fields:
+        query = query.select(fields)
+    last = None
+    while True:
+        page_query = query.limit(page_size)
+        if last is not None:
+            page_query = page_query.start_after(last)
+        docs = list(page_query.stream())
+        if not docs:
+            return
+        yield docs
+        if len(docs) < page_size:
+            return
+        last = docs[-1]
+
+def format_record(organization_id: str, entry_type: str, year: str, doc, output_format: str) -> dict:
+    """Formats a finance snapshot as a JSON Lines record"""
+    data = doc.to_dict() or {}
+    if output_format == 'ledger':
+        return to_ledger_entry(data, entry_type)
+    record = {'organizationId': organization_id, 'type': entry_type, 'year': year, 'id': doc.id}
+    record.update(to_json_safe(data))
+    return record
+
+def export_financial_entries(db, organization_id: str, output, output_format: str = 'jsonl',
+                             years: Optional[List[str]] = None, page_size: int = PAGE_SIZE,
+                             max_workers: int = MAX_WORKERS, all_fields: bool = False) -> dict:
+    """
+    Streams an organization's ledger to `output` as JSON Lines.
+
+    Every (type, year) partition is paged concurrently; pages are handed to the
+    writer through a bounded queue so only a few pages are held in memory at once.
+    """
+    partitions = list_partitions(db, organization_id, years)
+    print(f"Exporting {len(partitions)} partitions for organization {organization_id}", file=sys.stderr)
+    if not partitions:
+        return {'partitions': 0, 'entries': 0}
+
+    fields = None if all_fields else LEDGER_FIELDS
+    pages = queue.Queue(maxsize=max_workers * 2)
+    stop = threading.Event()
+
+    def fetch(entry_type: str, year: str):
+        try:
+            for docs in iter_partition_pages(db, organization_id, entry_type, year, page_size, fields):
+                if stop.is_set():
+                    break
+                pages.put((entry_type, year, docs))
+        finally:
+            pages.put(_DONE)
+
+    counts = {}
+    remaining = len(partitions)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(partitions))) as executor:
+        futures = [executor.submit(fetch, t, y) for t, y in partitions]
+        try:
+            while remaining:
+                item = pages.get()
+                if item is _DONE:
+                    remaining -= 1
+                    continue
+                entry_type, year, docs = item
+                for doc in docs:
+                    output.write(json.dumps(format_record(organization_id, entry_type, year, doc, output_format)))
+                    output.write('\n')
+                counts[(entry_type, year)] = counts.get((entry_type, year), 0) + len(docs)
+        finally:
+            stop.set()
+            # Unblock producers waiting on a full queue
+            while remaining:
+                if pages.get() is _DONE:
+                    remaining -= 1
+        for future in futures:
+            future.result()
+
+    for (entry_type, year), count in sorted(counts.items(), key=lambda c: (c[0][1], c[0][0])):
+        print(f"  {year} {entry_type}: {count} entries", file=sys.stderr)
+    total = sum(counts.values())
+    print(f"Exported {total} entries", file=sys.stderr)
+    return {'partitions': len(partitions), 'entries': total}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export an organization ledger from Firestore as JSON Lines')
+    parser.add_argument('--organization_id', default='C015857', help='Organization to export (default: C015857)')
+    parser.add_argument('--output', default='-', help='Output JSON Lines path, or - for stdout')
+    parser.add_argument('--format', choices=['jsonl', 'ledger'], default='jsonl',
+                        help='jsonl: Firestore documents; ledger: financial_entries.json record format')
+    parser.add_argument('--years', nargs='*', help='Only export these years')
+    parser.add_argument('--page_size', type=int, default=PAGE_SIZE)
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--all_fields', action='store_true', help='Fetch every field instead of the ledger projection')
+    args = parser.parse_args(argv)
+    db = get_db()
+
+    if args.output == '-':
+        export_financial_entries(db, args.organization_id, sys.stdout, args.format, args.years,
+                                 args.page_size, args.workers, args.all_fields)
+    else:
+        with open(args.output, 'w') as f:
+            export_financial_entries(db, args.organization_id, f, args.format, args.years,
+                                     args.page_size, args.workers, args.all_fields)
+        print(f"Output written to: {args.output}", file=sys.stderr)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,705 @@
+import argparse
+import copy
+import functools
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+try:
+    from google.api_core.exceptions import AlreadyExists, InvalidArgument, NotFound, ResourceExhausted
+    from google.cloud.firestore_v1 import DELETE_FIELD, SERVER_TIMESTAMP
+except ImportError:
+    # Without firebase-admin installed the fake uses its own markers and errors
+    class _FakeError(Exception):
+        pass
+
+    class AlreadyExists(_FakeError):
+        pass
+
+    class InvalidArgument(_FakeError):
+        pass
+
+    class NotFound(_FakeError):
+        pass
+
+    class ResourceExhausted(_FakeError):
+        pass
+
+    SERVER_TIMESTAMP = object()
+    DELETE_FIELD = object()
+
+# Firestore allows at most 500 writes per batch
+MAX_BATCH_WRITES = 500
+# Count and sum aggregations are billed one read per 1000 index entries
+COUNT_ENTRIES_PER_READ = 1000
+
+_AUTO_ID_CHARS = string.ascii_letters + string.digits
+_MISSING = object()
+
+class FakeStats:
+    """Read, write and RPC counters of a FakeFirestore, billed the way Firestore bills them"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.reads = 0
+            self.writes = 0
+            self.deletes = 0
+            self.rpcs = 0
+            self.throttled = 0
+            self.calls: Counter = Counter()
+
+    def record(self, call: str, reads: int = 0, writes: int = 0, deletes: int = 0):
+        with self.lock:
+            self.rpcs += 1
+            self.calls[call] += 1
+            self.reads += reads
+            self.writes += writes
+            self.deletes += deletes
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            return {'reads': self.reads, 'writes': self.writes, 'deletes': self.deletes, 'rpcs': self.rpcs,
+                    'throttled': self.throttled, 'calls': dict(self.calls)}
+
+    def print_summary(self, file=sys.stderr):
+        stats = self.snapshot()
+        calls = ', '.join(f"{call} {count}" for call, count in sorted(stats['calls'].items()))
+        print(f"Fake Firestore: {stats['reads']} reads, {stats['writes']} writes, {stats['deletes']} deletes, "
+              f"{stats['rpcs']} RPCs ({calls or 'none'}), {stats['throttled']} throttled", file=file)
+
+def _normalize(value):
+    # Stored values are private copies; naive datetimes are UTC, as the real client assumes
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def _resolve(value, now: datetime):
+    if value is SERVER_TIMESTAMP:
+        return now
+    if isinstance(value, dict):
+        return {k: _resolve(v, now) for k, v in value.items() if v is not DELETE_FIELD}
+    if isinstance(value, list):
+        return [_resolve(v, now) for v in value]
+    return _normalize(value)
+
+def _get_field(data: Dict[str, Any], field_path: str):
+    value = data
+    for part in field_path.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return _MISSING
+        value = value[part]
+    return value
+
+def _set_field(data: Dict[str, Any], field_path: str, value):
+    parts = field_path.split('.')
+    for part in parts[:-1]:
+        if not isinstance(data.get(part), dict):
+            data[part] = {}
+        data = data[part]
+    if value is DELETE_FIELD:
+        data.pop(parts[-1], None)
+    else:
+        data[parts[-1]] = value
+
+def _merge(target: Dict[str, Any], source: Dict[str, Any]):
+    for key, value in source.items():
+        if value is DELETE_FIELD:
+            target.pop(key, None)
+        elif isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            target[key] = value
+
+def _order_key(value) -> tuple:
+    """Sort key following Firestore's cross-type value ordering"""
+    if value is None:
+        return (0,)
+    if isinstance(value, bool):
+        return (1, value)
+    if isinstance(value, (int, float)):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (3, _normalize(value).timestamp())
+    if isinstance(value, str):
+        return (4, value)
+    if isinstance(value, bytes):
+        return (5, value)
+    if isinstance(value, FakeDocumentReference):
+        return (6, value.path)
+    if isinstance(value, (list, tuple)):
+        return (8, tuple(_order_key(v) for v in value))
+    if isinstance(value, dict):
+        return (9, tuple((k, _order_key(v)) for k, v in sorted(value.items())))
+    return (7, repr(value))
+
+def _compare(a, b) -> int:
+    a, b = _order_key(a), _order_key(b)
+    return (a > b) - (a < b)
+
+def _matches(value, op: str, operand) -> bool:
+    if value is _MISSING:
+        return False
+    if op == 'array-contains':
+        return isinstance(value, list) and any(_compare(v, operand) == 0 for v in value)
+    if op == 'array-contains-any':
+        return isinstance(value, list) and any(_compare(v, o) == 0 for v in value for o in operand)
+    if op == 'in':
+        return any(_compare(value, o) == 0 for o in operand)
+    if op == 'not-in':
+        return value is not None and all(_compare(value, o) != 0 for o in operand)
+    if op == '!=':
+        return value is not None and _compare(value, operand) != 0
+    if op == '==':
+        return _compare(value, operand) == 0
+    # Range filters only match values of the same type as the operand
+    if _order_key(value)[0] != _order_key(operand)[0]:
+        return False
+    result = _compare(value, operand)
+    return {'<': result < 0, '<=': result <= 0, '>': result > 0, '>=': result >= 0}[op]
+
+class FakeDocumentSnapshot:
+    def __init__(self, reference: 'FakeDocumentReference', data: Optional[Dict[str, Any]],
+                 update_time: Optional[datetime] = None, read_time: Optional[datetime] = None):
+        self.reference = reference
+        self.id = reference.id
+        self._data = data
+        self.exists = data is not None
+        self.create_time = update_time
+        self.update_time = update_time
+        self.read_time = read_time
+
+    def to_dict(self) -> Optional[Dict[str, Any]]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path: str):
+        value = _get_field(self._data or {}, field_path)
+        if value is _MISSING:
+            raise KeyError(field_path)
+        return copy.deepcopy(value)
+
+class FakeAggregationResult:
+    def __init__(self, alias: str, value: int, read_time: datetime):
+        self.alias = alias
+        self.value = value
+        self.read_time = read_time
+
+class FakeAggregationQuery:
+    """A count, or with field_path a sum of that field's numeric values (others are skipped, as in Firestore)"""
+
+    def __init__(self, query: 'FakeQuery', alias: str, field_path: Optional[str] = None):
+        self._query = query
+        self._alias = alias
+        self._field_path = field_path
+
+    def get(self, transaction=None) -> List[List[FakeAggregationResult]]:
+        db = self._query._db
+        call = 'sum' if self._field_path else 'count'
+        db._rpc(call)
+        docs = self._query._run()
+        if self._field_path:
+            values = [_get_field(data, self._field_path) for _, data, _ in docs]
+            value = sum(v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool))
+        else:
+            value = len(docs)
+        db.stats.record(call, reads=max(1, -(-len(docs) // COUNT_ENTRIES_PER_READ)))
+        return [[FakeAggregationResult(self._alias, value, datetime.now(timezone.utc))]]
+
+    def stream(self, transaction=None) -> Iterator[List[FakeAggregationResult]]:
+        yield from self.get(transaction)
+
+class FakeQuery:
+    """
+    Immutable query over one collection, supporting the filters, ordering,
+    cursors, projections and limits the scripts use. Documents missing a
+    filtered or ordered field are left out, as in Firestore.
+    """
+
+    def __init__(self, collection: 'FakeCollectionReference', filters=(), orders=(), limit=None,
+                 offset=0, cursor=None, projection=None):
+        self._collection = collection
+        self._db = collection._db
+        self._filters: Tuple[Tuple[str, str, Any], ...] = tuple(filters)
+        self._orders: Tuple[Tuple[str, str], ...] = tuple(orders)
+        self._limit = limit
+        self._offset = offset
+        self._cursor = cursor
+        self._projection = projection
+
+    def _copy(self, **changes) -> 'FakeQuery':
+        state = {'filters': self._filters, 'orders': self._orders, 'limit': self._limit,
+                 'offset': self._offset, 'cursor': self._cursor, 'projection': self._projection}
+        state.update(changes)
+        return FakeQuery(self._collection, **state)
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None, value=None,
+              filter=None) -> 'FakeQuery':
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        if op_string not in ('<', '<=', '==', '!=', '>=', '>', 'in', 'not-in', 'array-contains',
+                             'array-contains-any'):
+            raise InvalidArgument(f"Unsupported operator: {op_string}")
+        return self._copy(filters=self._filters + ((field_path, op_string, _normalize(value)),))
+
+    def order_by(self, field_path: str, direction: str = 'ASCENDING') -> 'FakeQuery':
+        if direction not in ('ASCENDING', 'DESCENDING'):
+            raise InvalidArgument(f"Unsupported direction: {direction}")
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int) -> 'FakeQuery':
+        return self._copy(limit=count)
+
+    def offset(self, num_to_skip: int) -> 'FakeQuery':
+        return self._copy(offset=num_to_skip)
+
+    def select(self, field_paths: List[str]) -> 'FakeQuery':
+        return self._copy(projection=list(field_paths))
+
+    def start_after(self, document_fields_or_snapshot) -> 'FakeQuery':
+        return self._copy(cursor=document_fields_or_snapshot)
+
+    def count(self, alias: Optional[str] = None) -> FakeAggregationQuery:
+        return FakeAggregationQuery(self, alias or 'field_1')
+
+    def sum(self, field_ref: str, alias: Optional[str] = None) -> FakeAggregationQuery:
+        return FakeAggregationQuery(self, alias or 'field_1', field_ref)
+
+    def _effective_orders(self) -> List[Tuple[str, str]]:
+        orders = list(self._orders)
+        if not orders:
+            # An inequality filter implicitly orders by its field first
+            for field_path, op, _ in self._filters:
+                if op in ('<', '<=', '>', '>=', '!=', 'not-in'):
+                    orders.append((field_path, 'ASCENDING'))
+                    break
+        if not any(field_path == '__name__' for field_path, _ in orders):
+            orders.append(('__name__', orders[-1][1] if orders else 'ASCENDING'))
+        return orders
+
+    def _run(self) -> List[Tuple[str, Dict[str, Any], datetime]]:
+        """(id, data, update time) of the matching documents, ordered, after the cursor and limit"""
+        orders = self._effective_orders()
+        docs = []
+        for doc_id, (data, updated) in self._db._documents_in(self._collection.path):
+            values = {field_path: doc_id if field_path == '__name__' else _get_field(data, field_path)
+                      for field_path, _ in orders}
+            if any(value is _MISSING for value in values.values()):
+                continue
+            if all(_matches(_get_field(data, f), op, v) for f, op, v in self._filters):
+                docs.append((values, doc_id, data, updated))
+
+        def compare(a, b) -> int:
+            for field_path, direction in orders:
+                result = _compare(a[field_path], b[field_path])
+                if result:
+                    return -result if direction == 'DESCENDING' else result
+            return 0
+
+        docs.sort(key=functools.cmp_to_key(lambda a, b: compare(a[0], b[0])))
+        if self._cursor is not None:
+            if isinstance(self._cursor, FakeDocumentSnapshot):
+                fields = self._cursor._data or {}
+                cursor = {f: self._cursor.id if f == '__name__' else _get_field(fields, f) for f, _ in orders}
+            else:
+                cursor = {f: _normalize(self._cursor.get(f, _MISSING)) for f, _ in orders}
+                cursor = {f: v for f, v in cursor.items() if v is not _MISSING}
+            if cursor:
+                docs = [doc for doc in docs if compare({f: doc[0][f] for f in cursor}, cursor) > 0]
+        docs = docs[self._offset:]
+        if self._limit is not None:
+            docs = docs[:self._limit]
+        return [(doc_id, data, updated) for _, doc_id, data, updated in docs]
+
+    def _project(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        if self._projection is None:
+            return data
+        projected = {}
+        for field_path in self._projection:
+            value = _get_field(data, field_path)
+            if value is not _MISSING:
+                _set_field(projected, field_path, value)
+        return projected
+
+    def stream(self, transaction=None) -> Iterator[FakeDocumentSnapshot]:
+        self._db._rpc('query')
+        docs = self._run()
+        self._db.stats.record('query', reads=max(1, len(docs)))
+        now = datetime.now(timezone.utc)
+        for doc_id, data, updated in docs:
+            yield FakeDocumentSnapshot(self._collection.document(doc_id), self._project(data), updated, now)
+
+    def get(self, transaction=None) -> List[FakeDocumentSnapshot]:
+        return list(self.stream(transaction))
+
+class FakeCollectionReference(FakeQuery):
+    def __init__(self, db: 'FakeFirestore', path: str):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+        super().__init__(self)
+
+    @property
+    def parent(self) -> Optional['FakeDocumentReference']:
+        return self._db.document(self.path.rsplit('/', 1)[0]) if '/' in self.path else None
+
+    def document(self, document_id: Optional[str] = None) -> 'FakeDocumentReference':
+        return FakeDocumentReference(self._db, f"{self.path}/{document_id or self._db.auto_id()}")
+
+    def add(self, document_data: Dict[str, Any], document_id: Optional[str] = None):
+        ref = self.document(document_id)
+        return ref.create(document_data), ref
+
+    def list_documents(self) -> List['FakeDocumentReference']:
+        self._db._rpc('list_documents')
+        refs = [self.document(doc_id) for doc_id, _ in self._db._documents_in(self.path)]
+        self._db.stats.record('list_documents', reads=max(1, len(refs)))
+        return refs
+
+    def __eq__(self, other):
+        return isinstance(other, FakeCollectionReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+class FakeDocumentReference:
+    def __init__(self, db: 'FakeFirestore', path: str):
+        self._db = db
+        self.path = path
+        self.id = path.rsplit('/', 1)[-1]
+
+    @property
+    def parent(self) -> FakeCollectionReference:
+        return self._db.collection(self.path.rsplit('/', 1)[0])
+
+    def collection(self, collection_id: str) -> FakeCollectionReference:
+        return self._db.collection(f"{self.path}/{collection_id}")
+
+    def collections(self) -> List[FakeCollectionReference]:
+        self._db._rpc('list_collections')
+        self._db.stats.record('list_collections', reads=1)
+        return [self.collection(name) for name in self._db._collection_ids(self.path)]
+
+    def get(self, field_paths: Optional[List[str]] = None, transaction=None) -> FakeDocumentSnapshot:
+        self._db._rpc('get')
+        self._db.stats.record('get', reads=1)
+        data, updated = self._db._read(self.path)
+        if data is not None and field_paths is not None:
+            data = FakeQuery(self.parent, projection=field_paths)._project(data)
+        return FakeDocumentSnapshot(self, copy.deepcopy(data), updated, datetime.now(timezone.utc))
+
+    def create(self, document_data: Dict[str, Any]):
+        return self._db._commit([('create', self, document_data)], 'create')[0]
+
+    def set(self, document_data: Dict[str, Any], merge: bool = False):
+        return self._db._commit([('merge' if merge else 'set', self, document_data)], 'set')[0]
+
+    def update(self, field_updates: Dict[str, Any]):
+        return self._db._commit([('update', self, field_updates)], 'update')[0]
+
+    def delete(self):
+        return self._db._commit([('delete', self, None)], 'delete')[0]
+
+    def __eq__(self, other):
+        return isinstance(other, FakeDocumentReference) and other.path == self.path
+
+    def __hash__(self):
+        return hash(self.path)
+
+class FakeWriteResult:
+    def __init__(self, update_time: datetime):
+        self.update_time = update_time
+
+class FakeWriteBatch:
+    """Collects writes and applies them atomically in one commit RPC"""
+
+    def __init__(self, db: 'FakeFirestore'):
+        self._db = db
+        self._writes: List[Tuple[str, FakeDocumentReference, Any]] = []
+
+    def create(self, reference: FakeDocumentReference, document_data: Dict[str, Any]):
+        self._writes.append(('create', reference, document_data))
+
+    def set(self, reference: FakeDocumentReference, document_data: Dict[str, Any], merge: bool = False):
+        self._writes.append(('merge' if merge else 'set', reference, document_data))
+
+    def update(self, reference: FakeDocumentReference, field_updates: Dict[str, Any]):
+        self._writes.append(('update', reference, field_updates))
+
+    def delete(self, reference: FakeDocumentReference):
+        self._writes.append(('delete', reference, None))
+
+    def commit(self) -> List[FakeWriteResult]:
+        writes, self._writes = self._writes, []
+        return self._db._commit(writes, 'batch_commit')
+
+    def __len__(self):
+        return len(self._writes)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+
+class FakeFirestore:
+    """
+    In-memory stand-in for the firestore.Client surface used by these scripts:
+    collection/document references, where/order_by/select/limit/start_after
+    queries, count and sum aggregations, get/set/update/delete, batches and
+    SERVER_TIMESTAMP.
+
+    Every RPC can be slowed down by `latency` seconds (plus up to `jitter`),
+    and writes can be throttled the way Firestore pushes back under load:
+    each write RPC fails with ResourceExhausted with probability `throttle`,
+    and always once more than `write_limit` documents were written in the
+    last second. Reads, writes and RPCs are counted in `stats`.
+    """
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, throttle: float = 0.0,
+                 write_limit: Optional[float] = None, seed: Optional[int] = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle = throttle
+        self.write_limit = write_limit
+        self.stats = FakeStats()
+        self._random = random.Random(seed)
+        self._lock = threading.RLock()
+        # Collection path -> document id -> (data, update time)
+        self._collections: Dict[str, Dict[str, Tuple[Dict[str, Any], datetime]]] = defaultdict(dict)
+        # Parent document path ('' for the root) -> ids of the collections under it
+        self._children: Dict[str, set] = defaultdict(set)
+        self._recent_writes: deque = deque()
+
+    def auto_id(self) -> str:
+        with self._lock:
+            return ''.join(self._random.choice(_AUTO_ID_CHARS) for _ in range(20))
+
+    def collection(self, collection_path: str) -> FakeCollectionReference:
+        return FakeCollectionReference(self, collection_path.strip('/'))
+
+    def document(self, document_path: str) -> FakeDocumentReference:
+        return FakeDocumentReference(self, document_path.strip('/'))
+
+    def collections(self) -> List[FakeCollectionReference]:
+        self._rpc('list_collections')
+        self.stats.record('list_collections', reads=1)
+        return [self.collection(name) for name in self._collection_ids('')]
+
+    def batch(self) -> FakeWriteBatch:
+        return FakeWriteBatch(self)
+
+    def close(self):
+        pass
+
+    # Latency and throttling
+
+    def _rpc(self, call: str):
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _check_throttle(self, call: str, writes: int):
+        with self._lock:
+            throttled = self.throttle and self._random.random() < self.throttle
+            if not throttled and self.write_limit is not None:
+                now = time.monotonic()
+                while self._recent_writes and now - self._recent_writes[0][0] >= 1.0:
+                    self._recent_writes.popleft()
+                throttled = sum(n for _, n in self._recent_writes) + writes > self.write_limit
+                if not throttled:
+                    self._recent_writes.append((now, writes))
+        if throttled:
+            with self.stats.lock:
+                self.stats.throttled += 1
+            self.stats.record(call)
+            raise ResourceExhausted(f"Fake Firestore throttled {call} of {writes} writes")
+
+    # Storage
+
+    def _split(self, path: str) -> Tuple[str, str]:
+        collection_path, doc_id = path.rsplit('/', 1)
+        return collection_path, doc_id
+
+    def _documents_in(self, collection_path: str) -> List[Tuple[str, Tuple[Dict[str, Any], datetime]]]:
+        with self._lock:
+            return list(self._collections.get(collection_path, {}).items())
+
+    def _read(self, path: str) -> Tuple[Optional[Dict[str, Any]], Optional[datetime]]:
+        collection_path, doc_id = self._split(path)
+        with self._lock:
+            return self._collections.get(collection_path, {}).get(doc_id, (None, None))
+
+    def _has_documents(self, collection_path: str) -> bool:
+        # A collection is listed while it or any collection below it holds documents
+        if self._collections.get(collection_path):
+            return True
+        return any(self._has_documents(f"{doc_path}/{child}")
+                   for doc_path, children in list(self._children.items())
+                   if doc_path.rpartition('/')[0] == collection_path for child in children)
+
+    def _collection_ids(self, document_path: str) -> List[str]:
+        prefix = f"{document_path}/" if document_path else ''
+        with self._lock:
+            return sorted(name for name in self._children.get(document_path, ())
+                          if self._has_documents(f"{prefix}{name}"))
+
+    def _register(self, collection_path: str):
+        parent, _, name = collection_path.rpartition('/')
+        self._children[parent].add(name)
+        if parent:
+            self._register(parent.rpartition('/')[0])
+
+    def _commit(self, writes: List[Tuple[str, FakeDocumentReference, Any]], call: str) -> List[FakeWriteResult]:
+        """Applies writes atomically after the RPC's latency and throttling checks"""
+        if len(writes) > MAX_BATCH_WRITES:
+            raise InvalidArgument(f"A batch can hold at most {MAX_BATCH_WRITES} writes, got {len(writes)}")
+        self._rpc(call)
+        self._check_throttle(call, len(writes))
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            staged: Dict[str, Optional[Dict[str, Any]]] = {}
+            for op, ref, data in writes:
+                current = staged[ref.path] if ref.path in staged else self._read(ref.path)[0]
+                if op == 'delete':
+                    staged[ref.path] = None
+                elif op == 'create':
+                    if current is not None:
+                        raise AlreadyExists(f"Document already exists: {ref.path}")
+                    staged[ref.path] = _resolve(data, now)
+                elif op == 'set':
+                    staged[ref.path] = _resolve(data, now)
+                elif op == 'merge':
+                    merged = copy.deepcopy(current) if current is not None else {}
+                    _merge(merged, {k: v if v is DELETE_FIELD else _resolve(v, now) for k, v in data.items()})
+                    staged[ref.path] = merged
+                else:
+                    if current is None:
+                        raise NotFound(f"No document to update: {ref.path}")
+                    updated = copy.deepcopy(current)
+                    for field_path, value in data.items():
+                        _set_field(updated, field_path, value if value is DELETE_FIELD else _resolve(value, now))
+                    staged[ref.path] = updated
+            for path, data in staged.items():
+                collection_path, doc_id = self._split(path)
+                if data is None:
+                    self._collections.get(collection_path, {}).pop(doc_id, None)
+                else:
+                    self._collections[collection_path][doc_id] = (data, now)
+                    self._register(collection_path)
+        deletes = sum(1 for op, _, _ in writes if op == 'delete')
+        self.stats.record(call, writes=len(writes) - deletes, deletes=deletes)
+        return [FakeWriteResult(now) for _ in writes]
+
+    # Seeding and inspection (not billed)
+
+    def load(self, documents: Dict[str, Dict[str, Any]]):
+        """Adds documents by path, e.g. {'organizations/C015857/programs/dues': {...}}"""
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            for path, data in documents.items():
+                collection_path, doc_id = self._split(path.strip('/'))
+                self._collections[collection_path][doc_id] = (_resolve(_from_json(data), now), now)
+                self._register(collection_path)
+
+    def dump(self) -> Dict[str, Dict[str, Any]]:
+        """Every document by path"""
+        with self._lock:
+            return {f"{collection_path}/{doc_id}": copy.deepcopy(data)
+                    for collection_path, docs in sorted(self._collections.items())
+                    for doc_id, (data, _) in sorted(docs.items())}
+
+def _from_json(value):
+    # {'_seconds': ..., '_nanoseconds': ...} timestamps (the export format) become datetimes
+    if isinstance(value, dict):
+        if set(value) == {'_seconds', '_nanoseconds'}:
+            return datetime.fromtimestamp(value['_seconds'] + value['_nanoseconds'] / 1e9, tz=timezone.utc)
+        return {k: _from_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_from_json(v) for v in value]
+    return value
+
+def from_spec(spec: str) -> FakeFirestore:
+    """
+    Builds a fake from a comma separated option string, as given in the
+    COUNCILFINANCES_FAKE_FIRESTORE environment variable, e.g.
+    "latency=0.02,jitter=0.01,throttle=0.05,write_limit=500,seed=db.json".
+    Any other value (such as "1") gives a fake with no latency or throttling.
+    seed is a JSON object of documents by path, loaded into the fake.
+    """
+    options = dict(part.split('=', 1) for part in spec.split(',') if '=' in part)
+    db = FakeFirestore(latency=float(options.get('latency', 0)), jitter=float(options.get('jitter', 0)),
+                       throttle=float(options.get('throttle', 0)),
+                       write_limit=float(options['write_limit']) if 'write_limit' in options else None)
+    if options.get('seed'):
+        with open(options['seed'], 'r') as f:
+            db.load(json.load(f))
+    return db
+
+def run_import_benchmark(json_file: str, organization_id: str, db: FakeFirestore,
+                         writes_per_second: Optional[float] = None,
+                         dead_letter_file: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Imports json_file into a fake whose programs collection holds the program
+    catalog, returning the import result with its time and Firestore usage.
+    """
+    import firebase_app
+    from import_councils import TokenBucket
+    from import_financial_entries import import_financial_entries
+    from program_catalog import build_catalog, sync_program_catalog
+
+    firebase_app.set_db(db)
+    sync_program_catalog(db, organization_id, build_catalog(include_missing=True))
+    db.stats.reset()
+
+    throttle = TokenBucket(writes_per_second) if writes_per_second else None
+    start = time.perf_counter()
+    result = import_financial_entries(organization_id, json_file, throttle=throttle, verbose=False,
+                                      dead_letter_file=dead_letter_file)
+    seconds = time.perf_counter() - start
+    return dict(result, seconds=seconds, entries_per_second=result['imported'] / seconds if seconds else 0.0,
+                firestore=db.stats.snapshot())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark an entries import against an in-memory Firestore')
+    parser.add_argument('input', nargs='?', default='financial_entries.json', help='Financial entries JSON')
+    parser.add_argument('--organization_id', default='C015857')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds added to every RPC')
+    parser.add_argument('--jitter', type=float, default=0.0, help='Up to this many extra seconds per RPC')
+    parser.add_argument('--throttle', type=float, default=0.0,
+                        help='Probability (0-1) that a write RPC fails with ResourceExhausted')
+    parser.add_argument('--write_limit', type=float, help='Writes per second beyond which writes are throttled')
+    parser.add_argument('--writes_per_second', type=float, help="Client-side token bucket, as in import-councils")
+    parser.add_argument('--dead_letter', default=os.path.join(tempfile.gettempdir(), 'bench_import_rejected.jsonl'),
+                        help='Rejected entries JSON Lines')
+    parser.add_argument('--seed', type=int, default=0, help='Random seed for ids, jitter and throttling')
+    parser.add_argument('--report', help='Write the result to this JSON file')
+    args = parser.parse_args(argv)
+
+    db = FakeFirestore(args.latency, args.jitter, args.throttle, args.write_limit, args.seed)
+    result = run_import_benchmark(args.input, args.organization_id, db, args.writes_per_second, args.dead_letter)
+    print(f"\nBenchmark: {result['imported']} entries in {result['seconds']:.2f}s "
+          f"({result['entries_per_second']:.1f}/s), {result['errors']} errors")
+    db.stats.print_summary(file=sys.stdout)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(result, f, indent=2)
+        print(f"Report written to: {args.report}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import os
+import sys
+
+DEFAULT_CREDENTIALS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                   'council-finance-firebase-adminsdk-e5auu-46ccb83881.json')
+
+# "1" or fake_firestore options such as "latency=0.02,throttle=0.05": use an in-memory fake instead
+FAKE_FIRESTORE_ENV = 'COUNCILFINANCES_FAKE_FIRESTORE'
+
+_credentials_path = None
+_db = None
+
+def set_credentials_path(path: str):
+    """Overrides the service account used by get_db (must be called before the first get_db)"""
+    global _credentials_path
+    _credentials_path = path
+
+def set_db(db):
+    """Replaces the shared client, e.g. with a fake_firestore.FakeFirestore in benchmarks"""
+    global _db
+    _db = db
+
+def server_timestamp():
+    """
+    The SERVER_TIMESTAMP sentinel for document writes. Imported on first use
+    rather than with the writing module, since the Firestore client package
+    alone takes a few tenths of a second to load.
+    """
+    try:
+        from google.cloud.firestore_v1 import SERVER_TIMESTAMP
+    except ImportError:
+        # Without the client installed only the fake can be in use
+        from fake_firestore import SERVER_TIMESTAMP
+    return SERVER_TIMESTAMP
+
+def get_db():
+    """
+    Returns the shared Firestore client, initializing the Firebase app on first use.
+
+    Credentials come from set_credentials_path, then GOOGLE_APPLICATION_CREDENTIALS,
+    then the service account file in the repository root. firebase_admin is only
+    imported here, so commands that never touch Firestore do not pay for it.
+    With COUNCILFINANCES_FAKE_FIRESTORE set, an in-memory fake is used instead and
+    its read and write counts are printed when the process exits.
+    """
+    global _db
+    if _db is None and os.environ.get(FAKE_FIRESTORE_ENV):
+        import atexit
+        from fake_firestore import from_spec
+        _db = from_spec(os.environ[FAKE_FIRESTORE_ENV])
+        atexit.register(_db.stats.print_summary)
+        print(f"Using in-memory Firestore ({os.environ[FAKE_FIRESTORE_ENV]})", file=sys.stderr)
+    if _db is None:
+        import firebase_admin
+        from firebase_admin import credentials, firestore
+
+        try:
+            firebase_admin.get_app()
+        except ValueError:
+            cred_path = _credentials_path or os.environ.get('GOOGLE_APPLICATION_CREDENTIALS') or DEFAULT_CREDENTIALS
+            print(f"Using credentials from {cred_path}", file=sys.stderr)
+            firebase_admin.initialize_app(credentials.Certificate(cred_path))
+        _db = firestore.client()
+        print("Connected to Firestore", file=sys.stderr)
+    return _db
@@ -0,0 +1,240 @@
+import argparse
+import json
+import os
+import string
+import time
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ledger import load_ledger
+from program_matcher import DEFAULT_SYSTEM_PROGRAMS, ProgramMatcher, load_system_programs, normalize, split_category
+
+DEFAULT_FORM1728P_PROGRAMS = os.path.join(os.path.dirname(DEFAULT_SYSTEM_PROGRAMS), 'form1728p_programs.json')
+
+# Form 1728 sections in page order. Each line is a Disbursements/Hours field
+# pair, followed by the section total pair; the grand total comes last.
+FORM_SECTIONS = ('faith', 'family', 'community', 'life')
+FIRST_LINE_FIELD = 5
+
+# Lines that score below this against a section's line names roll up into the
+# section's Miscellaneous line
+MIN_LINE_SCORE = 0.45
+
+def load_form1728_lines(path: str = DEFAULT_FORM1728P_PROGRAMS) -> List[Dict[str, Any]]:
+    """
+    Reads form1728p_programs.json into survey lines keyed '<section>.<letter>'
+    ('faith.a' is the first Faith Activities line), with the form field pair
+    for the sections printed on the form.
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+    lines = []
+    field = FIRST_LINE_FIELD
+    for section, programs in data.items():
+        on_form = section in FORM_SECTIONS
+        for i, program in enumerate(programs):
+            line = {'key': f"{section}.{string.ascii_lowercase[i]}", 'section': section,
+                    'id': program['id'], 'name': program['name'],
+                    'fields': (f"Text{field}", f"Text{field + 1}") if on_form else None}
+            if on_form:
+                field += 2
+            lines.append(line)
+        if on_form:
+            # Skip the section total pair
+            field += 2
+    return lines
+
+def form1728_fields(lines: List[Dict[str, Any]]) -> Dict[str, Tuple[str, str]]:
+    """Field pairs for every line key plus '<section>.total' and 'total'"""
+    fields = {line['key']: line['fields'] for line in lines if line['fields']}
+    for section in FORM_SECTIONS:
+        last = max(int(line['fields'][0][4:]) for line in lines if line['section'] == section)
+        fields[f"{section}.total"] = (f"Text{last + 2}", f"Text{last + 3}")
+    last = max(int(pair[0][4:]) for pair in fields.values())
+    fields['total'] = (f"Text{last + 2}", f"Text{last + 3}")
+    return fields
+
+class SurveyLines:
+    """
+    The Form 1728 lines with each section's line names indexed once by a
+    ProgramMatcher. Shared by every council in a batch, so matching a program
+    name to a line is computed once per distinct (name, section).
+    """
+
+    def __init__(self, lines: List[Dict[str, Any]], min_score: float = MIN_LINE_SCORE):
+        self.lines = {line['key']: line for line in lines}
+        self.min_score = min_score
+        self._matchers = {}
+        self._misc = {}
+        self._cache = {}
+        by_section = defaultdict(list)
+        for line in lines:
+            by_section[line['section']].append(line)
+        for section, section_lines in by_section.items():
+            self._matchers[section] = ProgramMatcher([dict(line, category=section) for line in section_lines])
+            misc = [line for line in section_lines if line['name'].lower().startswith('miscellaneous')]
+            self._misc[section] = (misc or section_lines)[-1]['key']
+
+    def line_for(self, name: str, section: str) -> Optional[str]:
+        """
+        Line key for a program name within a survey section: the best-scoring
+        line, else the section's Miscellaneous line. Programs in other
+        categories (council, assembly) are not charitable and map to None.
+        """
+        key = (name, normalize(section))
+        if key not in self._cache:
+            matcher = self._matchers.get(key[1])
+            if matcher is None:
+                self._cache[key] = None
+            else:
+                match = matcher.match(name, self.min_score)
+                self._cache[key] = match['key'] if match else self._misc[key[1]]
+        return self._cache[key]
+
+class LineIndex:
+    """
+    Maps one council's programs to Form 1728 lines. Ledger rows resolve by
+    program id, then program name, then the section in a Sheets category.
+    """
+
+    def __init__(self, survey: SurveyLines, programs: Iterable[Dict[str, Any]] = ()):
+        self.survey = survey
+        self.by_id: Dict[str, Optional[str]] = {}
+        self.by_name: Dict[str, Optional[str]] = {}
+        for program in programs:
+            line = survey.line_for(program['name'], program.get('category') or '')
+            if program.get('id'):
+                self.by_id[program['id']] = line
+            self.by_name.setdefault(normalize(program['name']), line)
+
+    def resolve(self, program_id: str, program_name: str) -> Optional[str]:
+        if program_id and program_id in self.by_id:
+            return self.by_id[program_id]
+        key = normalize(program_name)
+        if key not in self.by_name:
+            # Sheets categories carry the section: 'E-Faith - Seminarian Donations'
+            hint, text = split_category(program_name)
+            self.by_name[key] = self.survey.line_for(text, hint) if hint else None
+        return self.by_name[key]
+
+def rollup_groups(index: LineIndex, groups: Iterable[Tuple[str, str, int, int]]) -> Dict[str, Any]:
+    """
+    Totals pre-grouped expenses ((program id, program name, total cents, entry
+    count) per program) into line, section and form totals. Disbursements are
+    positive cents.
+    """
+    lines = defaultdict(lambda: {'disbursement_cents': 0, 'entries': 0})
+    excluded = 0
+    for program_id, name, cents, count in groups:
+        key = index.resolve(program_id, name)
+        if key is None:
+            excluded += -cents
+            continue
+        lines[key]['disbursement_cents'] += -cents
+        lines[key]['entries'] += count
+    sections = defaultdict(int)
+    for key, line in lines.items():
+        sections[index.survey.lines[key]['section']] += line['disbursement_cents']
+    return {
+        'lines': dict(sorted(lines.items())),
+        'sections': dict(sections),
+        'total_cents': sum(sections[s] for s in FORM_SECTIONS),
+        'excluded_cents': excluded,
+    }
+
+def group_ledger_expenses(rows: Iterable[Dict[str, Any]], year: int) -> List[Tuple[str, str, int, int]]:
+    """Groups ledger rows (ledger.load_ledger format) by category for one year's expenses"""
+    totals = defaultdict(lambda: [0, 0])
+    for row in rows:
+        if row['date'].year == year and row['cents'] < 0:
+            totals[row['category']][0] += row['cents']
+            totals[row['category']][1] += 1
+    return [('', category, cents, count) for category, (cents, count) in totals.items()]
+
+def rollup_ledger(path: str, year: int, programs: Optional[List[Dict[str, Any]]] = None,
+                  lines: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Form 1728 totals for a single council from a ledger file"""
+    survey = SurveyLines(lines or load_form1728_lines())
+    programs = load_system_programs() if programs is None else programs
+    return rollup_groups(LineIndex(survey, programs), group_ledger_expenses(load_ledger(path), year))
+
+def rollup_mirror(conn, year: int, organization_ids: Optional[List[str]] = None,
+                  lines: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Form 1728 totals for many councils from the local mirror.
+
+    One grouped query sums every council's expenses for the year by program,
+    and one query reads every council's programs, so the cost is a single pass
+    over the year's ledger rows however many councils are rolled up.
+    """
+    survey = SurveyLines(lines or load_form1728_lines())
+    where, params = 'WHERE type = ? AND year = ?', ['expenses', str(year)]
+    if organization_ids:
+        where += f" AND organization_id IN ({', '.join('?' * len(organization_ids))})"
+        params += organization_ids
+    groups = defaultdict(list)
+    for row in conn.execute(f"SELECT organization_id, program_id, program_name, SUM(amount_cents), COUNT(*) "
+                            f"FROM entries {where} GROUP BY organization_id, program_id, program_name", params):
+        groups[row[0]].append(tuple(row[1:]))
+
+    programs = defaultdict(list)
+    program_where = where.replace('type = ? AND year = ?', '1')
+    for row in conn.execute(f"SELECT organization_id, id, name, category FROM programs {program_where}",
+                            params[2:]):
+        programs[row[0]].append({'id': row[1], 'name': row[2], 'category': row[3]})
+
+    return {organization_id: rollup_groups(LineIndex(survey, programs[organization_id]), groups[organization_id])
+            for organization_id in sorted(set(groups) | set(organization_ids or ()))}
+
+def _dollars(cents: int) -> str:
+    return f"{cents / 100:.2f}"
+
+def rollup_to_lines(rollup: Dict[str, Any]) -> Dict[str, Dict[str, str]]:
+    """Line totals in the {'faith.a': {'disbursement': '12.50'}} shape fillForm1728 accepts"""
+    return {key: {'disbursement': _dollars(line['disbursement_cents'])} for key, line in rollup['lines'].items()}
+
+def print_rollup(organization_id: str, rollup: Dict[str, Any], lines: List[Dict[str, Any]]):
+    names = {line['key']: line['name'] for line in lines}
+    print(f"\n{organization_id}: total ${_dollars(rollup['total_cents'])} "
+          f"(${_dollars(rollup['excluded_cents'])} in non-survey programs)")
+    for key, line in rollup['lines'].items():
+        print(f"  {key:<14} {names[key]:<45} ${_dollars(line['disbursement_cents']):>10} ({line['entries']} entries)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Roll the ledger up into Form 1728 survey lines')
+    parser.add_argument('--year', type=int, default=time.localtime().tm_year)
+    parser.add_argument('--ledger', help='Roll up one council from a Sheets CSV or ledger JSON file')
+    parser.add_argument('--mirror', help='Roll up councils from this local SQLite mirror')
+    parser.add_argument('--organization_id', action='append',
+                        help='Council to roll up from the mirror (repeatable; default every council)')
+    parser.add_argument('--output', help='Write the rollups as JSON to this file')
+    parser.add_argument('--fill_dir', help='Write a filled Form 1728 per council to this directory')
+    args = parser.parse_args(argv)
+
+    lines = load_form1728_lines()
+    if args.ledger:
+        rollups = {(args.organization_id or ['ledger'])[0]: rollup_ledger(args.ledger, args.year, lines=lines)}
+    else:
+        from local_mirror import DEFAULT_MIRROR, open_mirror
+        conn = open_mirror(args.mirror or DEFAULT_MIRROR)
+        rollups = rollup_mirror(conn, args.year, args.organization_id, lines)
+    for organization_id, rollup in rollups.items():
+        print_rollup(organization_id, rollup, lines)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'year': args.year, 'councils': rollups}, f, indent=2)
+        print(f"\nRollups written to: {args.output}")
+    if args.fill_dir:
+        from report_service import fill_report
+        os.makedirs(args.fill_dir, exist_ok=True)
+        for organization_id, rollup in rollups.items():
+            council = str(int(organization_id[1:])) if organization_id[1:].isdigit() else organization_id
+            body = {'surveyYear': str(args.year), 'council': council, 'lines': rollup_to_lines(rollup)}
+            pdf_bytes, _ = fill_report('fillForm1728', body)
+            with open(os.path.join(args.fill_dir, f"Form1728P_{organization_id}_{args.year}.pdf"), 'wb') as f:
+                f.write(pdf_bytes)
+        print(f"Filled {len(rollups)} forms into: {args.fill_dir}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,224 @@
+import argparse
+import glob
+import hashlib
+import html
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from pdf_source import open_source, pdf_reader
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_CACHE_DIR = os.environ.get('COUNCILFINANCES_PREVIEW_CACHE') or os.path.join(REPO_ROOT, '.preview_cache')
+DEFAULT_TEMPLATES = os.path.join(REPO_ROOT, 'assets', 'forms', '*.pdf')
+
+THUMBNAIL_DPI = 24
+PAGE_DPI = 100
+# Channel difference (0-255) below which a pixel counts as unchanged (antialiasing noise)
+DIFF_THRESHOLD = 48
+# Minimum share of field names a filled form must have in common with its template
+MIN_TEMPLATE_OVERLAP = 0.8
+
+_hashes: Dict[Tuple[str, int, int], str] = {}
+
+def file_hash(path: str) -> str:
+    """SHA-256 of a PDF's bytes, memoized per (path, size, mtime)"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    if key not in _hashes:
+        _hashes[key] = hashlib.sha256(open_source(path).view()).hexdigest()
+    return _hashes[key]
+
+def page_png(cache_dir: str, digest: str, page_num: int, dpi: int) -> str:
+    return os.path.join(cache_dir, f"{digest[:32]}-p{page_num + 1}-{dpi}dpi.png")
+
+def diff_png(cache_dir: str, template_digest: str, filled_digest: str, page_num: int, dpi: int) -> str:
+    return os.path.join(cache_dir, f"diff-{template_digest[:16]}-{filled_digest[:16]}-p{page_num + 1}-{dpi}dpi.png")
+
+def _save_png(image, path: str):
+    # Written atomically so concurrent runs can share the cache directory
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    image.save(tmp_path, 'PNG')
+    os.replace(tmp_path, path)
+
+# Per-process pdfium documents, reused by the pages of a form
+_documents: Dict[str, Any] = {}
+
+def _render_page(task: Tuple[str, int, int, str]) -> str:
+    path, page_num, dpi, png_path = task
+    if path not in _documents:
+        # pdfplumber's own renderer, called directly: its to_image never initializes the form
+        # environment, so filled values were not drawn. pdfium opens a path, not pdf_source's memory maps.
+        import pypdfium2
+        document = pypdfium2.PdfDocument(path)
+        document.init_forms()
+        _documents[path] = document
+    image = _documents[path][page_num].render(scale=dpi / 72, may_draw_forms=True).to_pil().convert('RGB')
+    _save_png(image, png_path)
+    return png_path
+
+def _close_documents():
+    while _documents:
+        _documents.popitem()[1].close()
+
+def diff_images(template_path: str, filled_path: str, output_path: str) -> Dict[str, Any]:
+    """
+    Compares a rendered template page with the same filled page. Changed
+    pixels are drawn in red over a faded copy of the filled page, and the
+    counts are stored next to the image so cache hits need no recompute.
+    """
+    from PIL import Image, ImageChops
+
+    with Image.open(template_path) as template_image, Image.open(filled_path) as filled_image:
+        template = template_image.convert('RGB')
+        filled = filled_image.convert('RGB')
+    if template.size != filled.size:
+        template = template.resize(filled.size)
+    mask = ImageChops.difference(template, filled).convert('L').point(lambda v: 255 if v > DIFF_THRESHOLD else 0)
+    changed = mask.histogram()[255]
+    overlay = Image.blend(filled, Image.new('RGB', filled.size, 'white'), 0.6)
+    overlay.paste(Image.new('RGB', filled.size, (220, 0, 0)), mask=mask)
+    _save_png(overlay, output_path)
+    stats = {'changed_pixels': changed, 'changed_ratio': changed / (filled.size[0] * filled.size[1]),
+             'bbox': list(mask.getbbox() or [])}
+    # The stats file is written last and marks the diff as cached
+    tmp_path = f"{output_path}.{os.getpid()}.json.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(stats, f)
+    os.replace(tmp_path, f"{output_path}.json")
+    return stats
+
+def _diff_task(task: Tuple[str, str, str]) -> Dict[str, Any]:
+    return diff_images(*task)
+
+def match_template(filled_path: str, templates: List[str]) -> Optional[str]:
+    """The template with the same page count whose field names overlap the filled form's the most"""
+    reader = pdf_reader(filled_path)
+    names = set(reader.get_fields() or {})
+    best, best_overlap = None, MIN_TEMPLATE_OVERLAP
+    for template in templates:
+        template_reader = pdf_reader(template)
+        if os.path.samefile(template, filled_path) or len(template_reader.pages) != len(reader.pages):
+            continue
+        template_names = set(template_reader.get_fields() or {})
+        if not names or not template_names:
+            continue
+        overlap = len(names & template_names) / len(names | template_names)
+        if overlap >= best_overlap:
+            best, best_overlap = template, overlap
+    return best
+
+def _run(function, tasks: list, workers: int) -> list:
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            return list(executor.map(function, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    results = [function(task) for task in tasks]
+    _close_documents()
+    return results
+
+def build_previews(paths: List[str], templates: Optional[List[str]] = None, cache_dir: str = DEFAULT_CACHE_DIR,
+                   dpis: Tuple[int, int] = (THUMBNAIL_DPI, PAGE_DPI), workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Renders thumbnails and full pages of filled forms and diffs them against
+    their templates.
+
+    Pages are cached as PNGs by (file hash, page, DPI) and diffs by (template
+    hash, filled hash, page, DPI), so a rerun only renders forms that changed.
+    Missing pages, template pages included, are rendered on a process pool,
+    then the missing diffs are computed on it.
+    """
+    workers = workers or os.cpu_count() or 1
+    thumbnail_dpi, page_dpi = dpis
+    os.makedirs(cache_dir, exist_ok=True)
+    pairs = {path: match_template(path, templates) if templates else None for path in paths}
+
+    renders = {}
+    for path in set(paths) | {t for t in pairs.values() if t}:
+        digest = file_hash(path)
+        for page_num in range(len(pdf_reader(path).pages)):
+            for dpi in (thumbnail_dpi, page_dpi):
+                png = page_png(cache_dir, digest, page_num, dpi)
+                if not os.path.exists(png):
+                    renders[png] = (path, page_num, dpi, png)
+    _run(_render_page, list(renders.values()), workers)
+
+    forms = []
+    diffs = {}
+    for path in paths:
+        digest = file_hash(path)
+        template = pairs[path]
+        pages = []
+        for page_num in range(len(pdf_reader(path).pages)):
+            page = {'page': page_num + 1, 'thumbnail': page_png(cache_dir, digest, page_num, thumbnail_dpi),
+                    'full': page_png(cache_dir, digest, page_num, page_dpi), 'diff': None}
+            if template:
+                template_digest = file_hash(template)
+                page['diff'] = diff_png(cache_dir, template_digest, digest, page_num, page_dpi)
+                if not os.path.exists(f"{page['diff']}.json"):
+                    diffs[page['diff']] = (page_png(cache_dir, template_digest, page_num, page_dpi),
+                                           page['full'], page['diff'])
+            pages.append(page)
+        forms.append({'path': path, 'template': template, 'pages': pages})
+    _run(_diff_task, list(diffs.values()), workers)
+
+    for form in forms:
+        for page in form['pages']:
+            if page['diff']:
+                with open(f"{page['diff']}.json", 'r') as f:
+                    page.update(json.load(f))
+    return {'forms': forms, 'rendered': len(renders), 'diffed': len(diffs)}
+
+def write_index(result: Dict[str, Any], output_path: str):
+    """Contact sheet: one row per form with its page thumbnails and template diffs, linking to full pages"""
+    base = os.path.dirname(os.path.abspath(output_path))
+
+    def link(path: str) -> str:
+        return html.escape(os.path.relpath(path, base))
+
+    rows = []
+    for form in result['forms']:
+        cells = []
+        for page in form['pages']:
+            cell = (f'<a href="{link(page["full"])}">'
+                    f'<img src="{link(page["thumbnail"])}" title="page {page["page"]}"></a>')
+            if page['diff']:
+                flag = ' class="unchanged"' if not page['changed_pixels'] else ''
+                cell += (f'<a href="{link(page["diff"])}"{flag}>{page["changed_ratio"]:.2%} changed</a>')
+            cells.append(f'<td>{cell}</td>')
+        template = html.escape(os.path.basename(form['template'])) if form['template'] else 'no template'
+        rows.append(f'<tr><th>{html.escape(os.path.basename(form["path"]))}<br><small>{template}</small></th>'
+                    f'{"".join(cells)}</tr>')
+    with open(output_path, 'w') as f:
+        f.write('<!DOCTYPE html>\n<html><head><meta charset="utf-8"><title>Form previews</title>\n'
+                '<style>body{font-family:sans-serif}td,th{vertical-align:top;padding:4px;text-align:left}'
+                'img{border:1px solid #ccc;display:block}.unchanged{color:#c00;font-weight:bold}</style>\n'
+                f'</head><body><h1>Form previews ({len(result["forms"])} forms)</h1>\n<table>\n'
+                + '\n'.join(rows) + '\n</table></body></html>\n')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Render previews of filled forms and diff them against templates')
+    parser.add_argument('pdfs', nargs='+', help='Filled form PDFs')
+    parser.add_argument('--templates', nargs='*', default=sorted(glob.glob(DEFAULT_TEMPLATES)),
+                        help='Blank forms to diff against, matched by field names (default: assets/forms)')
+    parser.add_argument('--cache_dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--thumbnail_dpi', type=int, default=THUMBNAIL_DPI)
+    parser.add_argument('--dpi', type=int, default=PAGE_DPI, help='Resolution of full pages and diffs')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--output', default='form_previews.html', help='Contact sheet HTML')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    result = build_previews(args.pdfs, args.templates, args.cache_dir, (args.thumbnail_dpi, args.dpi), args.workers)
+    for form in result['forms']:
+        changes = ', '.join(f"p{p['page']} {p['changed_ratio']:.2%}" for p in form['pages'] if p['diff'])
+        template = os.path.basename(form['template']) if form['template'] else 'no template'
+        print(f"{form['path']}: {len(form['pages'])} pages vs {template}{f' ({changes})' if changes else ''}")
+    write_index(result, args.output)
+    print(f"\n{result['rendered']} pages rendered, {result['diffed']} diffs computed "
+          f"in {time.perf_counter() - start:.2f}s")
+    print(f"Contact sheet written to: {args.output}")
+
+if __name__ == '__main__':
+    main()
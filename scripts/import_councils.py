@@ -0,0 +1,170 @@
+import argparse
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+MAX_WORKERS = 4
+# Firestore sustains roughly 500 writes/s per database before ramp-up limits apply
+WRITES_PER_SECOND = 400.0
+
+class TokenBucket:
+    """Limits writes to `rate` per second with bursts of up to `capacity`"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                wait = (tokens - self.tokens) / self.rate
+            time.sleep(wait)
+
+def load_manifest(path: str) -> List[Dict[str, Any]]:
+    """
+    Reads the (organization, input file) pairs to import.
+
+    JSON: [{"organization_id": "C015857", "input": "c15857.json", "kind": "entries"}, ...]
+    CSV: organization_id,input[,kind] with a header row.
+    kind is "entries" (financial entries JSON, the default) or "programs"
+    (custom programs JSON). Relative inputs are resolved against the manifest.
+    """
+    with open(path, 'r', newline='') as f:
+        if path.endswith('.csv'):
+            jobs = [dict(row) for row in csv.DictReader(f)]
+        else:
+            jobs = json.load(f)
+    base = os.path.dirname(os.path.abspath(path))
+    for job in jobs:
+        job['kind'] = job.get('kind') or 'entries'
+        if job['kind'] not in ('entries', 'programs'):
+            raise ValueError(f"Unknown kind for {job['organization_id']}: {job['kind']}")
+        job['input'] = os.path.join(base, job['input'])
+    return jobs
+
+# Per-process state, set up by _init_worker
+_throttle = None
+
+def _init_worker(credentials_path: Optional[str], writes_per_second: float):
+    global _throttle
+    if credentials_path:
+        from firebase_app import set_credentials_path
+        set_credentials_path(credentials_path)
+    _throttle = TokenBucket(writes_per_second)
+
+def import_organization(job: Dict[str, Any], mirror_path: Optional[str] = None) -> Dict[str, Any]:
+    """Runs one manifest entry in a worker, reporting failure instead of raising"""
+    result = {'organization_id': job['organization_id'], 'kind': job['kind'], 'input': job['input'],
+              'pid': os.getpid(), 'ok': False, 'processed': 0, 'imported': 0, 'errors': 0}
+    start = time.perf_counter()
+    try:
+        if job['kind'] == 'programs':
+            from program_catalog import build_catalog, changeset_writes, sync_program_catalog
+            from firebase_app import get_db
+            catalog = build_catalog(custom_programs=job['input'], include_missing=False)
+            changeset = sync_program_catalog(get_db(), job['organization_id'], catalog)
+            writes = changeset_writes(changeset)
+            result.update(processed=len(catalog), imported=writes)
+        else:
+            from import_financial_entries import import_financial_entries
+            result.update(import_financial_entries(job['organization_id'], job['input'], mirror_path,
+                                                   throttle=_throttle, verbose=False))
+        result['ok'] = True
+    except Exception as e:
+        result['error'] = f"{type(e).__name__}: {e}"
+        print(f"[{job['organization_id']}] Import failed: {result['error']}")
+    result['seconds'] = time.perf_counter() - start
+    return result
+
+def _run_isolated(job: Dict[str, Any], mirror_path: Optional[str], credentials_path: Optional[str],
+                  writes_per_second: float) -> Dict[str, Any]:
+    # A process of its own per organization: a worker that dies (segfault, OOM kill) breaks
+    # only its own pool, where a shared pool would terminate every import still running
+    with ProcessPoolExecutor(max_workers=1, initializer=_init_worker,
+                             initargs=(credentials_path, writes_per_second)) as executor:
+        try:
+            return executor.submit(import_organization, job, mirror_path).result()
+        except BrokenProcessPool as e:
+            return {'organization_id': job['organization_id'], 'kind': job['kind'], 'input': job['input'],
+                    'ok': False, 'processed': 0, 'imported': 0, 'errors': 0, 'error': f"worker died: {e}"}
+
+def print_report(results: List[Dict[str, Any]], elapsed: float):
+    print("\nImport summary:")
+    for r in sorted(results, key=lambda r: r['organization_id']):
+        status = 'ok' if r['ok'] else f"FAILED ({r.get('error', 'unknown error')})"
+        rate = r['imported'] / r['seconds'] if r.get('seconds') else 0.0
+        print(f"  {r['organization_id']} {r['kind']}: {r['imported']}/{r['processed']} imported, "
+              f"{r['errors']} errors, {r.get('seconds', 0.0):.1f}s ({rate:.1f}/s) - {status}")
+    imported = sum(r['imported'] for r in results)
+    failed = sorted(r['organization_id'] for r in results if not r['ok'])
+    print(f"\n  Organizations: {len(results) - len(failed)} succeeded, {len(failed)} failed")
+    print(f"  Entries imported: {imported} in {elapsed:.1f}s ({imported / elapsed if elapsed else 0.0:.1f}/s)")
+    if failed:
+        print(f"  Failed: {', '.join(failed)}")
+
+def import_councils(jobs: List[Dict[str, Any]], max_workers: int = MAX_WORKERS,
+                    writes_per_second: float = WRITES_PER_SECOND, mirror_path: Optional[str] = None,
+                    credentials_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Imports many organizations at once, one manifest entry per task.
+
+    Organizations run at most max_workers at a time, largest input first so the
+    long imports start early. Each organization gets a worker process with its
+    own Firestore client and an equal share of the write budget, so a failing
+    organization, even one whose worker dies, only fails its own entry in the report.
+    """
+    jobs = sorted(jobs, key=lambda j: os.path.getsize(j['input']) if os.path.exists(j['input']) else 0,
+                  reverse=True)
+    workers = max(1, min(max_workers, len(jobs)))
+    print(f"Importing {len(jobs)} organizations with {workers} workers "
+          f"({writes_per_second / workers:.0f} writes/s each)")
+
+    start = time.perf_counter()
+    results = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(_run_isolated, job, mirror_path, credentials_path, writes_per_second / workers)
+                   for job in jobs]
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"[{len(results)}/{len(jobs)}] {result['organization_id']} "
+                  f"{'done' if result['ok'] else 'failed'}: {result['imported']} imported")
+
+    print_report(results, time.perf_counter() - start)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Import many organizations from a manifest')
+    parser.add_argument('manifest', help='JSON or CSV manifest of organization_id, input[, kind]')
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS)
+    parser.add_argument('--writes_per_second', type=float, default=WRITES_PER_SECOND,
+                        help='Total write budget shared across workers')
+    parser.add_argument('--mirror', help='Resolve programs from this local SQLite mirror')
+    parser.add_argument('--credentials', help='Firebase service account JSON for the workers')
+    parser.add_argument('--report', help='Write the per-organization results to this JSON file')
+    args = parser.parse_args(argv)
+
+    results = import_councils(load_manifest(args.manifest), args.workers, args.writes_per_second,
+                              args.mirror, args.credentials)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Report written to: {args.report}")
+    return 0 if all(r['ok'] for r in results) else 1
+
+if __name__ == '__main__':
+    raise SystemExit(main())
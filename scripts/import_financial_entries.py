@@ -1,8 +1,12 @@
 import json
 import os
-import firebase_admin
-from firebase_admin import credentials, firestore
-from datetime import datetime
+from datetime import datetime, timezone
+
+from duplicate_detector import DuplicateGuard, mirror_ledger
+from firebase_app import get_db, server_timestamp
+from program_matcher import ProgramMatcher, load_firestore_programs
+from program_catalog import load_app_programs
+from validation import DeadLetterFile, ValidationStage, ledger_entry_validator
 
 def parse_amount(amount_str):
     # Remove $ and convert to float
@@ -30,39 +34,59 @@ def get_program_id(db, organization_id, program_name):
     
     return docs[0].id
 
-def get_program_data(db, organization_id, program_name):
-    # Query programs collection to find matching program
-    programs_ref = db.collection('organizations').document(organization_id).collection('programs')
-    # Get all programs and find a case-insensitive match
-    docs = programs_ref.get()
-    
-    for doc in docs:
-        data = doc.to_dict()
-        if data['name'].lower() == program_name.lower():
-            return {
-                'id': doc.id,
-                'name': data['name'],  # Use the exact name from Firestore
-                'category': data['category'],  # Use the exact category from Firestore
-                'isSystemDefault': data.get('isSystemDefault', False),
-                'financialType': data.get('financialType', 'both'),
-                'isEnabled': data.get('isEnabled', True)
-            }
-    
-    raise Exception(f"Program not found: {program_name}")
+def find_program(programs_by_name, program_name, matcher=None, amount=None):
+    # Exact, case-insensitive lookup in the programs read once per import. Only with a
+    # matcher (fuzzy_programs) does a miss fall back to the best fuzzy match, which is logged
+    program = programs_by_name.get(program_name.lower())
+    if program is None and matcher is not None:
+        program = matcher.match(program_name, amount=amount)
+        if program:
+            print(f"  ~ Fuzzy program match: {program_name!r} -> {program['name']!r} (score {program['score']:.2f})")
+    return program
+
+def get_program_data(programs_by_name, program_name, matcher=None, amount=None):
+    program = find_program(programs_by_name, program_name, matcher, amount)
+    if not program:
+        raise Exception(f"Program not found: {program_name}")
+    return {
+        'id': program['id'],
+        'name': program['name'],  # Use the exact name from Firestore
+        'category': program['category'],  # Use the exact category from Firestore
+        'isSystemDefault': program.get('isSystemDefault', False),
+        'financialType': program.get('financialType', 'both'),
+        'isEnabled': program.get('isEnabled', True)
+    }
 
-def import_financial_entries(organization_id: str, json_file: str):
+def import_financial_entries(organization_id: str, json_file: str, mirror_path: str = None,
+                             throttle=None, verbose: bool = True, dead_letter_file: str = None,
+                             duplicates: str = 'warn', fuzzy_programs: bool = False):
+    # throttle: optional object whose acquire(n) blocks until n writes may be issued
+    # Rejected entries go to <json_file>_rejected.jsonl unless another path is given
+    # duplicates: 'warn' reports duplicates before importing, 'skip' also routes entries already in the
+    # ledger to the dead-letter file, 'off' disables the check. The existing ledger is read from the
+    # mirror, so without one only duplicates within the file are found.
+    # fuzzy_programs: program names without an exact (case-insensitive) match take the best fuzzy
+    # match instead of being rejected; every such match is logged
     print(f"Starting import from {json_file} for organization {organization_id}")
     
-    # Initialize Firebase Admin SDK
-    cred_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 
-                            'council-finance-firebase-adminsdk-e5auu-46ccb83881.json')
-    print(f"Using credentials from {cred_path}")
-    cred = credentials.Certificate(cred_path)
-    firebase_admin.initialize_app(cred)
+    # Shared Firestore client
+    db = get_db()
     
-    # Get Firestore client
-    db = firestore.client()
-    print("Connected to Firestore")
+    # Read the programs collection once (or from the local mirror) for lookups by name
+    if mirror_path:
+        from local_mirror import list_programs, open_mirror, upsert_entry
+        from search_index import update_search_index
+        mirror = open_mirror(mirror_path)
+        programs = list_programs(mirror, organization_id)
+    else:
+        programs = load_firestore_programs(db, organization_id)
+    # The app loads its shipped programs from assets rather than Firestore
+    programs += load_app_programs(organization_id.startswith('A'))
+    programs_by_name = {}
+    for program in programs:
+        programs_by_name.setdefault(program['name'].lower(), program)
+    matcher = ProgramMatcher(programs) if fuzzy_programs else None
+    print(f"Indexed {len(programs)} programs{' (fuzzy matching on)' if fuzzy_programs else ''}")
     
     # Get finance collection reference
     finance_ref = db.collection('organizations').document(organization_id).collection('finance')
@@ -72,18 +96,32 @@ def import_financial_entries(organization_id: str, json_file: str):
     with open(json_file, 'r') as f:
         entries = json.load(f)
     
-    row_count = 0
+    # Entries with missing fields, bad values or unknown programs are routed to the dead-letter file
+    dead_letter = DeadLetterFile(dead_letter_file or f"{os.path.splitext(json_file)[0]}_rejected.jsonl",
+                                 source=json_file)
+    validate = ValidationStage(ledger_entry_validator(lambda name: name.lower() in programs_by_name
+                                                      or (matcher is not None and matcher.match(name) is not None)),
+                               dead_letter, verbose)
+    
     imported_count = 0
+    error_count = 0
+    skipped_count = 0
+    
+    rows = validate(enumerate(entries, start=1))
+    guard = None
+    if duplicates != 'off':
+        rows = list(rows)
+        guard = DuplicateGuard(rows, mirror_ledger(mirror, organization_id) if mirror_path else None)
+        guard.print_summary()
     
-    for entry in entries:
-        row_count += 1
+    for row_count, entry in rows:
+        if duplicates == 'skip' and guard.reason(row_count):
+            skipped_count += 1
+            dead_letter.write(row_count, entry, [guard.reason(row_count)])
+            if verbose:
+                print(f"Skipping row {row_count}: {guard.reason(row_count)}")
+            continue
         try:
-            # Skip entries without required fields
-            required_fields = ['date', 'amount', 'description', 'programId', 'programName', 'paymentMethod']
-            if not all(field in entry for field in required_fields):
-                print(f"Skipping entry {row_count}: Missing required fields")
-                continue
-            
             # Get the year from the timestamp
             year = datetime.fromtimestamp(entry['date']['_seconds']).year
             
@@ -92,7 +130,7 @@ def import_financial_entries(organization_id: str, json_file: str):
             entry_type = 'expenses' if is_expense else 'income'
             
             # Get program data
-            program_data = get_program_data(db, organization_id, entry['programName'])
+            program_data = get_program_data(programs_by_name, entry['programName'], matcher, entry['amount'])
             
             # Create a new document with auto-generated ID
             doc_ref = finance_ref.document(entry_type).collection(str(year)).document()
@@ -100,40 +138,66 @@ def import_financial_entries(organization_id: str, json_file: str):
             # Convert timestamp objects using firestore client
             entry_data = {
                 'id': doc_ref.id,
-                'date': firestore.SERVER_TIMESTAMP,  # This will be converted to the current server time
+                'date': server_timestamp(),  # This will be converted to the current server time
                 'program': program_data,
                 'amount': abs(entry['amount']),
                 'paymentMethod': entry['paymentMethod'],
                 'description': entry['description'],
                 'isExpense': is_expense,
-                'createdAt': firestore.SERVER_TIMESTAMP,
-                'updatedAt': firestore.SERVER_TIMESTAMP,
+                'createdAt': server_timestamp(),
+                'updatedAt': server_timestamp(),
                 'createdBy': entry['createdBy'],
                 'updatedBy': entry['updatedBy']
             }
             
             # Set the actual date from the entry data
+            if throttle:
+                throttle.acquire(2)
             doc_ref.set(entry_data)
-            doc_ref.update({
+            # updatedAt stays the server time of this import: the mirror and ledger
+            # summaries watch it for changes, so the source's is kept separately
+            dates = {
                 'date': datetime.fromtimestamp(entry['date']['_seconds']),
                 'createdAt': datetime.fromtimestamp(entry['createdAt']['_seconds']),
-                'updatedAt': datetime.fromtimestamp(entry['updatedAt']['_seconds'])
-            })
+                'sourceUpdatedAt': datetime.fromtimestamp(entry['updatedAt']['_seconds'])
+            }
+            doc_ref.update(dates)
+            
+            # Keep the mirror (and its search index) in step with what was written
+            # (committed per entry so parallel council imports do not hold the write lock)
+            if mirror_path:
+                with mirror:
+                    upsert_entry(mirror, organization_id, entry_type, str(year), doc_ref.id,
+                                 dict(entry_data, updatedAt=datetime.now(timezone.utc), **dates))
             
             # Add check number if payment method is check
             if entry['paymentMethod'].lower() == 'check' and 'checkNumber' in entry:
                 entry_data['checkNumber'] = entry['checkNumber']
             
             imported_count += 1
-            print(f"  ✓ Imported entry {row_count} successfully")
+            if verbose:
+                print(f"  ✓ Imported entry {row_count} successfully")
+            elif imported_count % 100 == 0:
+                print(f"[{organization_id}] {row_count}/{len(entries)} entries processed")
             
         except Exception as e:
-            print(f"  ✗ Error processing entry {row_count}: {str(e)}")
+            error_count += 1
+            prefix = '' if verbose else f"[{organization_id}] "
+            print(f"  ✗ {prefix}Error processing entry {row_count}: {str(e)}")
             continue
     
-    print(f"\nImport complete:")
-    print(f"  Total entries processed: {row_count}")
+    dead_letter.close()
+    if mirror_path:
+        update_search_index(mirror)
+    
+    print(f"\nImport complete{'' if verbose else f' for {organization_id}'}:")
+    print(f"  Total entries processed: {len(entries)}")
     print(f"  Successfully imported: {imported_count}")
+    if skipped_count:
+        print(f"  Skipped as already imported: {skipped_count}")
+    validate.print_summary()
+    return {'processed': len(entries), 'imported': imported_count, 'errors': error_count,
+            'rejected': validate.rejected, 'duplicates': skipped_count}
 
 if __name__ == '__main__':
     # Import financial entries for Council 15857
@@ -0,0 +1,159 @@
+import csv
+import json
+import re
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List
+
+# Finance entries live under organizations/{org}/finance/{income|expenses}/{year}
+FINANCE_TYPES = ('income', 'expenses')
+
+# PaymentMethod enum names (stored by the app) -> display names (stored by the importer),
+# from lib/src/models/payment_method.dart
+PAYMENT_METHOD_NAMES = {'cash': 'Cash', 'check': 'Check', 'debitCard': 'Debit Card', 'square': 'Square'}
+
+_NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+
+def payment_method_key(value: str) -> str:
+    """Compares payment methods across spellings: 'debitCard', 'Debit Card' and 'debit card' share a key"""
+    return _NON_ALNUM_RE.sub('', (value or '').lower())
+
+def stored_payment_methods(method: str) -> List[str]:
+    """The values a payment method can be stored as: the app's enum name and the importer's display name"""
+    key = payment_method_key(method)
+    forms = [method]
+    for name, display_name in PAYMENT_METHOD_NAMES.items():
+        if payment_method_key(name) == key:
+            forms += [name, display_name]
+    return list(dict.fromkeys(forms))
+
+def parse_amount(amount_str) -> float:
+    # Remove $ and thousands separators and convert to float
+    if isinstance(amount_str, str):
+        amount_str = amount_str.replace('$', '').replace(',', '').strip()
+    return float(amount_str)
+
+def to_cents(amount) -> int:
+    """Converts a dollar amount (number or '$1,234.56' string) to integer cents"""
+    return int(round(parse_amount(amount) * 100))
+
+def parse_date(date_str: str) -> datetime:
+    # Handle the MM/DD/YYYY and MM/DD/YY formats used in the Sheets export
+    try:
+        return datetime.strptime(date_str.strip(), '%m/%d/%Y')
+    except ValueError:
+        return datetime.strptime(date_str.strip(), '%m/%d/%y')
+
+def read_transactions_csv(csv_file: str) -> Iterator[Dict[str, Any]]:
+    """
+    Reads the Google Sheets transactions export and yields normalized ledger rows.
+
+    Rows keep their 1-based CSV row number so results can be traced back to the sheet.
+    """
+    with open(csv_file, 'r', newline='') as f:
+        reader = csv.reader(f)
+        header_row = next(reader)
+        # The export has a leading empty column
+        skip = 1 if header_row and not header_row[0].strip() else 0
+        header = [h.strip() for h in header_row[skip:]]
+        for row_number, row in enumerate(reader, start=2):
+            data = dict(zip(header, row[skip:]))
+            if not all(data.get(field) for field in ['Category', 'Date', 'Amount']):
+                continue
+            try:
+                entry_date = parse_date(data['Date']).date()
+                cents = to_cents(data['Amount'])
+            except ValueError:
+                continue
+            yield {
+                'row': row_number,
+                'date': entry_date,
+                'cents': cents,
+                'category': data['Category'].strip(),
+                'description': data.get('Recipient/Cause', '').strip(),
+                'paymentMethod': data.get('Transaction Type', '').strip(),
+                'cleared': bool(data.get('Cleared', '').strip()),
+                'combinedTotal': data.get('Combined Total', '').strip(),
+            }
+
+def from_ledger_entry(entry: Dict[str, Any], row: int) -> Dict[str, Any]:
+    """Normalizes a compact ledger entry (financial_entries.json format) to a ledger row"""
+    return {
+        'row': row,
+        'date': datetime.fromtimestamp(to_seconds(entry['date']), tz=timezone.utc).date(),
+        'cents': to_cents(entry['amount']),
+        'category': entry.get('programName', ''),
+        'description': entry.get('description', ''),
+        'paymentMethod': entry.get('paymentMethod', ''),
+        'cleared': bool(entry.get('cleared', False)),
+        'combinedTotal': '',
+    }
+
+def load_ledger(path: str) -> List[Dict[str, Any]]:
+    """Loads ledger rows from the Sheets CSV export, financial_entries.json or a ledger JSON Lines export"""
+    if path.endswith('.csv'):
+        return list(read_transactions_csv(path))
+    with open(path, 'r') as f:
+        if path.endswith('.jsonl'):
+            entries = [json.loads(line) for line in f if line.strip()]
+        else:
+            entries = json.load(f)
+    return [from_ledger_entry(entry, i) for i, entry in enumerate(entries, start=1)]
+
+def finance_ref(db, organization_id: str):
+    """Returns the finance collection reference for an organization"""
+    return db.collection('organizations').document(organization_id).collection('finance')
+
+def to_seconds(value) -> int:
+    """Converts a Firestore timestamp, {'_seconds': ...} dict, ISO string or epoch to epoch seconds"""
+    if value is None:
+        return 0
+    if isinstance(value, dict):
+        return int(value.get('_seconds', 0))
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    if isinstance(value, str):
+        return to_seconds(datetime.fromisoformat(value.replace('Z', '+00:00')))
+    return int(value)
+
+def program_name(data: Dict[str, Any]) -> str:
+    """Program name as stored by the app (programName) or by the importer (program.name)"""
+    return data.get('programName') or (data.get('program') or {}).get('name') or ''
+
+def program_id(data: Dict[str, Any]) -> str:
+    """Program id as stored by the app (programId) or by the importer (program.id)"""
+    return data.get('programId') or (data.get('program') or {}).get('id') or ''
+
+def to_json_safe(value):
+    """Recursively converts Firestore timestamps to ISO strings so the value can be JSON encoded"""
+    if isinstance(value, dict):
+        return {k: to_json_safe(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [to_json_safe(v) for v in value]
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+def to_ledger_entry(data: Dict[str, Any], entry_type: str) -> Dict[str, Any]:
+    """
+    Converts a Firestore finance document to the compact ledger format read by
+    import_financial_entries.py (signed amount, flat program fields, {'_seconds'} dates).
+    """
+    is_expense = data.get('isExpense', entry_type == 'expenses')
+    amount = abs(float(data.get('amount', 0)))
+    entry = {
+        'date': {'_seconds': to_seconds(data.get('date')), '_nanoseconds': 0},
+        'amount': -amount if is_expense and amount else amount,
+        'description': data.get('description', ''),
+        'programId': program_id(data),
+        'programName': program_name(data),
+        'paymentMethod': data.get('paymentMethod', ''),
+        'createdAt': {'_seconds': to_seconds(data.get('createdAt')), '_nanoseconds': 0},
+        'updatedAt': {'_seconds': to_seconds(data.get('updatedAt')), '_nanoseconds': 0},
+        'createdBy': data.get('createdBy', ''),
+        'updatedBy': data.get('updatedBy', ''),
+    }
+    if data.get('checkNumber'):
+        entry['checkNumber'] = data['checkNumber']
+    return entry
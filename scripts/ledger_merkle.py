@@ -0,0 +1,240 @@
+import argparse
+import hashlib
+import json
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ledger import FINANCE_TYPES, finance_ref, from_ledger_entry, load_ledger, to_ledger_entry, to_seconds
+from program_matcher import normalize
+
+# Year summaries are stored at organizations/{org}/finance_merkle/{year}
+SUMMARY_COLLECTION = 'finance_merkle'
+SUMMARY_VERSION = 1
+HASH_BYTES = 16
+
+def canonical_entry(row: Dict[str, Any]) -> bytes:
+    """
+    Source-independent encoding of a ledger row: date, signed cents and the
+    normalized description and payment method. Programs are left out because
+    the Sheets export only has its own category names.
+    """
+    return '\x1f'.join((row['date'].isoformat(), str(row['cents']), normalize(row['description']),
+                        normalize(row['paymentMethod']))).encode('utf-8')
+
+def describe_entry(encoded: bytes) -> str:
+    day, cents, description, method = encoded.decode('utf-8').split('\x1f')
+    return f"{day} {int(cents) / 100:>10.2f} {description} ({method})"
+
+def _digest(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=HASH_BYTES).hexdigest()
+
+def _combine(children: Dict[str, str]) -> str:
+    # Parent hash over the sorted (key, child hash) pairs
+    return _digest(''.join(f"{key}={value};" for key, value in sorted(children.items())).encode())
+
+class YearTree:
+    """
+    Hash tree of one year of a ledger: entry encodings -> day -> month -> year.
+
+    A day hashes the sorted encodings of its entries, so the order rows come
+    in does not matter and repeated identical entries still count.
+    """
+
+    def __init__(self, year: str, rows: Iterable[Dict[str, Any]]):
+        self.year = year
+        self.entries: Dict[str, List[bytes]] = defaultdict(list)
+        for row in rows:
+            self.entries[row['date'].isoformat()].append(canonical_entry(row))
+        self.days = {day: _digest(b'\n'.join(sorted(encoded))) for day, encoded in self.entries.items()}
+        months = defaultdict(dict)
+        for day, day_hash in self.days.items():
+            months[day[:7]][day] = day_hash
+        self.months = {month: _combine(days) for month, days in months.items()}
+        self.root = _combine(self.months)
+
+    def summary(self) -> Dict[str, Any]:
+        return {'version': SUMMARY_VERSION, 'year': self.year, 'root': self.root,
+                'months': self.months, 'days': self.days}
+
+def build_trees(rows: Iterable[Dict[str, Any]]) -> Dict[str, YearTree]:
+    by_year = defaultdict(list)
+    for row in rows:
+        by_year[str(row['date'].year)].append(row)
+    return {year: YearTree(year, year_rows) for year, year_rows in by_year.items()}
+
+def differing_days(local: Dict[str, Any], remote: Dict[str, Any]) -> List[str]:
+    """Days whose hashes differ, descending from the root only into months that differ"""
+    if local['root'] == remote['root']:
+        return []
+    days = []
+    for month in sorted(set(local['months']) | set(remote['months'])):
+        if local['months'].get(month) == remote['months'].get(month):
+            continue
+        for day in sorted({d for d in local['days'] if d.startswith(month)} |
+                          {d for d in remote['days'] if d.startswith(month)}):
+            if local['days'].get(day) != remote['days'].get(day):
+                days.append(day)
+    return days
+
+def diff_day(local: List[bytes], remote: List[bytes]) -> Tuple[List[bytes], List[bytes]]:
+    """(local only, remote only) entry encodings of one day, as multisets"""
+    local_count, remote_count = Counter(local), Counter(remote)
+    return sorted((local_count - remote_count).elements()), sorted((remote_count - local_count).elements())
+
+def _rows_from_docs(docs, entry_type: str) -> List[Dict[str, Any]]:
+    return [from_ledger_entry(to_ledger_entry(doc.to_dict() or {}, entry_type), doc.id) for doc in docs]
+
+def summary_ref(db, organization_id: str, year: str):
+    return db.collection('organizations').document(organization_id).collection(SUMMARY_COLLECTION).document(year)
+
+def partition_state(db, organization_id: str, year: str) -> Dict[str, List[int]]:
+    """
+    [document count, latest updatedAt] of each finance partition of a year:
+    two reads per partition. A changed state means the stored summary is stale.
+    """
+    state = {}
+    for entry_type in FINANCE_TYPES:
+        ref = finance_ref(db, organization_id).document(entry_type).collection(year)
+        count = ref.count().get()[0][0].value
+        latest = list(ref.order_by('updatedAt', direction='DESCENDING').limit(1).select(['updatedAt']).stream())
+        state[entry_type] = [int(count), to_seconds((latest[0].to_dict() or {}).get('updatedAt')) if latest else 0]
+    return state
+
+def read_year(db, organization_id: str, year: str) -> List[Dict[str, Any]]:
+    """Every entry of a year from Firestore, as ledger rows"""
+    from export_financial_entries import iter_partition_pages
+    rows = []
+    for entry_type in FINANCE_TYPES:
+        for docs in iter_partition_pages(db, organization_id, entry_type, year):
+            rows.extend(_rows_from_docs(docs, entry_type))
+    return rows
+
+def _day_ranges(days: List[str]) -> List[Tuple[date, date]]:
+    # Consecutive days merge into one [first, last] range
+    ranges = []
+    for day in sorted(date.fromisoformat(d) for d in days):
+        if ranges and ranges[-1][1] + timedelta(days=1) == day:
+            ranges[-1] = (ranges[-1][0], day)
+        else:
+            ranges.append((day, day))
+    return ranges
+
+def read_days(db, organization_id: str, year: str, days: List[str]) -> List[Dict[str, Any]]:
+    """The Firestore entries dated on the given days only, one query per run of consecutive days"""
+    rows = []
+    for first, last in _day_ranges(days):
+        start = datetime(first.year, first.month, first.day, tzinfo=timezone.utc)
+        end = datetime(last.year, last.month, last.day, tzinfo=timezone.utc) + timedelta(days=1)
+        for entry_type in FINANCE_TYPES:
+            query = (finance_ref(db, organization_id).document(entry_type).collection(year)
+                     .where('date', '>=', start).where('date', '<', end))
+            rows.extend(_rows_from_docs(query.stream(), entry_type))
+    return rows
+
+def verify_year(db, organization_id: str, local: YearTree, refresh: bool = False) -> Dict[str, Any]:
+    """
+    Compares a local year tree with the Firestore year.
+
+    The stored summary (one read) is trusted while the partition state (four
+    reads) still matches the one saved with it; otherwise, or with refresh,
+    the year is read in full and the summary rewritten. Only the entries of
+    days whose hashes differ are then read from Firestore.
+    """
+    year = local.year
+    reads = 1 + 2 * len(FINANCE_TYPES)
+    ref = summary_ref(db, organization_id, year)
+    snapshot = ref.get()
+    summary = snapshot.to_dict() if snapshot.exists else None
+    state = partition_state(db, organization_id, year)
+
+    remote_entries = None
+    rebuilt = refresh or summary is None or summary.get('version') != SUMMARY_VERSION or summary.get('state') != state
+    if rebuilt:
+        rows = read_year(db, organization_id, year)
+        reads += len(rows)
+        remote = YearTree(year, rows)
+        summary = dict(remote.summary(), state=state, computedAt=datetime.now(timezone.utc))
+        ref.set(summary)
+        remote_entries = remote.entries
+
+    days = differing_days(local.summary(), summary)
+    if days and remote_entries is None:
+        rows = read_days(db, organization_id, year, days)
+        reads += len(rows)
+        remote_entries = YearTree(year, rows).entries
+    return _year_result(year, local, summary, days, remote_entries, reads, rebuilt)
+
+def verify_year_against(local: YearTree, remote: YearTree) -> Dict[str, Any]:
+    """Compares two in-memory year trees (e.g. the Sheets export against the local mirror)"""
+    days = differing_days(local.summary(), remote.summary())
+    return _year_result(local.year, local, remote.summary(), days, remote.entries, 0, rebuilt=False)
+
+def _year_result(year: str, local: YearTree, summary: Dict[str, Any], days: List[str],
+                 remote_entries: Optional[Dict[str, List[bytes]]], reads: int, rebuilt: bool) -> Dict[str, Any]:
+    differences = []
+    for day in days:
+        local_only, remote_only = diff_day(local.entries.get(day, []), (remote_entries or {}).get(day, []))
+        differences.append({'day': day, 'local_only': [describe_entry(e) for e in local_only],
+                            'remote_only': [describe_entry(e) for e in remote_only]})
+    return {
+        'year': year,
+        'match': not days,
+        'local_root': local.root,
+        'remote_root': summary['root'],
+        'months_differing': sorted({day[:7] for day in days}),
+        'differences': differences,
+        'reads': reads,
+        'summary_rebuilt': rebuilt,
+    }
+
+def print_result(result: Dict[str, Any], limit: int = 20):
+    status = 'match' if result['match'] else f"{len(result['differences'])} days differ"
+    rebuilt = ', summary rebuilt' if result['summary_rebuilt'] else ''
+    print(f"\n{result['year']}: {status} ({result['reads']} reads{rebuilt})")
+    for difference in result['differences'][:limit]:
+        print(f"  {difference['day']}")
+        for entry in difference['local_only']:
+            print(f"    local only:  {entry}")
+        for entry in difference['remote_only']:
+            print(f"    remote only: {entry}")
+    if len(result['differences']) > limit:
+        print(f"  ... {len(result['differences']) - limit} more days in the report")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Diff the local ledger against Firestore with per-year hash trees')
+    parser.add_argument('ledger', nargs='?', default='2025 Council 15857 Finances - Transactions.csv',
+                        help='Sheets CSV export, financial_entries.json or ledger JSON Lines')
+    parser.add_argument('--organization_id', default='C015857')
+    parser.add_argument('--years', nargs='+', help='Years to verify (default: every year in the local ledger)')
+    parser.add_argument('--refresh', action='store_true', help='Reread the Firestore years and rewrite their summaries')
+    parser.add_argument('--mirror', help='Compare against this local SQLite mirror instead of Firestore')
+    parser.add_argument('--report', help='Also write the results to this JSON file')
+    args = parser.parse_args(argv)
+
+    local_trees = build_trees(load_ledger(args.ledger))
+    years = args.years or sorted(local_trees)
+    print(f"Verifying {len(years)} years of {args.ledger} for organization {args.organization_id}")
+
+    if args.mirror:
+        from duplicate_detector import mirror_ledger
+        from local_mirror import open_mirror
+        remote_trees = build_trees(mirror_ledger(open_mirror(args.mirror), args.organization_id))
+        results = [verify_year_against(local_trees.get(year) or YearTree(year, []),
+                                       remote_trees.get(year) or YearTree(year, [])) for year in years]
+    else:
+        from firebase_app import get_db
+        db = get_db()
+        results = [verify_year(db, args.organization_id, local_trees.get(year) or YearTree(year, []), args.refresh)
+                   for year in years]
+
+    for result in results:
+        print_result(result)
+    print(f"\nTotal Firestore reads: {sum(result['reads'] for result in results)}")
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Report saved to: {args.report}")
+
+if __name__ == '__main__':
+    main()
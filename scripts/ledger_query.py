@@ -0,0 +1,333 @@
+import argparse
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ledger import (FINANCE_TYPES, finance_ref, from_ledger_entry, payment_method_key, program_id,
+                    stored_payment_methods, to_ledger_entry)
+from program_matcher import normalize
+
+try:
+    from google.api_core.exceptions import FailedPrecondition
+except ImportError:
+    class FailedPrecondition(Exception):
+        pass
+
+# Only the fields a ledger row is built from are fetched
+QUERY_FIELDS = ['date', 'amount', 'description', 'programId', 'programName', 'program', 'paymentMethod', 'isExpense']
+# Firestore accepts at most 30 values in an 'in' filter
+MAX_IN_VALUES = 30
+MAX_WORKERS = 8
+GROUP_KEYS = ('type', 'year', 'month', 'program', 'paymentMethod')
+# Group keys known without reading entries, so their totals can come from sum aggregations
+PARTITION_KEYS = ('type', 'year')
+
+# Year collections found to lack the composite (paymentMethod, date) index; indexes are per collection id
+_unindexed_years = set()
+
+def _to_date(value) -> date:
+    return value if isinstance(value, date) else date.fromisoformat(value)
+
+def _midnight(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+class LedgerQuery:
+    """
+    Lazy, immutable query over an organization's Firestore ledger, e.g.
+
+        LedgerQuery(db, 'C015857').types('expenses').between('2025-01-01', '2025-03-31')
+            .payment_methods('Check').group_by('program').totals()
+
+    Nothing is read until run(), rows() or totals(). Filters compile per
+    {income|expenses}/{year} partition: entry types and the date range pick
+    the partitions, the date range becomes where clauses on `date`, payment
+    methods an 'in' filter and a limit order_by('date').limit(n). Programs
+    (stored as programName/programId by the app and program.name/id by the
+    importer) and where() predicates are evaluated locally on the rows read.
+    """
+
+    def __init__(self, db, organization_id: str, entry_types: Tuple[str, ...] = FINANCE_TYPES,
+                 start: Optional[date] = None, end: Optional[date] = None, methods: Tuple[str, ...] = (),
+                 programs: Tuple[str, ...] = (), predicates: Tuple[Callable, ...] = (),
+                 row_limit: Optional[int] = None, keys: Tuple[str, ...] = ()):
+        self._db = db
+        self._organization_id = organization_id
+        self._entry_types = entry_types
+        self._start = start
+        self._end = end
+        self._methods = methods
+        self._programs = programs
+        self._predicates = predicates
+        self._limit = row_limit
+        self._keys = keys
+
+    def _copy(self, **changes) -> 'LedgerQuery':
+        state = {'entry_types': self._entry_types, 'start': self._start, 'end': self._end,
+                 'methods': self._methods, 'programs': self._programs, 'predicates': self._predicates,
+                 'row_limit': self._limit, 'keys': self._keys}
+        state.update(changes)
+        return LedgerQuery(self._db, self._organization_id, **state)
+
+    def types(self, *entry_types: str) -> 'LedgerQuery':
+        unknown = set(entry_types) - set(FINANCE_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown entry types: {', '.join(sorted(unknown))}")
+        return self._copy(entry_types=tuple(t for t in FINANCE_TYPES if t in entry_types))
+
+    def between(self, start=None, end=None) -> 'LedgerQuery':
+        """Entries dated from start through end (inclusive), as dates or ISO strings; either may be None"""
+        return self._copy(start=_to_date(start) if start else None, end=_to_date(end) if end else None)
+
+    def payment_methods(self, *methods: str) -> 'LedgerQuery':
+        """Entries paid by these methods, given as the app's enum names or display names ('check', 'Check')"""
+        return self._copy(methods=tuple(methods))
+
+    def _stored_methods(self) -> List[str]:
+        # The app stores enum names and the importer display names; 'in' compares exactly, so both go in
+        return list(dict.fromkeys(form for method in self._methods for form in stored_payment_methods(method)))
+
+    def programs(self, *programs: str) -> 'LedgerQuery':
+        """Entries of these programs, given by name (case and punctuation insensitive) or id"""
+        return self._copy(programs=tuple(programs))
+
+    def where(self, predicate: Callable[[Dict[str, Any]], bool]) -> 'LedgerQuery':
+        """Keeps the rows the predicate accepts; always evaluated locally"""
+        return self._copy(predicates=self._predicates + (predicate,))
+
+    def limit(self, count: int) -> 'LedgerQuery':
+        """The first count rows by date"""
+        return self._copy(row_limit=count)
+
+    def group_by(self, *keys: str) -> 'LedgerQuery':
+        unknown = set(keys) - set(GROUP_KEYS)
+        if unknown:
+            raise ValueError(f"Unknown group keys: {', '.join(sorted(unknown))} (expected {', '.join(GROUP_KEYS)})")
+        return self._copy(keys=tuple(keys))
+
+    # Compilation
+
+    def _partitions(self) -> Tuple[List[Tuple[str, str]], int]:
+        """The (type, year) partitions the date range reaches, and the reads spent finding them"""
+        if self._start and self._end:
+            years = [str(year) for year in range(self._start.year, self._end.year + 1)]
+            return [(entry_type, year) for year in years for entry_type in self._entry_types], 0
+        # An open range lists the year collections of each type, a read apiece
+        partitions = []
+        finance = finance_ref(self._db, self._organization_id)
+        for entry_type in self._entry_types:
+            for year_ref in finance.document(entry_type).collections():
+                if not year_ref.id.isdigit():
+                    continue
+                if (self._start and int(year_ref.id) < self._start.year) or \
+                        (self._end and int(year_ref.id) > self._end.year):
+                    continue
+                partitions.append((entry_type, year_ref.id))
+        return sorted(partitions, key=lambda p: (p[1], FINANCE_TYPES.index(p[0]))), len(self._entry_types)
+
+    def _push_methods(self, year: str) -> bool:
+        # 'in' on paymentMethod next to a date range or ordering needs a composite index
+        if not self._methods or len(self._stored_methods()) > MAX_IN_VALUES:
+            return False
+        needs_index = self._start or self._end or self._limit is not None
+        return not (needs_index and year in _unindexed_years)
+
+    def _compile(self, entry_type: str, year: str) -> Tuple[Any, List[str], List[str]]:
+        """The Firestore query of one partition, with the clauses pushed down and those left to evaluate locally"""
+        query = finance_ref(self._db, self._organization_id).document(entry_type).collection(year)
+        pushed, local = [], []
+        if self._start:
+            query = query.where('date', '>=', _midnight(self._start))
+            pushed.append(f"date >= {self._start.isoformat()}")
+        if self._end:
+            query = query.where('date', '<', _midnight(self._end) + timedelta(days=1))
+            pushed.append(f"date < {(self._end + timedelta(days=1)).isoformat()}")
+        if self._push_methods(year):
+            query = query.where('paymentMethod', 'in', self._stored_methods())
+            pushed.append(f"paymentMethod in {self._stored_methods()}")
+        elif self._methods:
+            local.append(f"paymentMethod in {list(self._methods)}")
+        if self._programs:
+            local.append(f"program in {list(self._programs)}")
+        if self._predicates:
+            local.append(f"{len(self._predicates)} where() predicates")
+        if self._limit is not None and not local:
+            query = query.order_by('date').limit(self._limit)
+            pushed.append(f"order_by date limit {self._limit}")
+        return query, pushed, local
+
+    def _aggregable(self) -> bool:
+        return (set(self._keys) <= set(PARTITION_KEYS) and self._limit is None and not self._programs
+                and not self._predicates and (not self._methods or len(self._stored_methods()) <= MAX_IN_VALUES))
+
+    def _plan(self, partitions: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        plan = []
+        for entry_type, year in partitions:
+            _, pushed, local = self._compile(entry_type, year)
+            plan.append({'partition': f"{entry_type}/{year}", 'pushed': pushed, 'local': local})
+        return plan
+
+    def explain(self) -> List[Dict[str, Any]]:
+        """The plan of each partition, without reading any entries"""
+        return self._plan(self._partitions()[0])
+
+    # Execution
+
+    def _matches(self, row: Dict[str, Any]) -> bool:
+        if self._methods:
+            # Normalized, so 'check', 'Check' and 'CHECK' are the same method
+            if payment_method_key(row['paymentMethod']) not in {payment_method_key(m) for m in self._methods}:
+                return False
+        if self._programs:
+            wanted = {normalize(p) for p in self._programs}
+            if normalize(row['category']) not in wanted and row['programId'] not in self._programs:
+                return False
+        return all(predicate(row) for predicate in self._predicates)
+
+    def _read_partition(self, partition: Tuple[str, str]) -> Tuple[List[Dict[str, Any]], int]:
+        entry_type, year = partition
+        query, _, _ = self._compile(entry_type, year)
+        try:
+            docs = list(query.select(QUERY_FIELDS).stream())
+        except FailedPrecondition as e:
+            if not self._push_methods(year):
+                raise
+            _unindexed_years.add(year)
+            print(f"No composite index on paymentMethod and date for {year}; filtering payment methods locally "
+                  f"({e})")
+            return self._read_partition(partition)
+        rows = []
+        for doc in docs:
+            data = doc.to_dict() or {}
+            row = from_ledger_entry(to_ledger_entry(data, entry_type), doc.id)
+            row.update(type=entry_type, year=year, programId=program_id(data))
+            if self._matches(row):
+                rows.append(row)
+        return rows, max(1, len(docs))
+
+    def _sum_partition(self, partition: Tuple[str, str]) -> Tuple[int, int]:
+        # Amounts are stored unsigned; every entry of a partition takes the partition's sign
+        entry_type, year = partition
+        if self._methods and not self._push_methods(year):
+            return self._sum_rows(partition)
+        query, _, _ = self._compile(entry_type, year)
+        try:
+            total = query.sum('amount').get()[0][0].value
+        except FailedPrecondition:
+            _unindexed_years.add(year)
+            return self._sum_rows(partition)
+        cents = int(round(float(total or 0) * 100))
+        return (-cents if entry_type == 'expenses' else cents), 1
+
+    def _sum_rows(self, partition: Tuple[str, str]) -> Tuple[int, int]:
+        rows, reads = self._read_partition(partition)
+        return sum(row['cents'] for row in rows), reads
+
+    def _map(self, function, partitions: List[Tuple[str, str]]) -> list:
+        if len(partitions) < 2:
+            return [function(partition) for partition in partitions]
+        with ThreadPoolExecutor(max_workers=min(MAX_WORKERS, len(partitions))) as executor:
+            return list(executor.map(function, partitions))
+
+    def _group(self, row: Dict[str, Any]) -> Tuple[str, ...]:
+        values = {'type': row['type'], 'year': row['year'], 'month': row['date'].isoformat()[:7],
+                  'program': row['category'], 'paymentMethod': row['paymentMethod']}
+        return tuple(values[key] for key in self._keys)
+
+    def run(self, aggregate: bool = True) -> Dict[str, Any]:
+        """
+        Reads the partitions concurrently and returns the matching rows (by
+        date, at most the limit) and the total cents of each group, along with
+        the plan and the Firestore reads spent. When the whole query pushes
+        down and only groups by type and year, the totals come from one sum
+        aggregation per partition (a read per 1000 entries) and no rows are
+        returned.
+        """
+        partitions, list_reads = self._partitions()
+        if aggregate and self._aggregable():
+            sums = self._map(self._sum_partition, partitions)
+            totals = defaultdict(int)
+            for (entry_type, year), (cents, _) in zip(partitions, sums):
+                totals[self._group({'type': entry_type, 'year': year, 'date': date(int(year), 1, 1),
+                                    'category': '', 'paymentMethod': ''})] += cents
+            return {'rows': None, 'totals': dict(totals), 'reads': list_reads + sum(reads for _, reads in sums),
+                    'partitions': len(partitions), 'plan': self._plan(partitions)}
+
+        results = self._map(self._read_partition, partitions)
+        rows = sorted((row for partition_rows, _ in results for row in partition_rows),
+                      key=lambda row: (row['date'], row['type'], row['row']))
+        if self._limit is not None:
+            rows = rows[:self._limit]
+        totals = defaultdict(int)
+        for row in rows:
+            totals[self._group(row)] += row['cents']
+        # Planned after reading, so payment methods moved to local filtering for a missing index show up
+        return {'rows': rows, 'totals': dict(totals), 'reads': list_reads + sum(reads for _, reads in results),
+                'partitions': len(partitions), 'plan': self._plan(partitions)}
+
+    def rows(self) -> List[Dict[str, Any]]:
+        return self.run(aggregate=False)['rows']
+
+    def totals(self) -> Dict[Tuple[str, ...], int]:
+        """Signed cents by group key tuple (the empty tuple without group_by)"""
+        return self.run()['totals']
+
+def print_plan(plan: List[Dict[str, Any]]):
+    for step in plan:
+        local = f"; local: {', '.join(step['local'])}" if step['local'] else ''
+        print(f"  {step['partition']}: {', '.join(step['pushed']) or 'whole partition'}{local}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Query the Firestore ledger, filtering in Firestore where possible')
+    parser.add_argument('--organization_id', default='C015857')
+    parser.add_argument('--types', nargs='+', choices=FINANCE_TYPES, default=list(FINANCE_TYPES))
+    parser.add_argument('--start', help='First date (YYYY-MM-DD)')
+    parser.add_argument('--end', help='Last date (YYYY-MM-DD), inclusive')
+    parser.add_argument('--methods', nargs='+', default=[], help="Payment methods ('check' or 'Check')")
+    parser.add_argument('--programs', nargs='+', default=[], help='Program names or ids')
+    parser.add_argument('--min_amount', type=float, help='Smallest absolute amount in dollars (local filter)')
+    parser.add_argument('--group_by', nargs='+', default=[], choices=GROUP_KEYS)
+    parser.add_argument('--limit', type=int, help='First N entries by date')
+    parser.add_argument('--explain', action='store_true', help='Print the plan without reading entries')
+    parser.add_argument('--output', help='Write the matching entries to this JSON Lines file')
+    args = parser.parse_args(argv)
+
+    from firebase_app import get_db
+    query = (LedgerQuery(get_db(), args.organization_id).types(*args.types).between(args.start, args.end)
+             .payment_methods(*args.methods).programs(*args.programs).group_by(*args.group_by))
+    if args.min_amount is not None:
+        min_cents = round(args.min_amount * 100)
+        query = query.where(lambda row: abs(row['cents']) >= min_cents)
+    if args.limit is not None:
+        query = query.limit(args.limit)
+
+    if args.explain:
+        plan = query.explain()
+        print(f"Plan over {len(plan)} partitions:")
+        print_plan(plan)
+        return
+
+    start = time.perf_counter()
+    result = query.run(aggregate=not args.output and not args.limit)
+    print(f"Plan over {result['partitions']} partitions:")
+    print_plan(result['plan'])
+    if result['rows'] is not None and not args.group_by:
+        print()
+        for row in result['rows']:
+            print(f"{row['date']} {row['cents'] / 100:>10.2f} {row['category'][:24]:<24} "
+                  f"{row['paymentMethod'][:12]:<12} {row['description']}")
+    print()
+    for key, cents in sorted(result['totals'].items()):
+        print(f"{' / '.join(key) or 'Total'}: {cents / 100:,.2f}")
+    matched = f"{len(result['rows'])} entries, " if result['rows'] is not None else ''
+    print(f"\n{matched}{result['reads']} Firestore reads in {time.perf_counter() - start:.2f}s")
+    if args.output:
+        with open(args.output, 'w') as f:
+            for row in result['rows']:
+                f.write(json.dumps(dict(row, date=row['date'].isoformat())) + '\n')
+        print(f"Entries written to: {args.output}")
+
+if __name__ == '__main__':
+    main()
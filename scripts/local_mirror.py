@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from export_financial_entries import list_partitions
+from firebase_app import get_db
+from ledger import finance_ref, program_id, program_name, to_cents, to_json_safe, to_seconds
+from search_index import update_search_index
+
+DEFAULT_MIRROR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'councilfinances_mirror.sqlite')
+PAGE_SIZE = 500
+MAX_WORKERS = 8
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS programs (
+    organization_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    category TEXT,
+    financial_type TEXT,
+    is_system_default INTEGER,
+    is_enabled INTEGER,
+    is_assembly INTEGER,
+    updated_at INTEGER,
+    data TEXT,
+    PRIMARY KEY (organization_id, id)
+);
+CREATE INDEX IF NOT EXISTS programs_by_name ON programs (organization_id, name COLLATE NOCASE);
+
+CREATE TABLE IF NOT EXISTS entries (
+    organization_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    year TEXT NOT NULL,
+    id TEXT NOT NULL,
+    date INTEGER NOT NULL,
+    program_id TEXT,
+    program_name TEXT,
+    amount_cents INTEGER NOT NULL,
+    payment_method TEXT,
+    description TEXT,
+    updated_at INTEGER,
+    data TEXT,
+    PRIMARY KEY (organization_id, type, year, id)
+);
+CREATE INDEX IF NOT EXISTS entries_by_date ON entries (organization_id, date);
+CREATE INDEX IF NOT EXISTS entries_by_program ON entries (organization_id, program_name COLLATE NOCASE, date);
+CREATE INDEX IF NOT EXISTS entries_by_type ON entries (organization_id, type, date);
+
+CREATE TABLE IF NOT EXISTS sync_state (
+    organization_id TEXT NOT NULL,
+    partition TEXT NOT NULL,
+    watermark INTEGER NOT NULL,
+    synced_at INTEGER NOT NULL,
+    PRIMARY KEY (organization_id, partition)
+);
+"""
+
+def open_mirror(path: str = DEFAULT_MIRROR) -> sqlite3.Connection:
+    """Opens (and creates if needed) the local mirror database"""
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(SCHEMA)
+    return conn
+
+def _get_watermark(conn: sqlite3.Connection, organization_id: str, partition: str) -> Optional[int]:
+    row = conn.execute('SELECT watermark FROM sync_state WHERE organization_id = ? AND partition = ?',
+                       (organization_id, partition)).fetchone()
+    return row['watermark'] if row else None
+
+def _set_watermark(conn: sqlite3.Connection, organization_id: str, partition: str, watermark: int):
+    conn.execute('INSERT OR REPLACE INTO sync_state (organization_id, partition, watermark, synced_at) '
+                 'VALUES (?, ?, ?, ?)',
+                 (organization_id, partition, watermark, int(datetime.now(timezone.utc).timestamp())))
+
+def _fetch_changes(collection_ref, watermark: Optional[int], page_size: int = PAGE_SIZE) -> list:
+    """
+    Reads documents updated at or after the watermark, or the whole collection
+    when there is no watermark yet. Pages with a cursor ordered by updatedAt.
+    """
+    if watermark is None:
+        return list(collection_ref.get())
+    since = datetime.fromtimestamp(watermark, tz=timezone.utc)
+    query = collection_ref.where('updatedAt', '>=', since).order_by('updatedAt')
+    docs = []
+    last = None
+    while True:
+        page_query = query.limit(page_size)
+        if last is not None:
+            page_query = page_query.start_after(last)
+        page = list(page_query.stream())
+        docs.extend(page)
+        if len(page) < page_size:
+            return docs
+        last = page[-1]
+
+def _upsert_programs(conn: sqlite3.Connection, organization_id: str, docs: list) -> int:
+    watermark = 0
+    for doc in docs:
+        if doc.id == 'states':
+            continue
+        data = doc.to_dict() or {}
+        updated_at = to_seconds(data.get('updatedAt') or data.get('createdAt'))
+        watermark = max(watermark, updated_at)
+        conn.execute(
+            'INSERT OR REPLACE INTO programs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (organization_id, doc.id, data.get('name', ''), data.get('category', ''),
+             data.get('financialType', 'both'), int(data.get('isSystemDefault', False)),
+             int(data.get('isEnabled', True)), int(data.get('isAssembly', False)),
+             updated_at, json.dumps(to_json_safe(data))))
+    return watermark
+
+def upsert_entry(conn: sqlite3.Connection, organization_id: str, entry_type: str, year: str, doc_id: str,
+                 data: Dict[str, Any]) -> int:
+    """Writes one finance document to the mirror and returns its updatedAt seconds"""
+    updated_at = to_seconds(data.get('updatedAt'))
+    cents = abs(to_cents(data.get('amount', 0)))
+    if data.get('isExpense', entry_type == 'expenses'):
+        cents = -cents
+    conn.execute(
+        'INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+        (organization_id, entry_type, year, doc_id, to_seconds(data.get('date')),
+         program_id(data), program_name(data), cents, data.get('paymentMethod', ''),
+         data.get('description', ''), updated_at, json.dumps(to_json_safe(data))))
+    return updated_at
+
+def _upsert_entries(conn: sqlite3.Connection, organization_id: str, entry_type: str, year: str, docs: list) -> int:
+    watermark = 0
+    for doc in docs:
+        watermark = max(watermark, upsert_entry(conn, organization_id, entry_type, year, doc.id, doc.to_dict() or {}))
+    return watermark
+
+def sync_mirror(db, conn: sqlite3.Connection, organization_id: str, full: bool = False,
+                max_workers: int = MAX_WORKERS) -> Dict[str, int]:
+    """
+    Brings the mirror up to date with Firestore for one organization.
+
+    Each finance type/year partition keeps its own updatedAt watermark, so after
+    the first sync only changed documents are read. Programs are always read in
+    full: the collection is small and the app creates programs without updatedAt.
+    Finance documents deleted in Firestore are only picked up by a full resync
+    (`full=True`), which also prunes deleted rows.
+    """
+    org_ref = db.collection('organizations').document(organization_id)
+    partitions = [('programs', None, None)] + [
+        (f"{entry_type}/{year}", entry_type, year) for entry_type, year in list_partitions(db, organization_id)
+    ]
+
+    # Watermarks are read up front; the sqlite connection stays on this thread
+    watermarks = {name: _get_watermark(conn, organization_id, name) for name, _, _ in partitions}
+
+    def fetch_partition(partition):
+        name, entry_type, year = partition
+        watermark = None if full or entry_type is None else watermarks[name]
+        if entry_type is None:
+            ref = org_ref.collection('programs')
+        else:
+            ref = finance_ref(db, organization_id).document(entry_type).collection(year)
+        return partition, watermark, _fetch_changes(ref, watermark)
+
+    counts = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for (name, entry_type, year), watermark, docs in executor.map(fetch_partition, partitions):
+            with conn:
+                if watermark is None:
+                    # Full read: replace the partition so deletions are reflected
+                    if entry_type is None:
+                        conn.execute('DELETE FROM programs WHERE organization_id = ?', (organization_id,))
+                    else:
+                        conn.execute('DELETE FROM entries WHERE organization_id = ? AND type = ? AND year = ?',
+                                     (organization_id, entry_type, year))
+                if entry_type is None:
+                    latest = _upsert_programs(conn, organization_id, docs)
+                else:
+                    latest = _upsert_entries(conn, organization_id, entry_type, year, docs)
+                _set_watermark(conn, organization_id, name, max(latest, watermark or 0))
+            counts[name] = len(docs)
+            print(f"  {name}: {len(docs)} {'documents' if watermark is None else 'changes'}")
+    indexed = update_search_index(conn)
+    if indexed:
+        print(f"  search index: {indexed} entries updated")
+    return counts
+
+def list_programs(conn: sqlite3.Connection, organization_id: str) -> List[Dict[str, Any]]:
+    """Programs in the same shape as program_matcher.load_firestore_programs"""
+    rows = conn.execute('SELECT * FROM programs WHERE organization_id = ? ORDER BY name', (organization_id,))
+    return [{
+        'id': row['id'],
+        'name': row['name'],
+        'category': row['category'],
+        'isSystemDefault': bool(row['is_system_default']),
+        'financialType': row['financial_type'],
+        'isEnabled': bool(row['is_enabled']),
+        'source': 'mirror',
+    } for row in rows]
+
+def find_program(conn: sqlite3.Connection, organization_id: str, name: str) -> Optional[Dict[str, Any]]:
+    """Case-insensitive program lookup by name"""
+    row = conn.execute('SELECT data FROM programs WHERE organization_id = ? AND name = ? COLLATE NOCASE LIMIT 1',
+                       (organization_id, name)).fetchone()
+    return json.loads(row['data']) if row else None
+
+def query_entries(conn: sqlite3.Connection, organization_id: str, start: Optional[datetime] = None,
+                  end: Optional[datetime] = None, program: Optional[str] = None,
+                  entry_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Ledger entries filtered by date range (inclusive), program name and type"""
+    sql = 'SELECT * FROM entries WHERE organization_id = ?'
+    params: list = [organization_id]
+    if entry_type:
+        sql += ' AND type = ?'
+        params.append(entry_type)
+    if program:
+        sql += ' AND program_name = ? COLLATE NOCASE'
+        params.append(program)
+    if start:
+        sql += ' AND date >= ?'
+        params.append(to_seconds(start))
+    if end:
+        sql += ' AND date <= ?'
+        params.append(to_seconds(end))
+    sql += ' ORDER BY date, id'
+    return [dict(row) for row in conn.execute(sql, params)]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sync a local SQLite mirror of Firestore programs and ledger')
+    parser.add_argument('--organization_id', default='C015857')
+    parser.add_argument('--mirror', default=DEFAULT_MIRROR, help='SQLite mirror path')
+    parser.add_argument('--full', action='store_true', help='Ignore watermarks and resync everything')
+    args = parser.parse_args(argv)
+    db = get_db()
+
+    conn = open_mirror(args.mirror)
+    print(f"Syncing organization {args.organization_id} into {args.mirror}")
+    counts = sync_mirror(db, conn, args.organization_id, args.full)
+    print(f"\nSync complete: {sum(counts.values())} documents read")
+
+if __name__ == '__main__':
+    main()
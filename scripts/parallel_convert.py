@@ -0,0 +1,178 @@
+import argparse
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from convert_csv_to_json import clean_entries, clear_state, read_sheet_rows
+from validation import DeadLetterFile, ValidationStage, csv_row_validator
+
+# Chunks per worker; more, smaller chunks even out uneven rows
+CHUNKS_PER_WORKER = 4
+MIN_CHUNK_BYTES = 1 << 16
+
+def header_end(data: bytes) -> int:
+    """Offset just past the header record"""
+    return record_boundaries(data, 0, [0])[0] if data else 0
+
+def record_boundaries(data: bytes, start: int, targets: List[int]) -> List[int]:
+    """
+    For each target offset (ascending), the first record boundary at or after
+    it: the offset just past a newline that is outside quotes. Quote state is
+    the parity of '"' bytes since `start`, which must itself be a boundary;
+    escaped quotes ("") count twice and keep the parity.
+    """
+    boundaries = []
+    quotes = 0
+    pos = start
+    for target in targets:
+        if boundaries and target < boundaries[-1]:
+            target = boundaries[-1]
+        quotes += data.count(b'"', pos, target)
+        pos = max(pos, target)
+        while True:
+            newline = data.find(b'\n', pos)
+            if newline == -1:
+                boundaries.append(len(data))
+                return boundaries
+            quotes += data.count(b'"', pos, newline)
+            pos = newline + 1
+            if quotes % 2 == 0:
+                boundaries.append(pos)
+                break
+    return boundaries
+
+def split_chunks(data: bytes, start: int, chunks: int) -> List[Tuple[int, int]]:
+    """Splits data[start:] into up to `chunks` byte ranges that end on record boundaries"""
+    size = len(data)
+    chunks = max(1, min(chunks, (size - start) // MIN_CHUNK_BYTES or 1))
+    step = (size - start) / chunks
+    ends = record_boundaries(data, start, [start + int(step * i) for i in range(1, chunks)]) + [size]
+    ranges = []
+    for end in ends:
+        begin = ranges[-1][1] if ranges else start
+        if end > begin:
+            ranges.append((begin, end))
+    return ranges
+
+_encode_string = json.encoder.encode_basestring_ascii
+
+def encode_entry(entry: Dict[str, Any]) -> str:
+    """
+    One entry laid out as an item of json.dump(entries, indent=2). CSV entries
+    are flat str -> str dicts, which are encoded directly with the C string
+    encoder instead of the pure-Python indenting encoder.
+    """
+    if entry and all(type(v) is str for v in entry.values()):
+        return '  {\n' + ',\n'.join(f"    {_encode_string(k)}: {_encode_string(v)}" for k, v in entry.items()) + '\n  }'
+    return '\n'.join('  ' + line for line in json.dumps(entry, indent=2).split('\n'))
+
+# Per-process state, set up by _init_worker
+_header: List[str] = []
+_validate = None
+
+def _init_worker(header: List[str]):
+    global _header, _validate
+    _header = header
+    _validate = csv_row_validator(header)
+
+def _parse_chunk(task: Tuple[str, int, int, bool]) -> Dict[str, Any]:
+    """
+    Parses, validates and serializes one byte range. Row numbers are local to
+    the chunk and renumbered when the chunks are merged. Entries only travel
+    back to the parent when asked for; the JSON text is enough to write the
+    output.
+    """
+    path, start, end, return_entries = task
+    with open(path, 'rb') as f:
+        f.seek(start)
+        text = f.read(end - start).decode('utf-8')
+    rows = list(csv.reader(io.StringIO(text, newline='')))
+    accepted, rejects = [], []
+    for row, data in read_sheet_rows(rows, _header):
+        reasons = _validate(data)
+        if reasons:
+            rejects.append((row, data, reasons))
+        else:
+            accepted.append((row, data))
+    entries = list(clean_entries(accepted))
+    # Serialized exactly as json.dump(entries, indent=2) lays out array items
+    fragment = ',\n'.join(map(encode_entry, entries))
+    return {'rows': len(rows), 'accepted': len(entries), 'entries': entries if return_entries else None,
+            'fragment': fragment, 'rejects': rejects}
+
+def convert_csv_parallel(csv_file: str, json_file: str, dead_letter_file: str = None,
+                         workers: int = None, return_entries: bool = False) -> Optional[List[Dict[str, Any]]]:
+    """
+    Converts a Sheets CSV export to JSON on several cores.
+
+    The file is split into byte ranges that end on record boundaries (newlines
+    outside quotes, so quoted multi-line fields stay whole). Each worker parses,
+    validates and JSON-encodes its ranges; the results are merged in file
+    order, rows are renumbered and rejects go to the dead-letter file, so the
+    output matches convert_csv_to_json byte for byte. The converted entries
+    are returned only with return_entries, since shipping them back from the
+    workers costs about as much as parsing.
+    """
+    workers = workers or os.cpu_count() or 1
+    dead_letter_file = dead_letter_file or f"{os.path.splitext(json_file)[0]}_rejected.jsonl"
+    with open(csv_file, 'rb') as f:
+        data = f.read()
+    start = header_end(data)
+    header_row = next(csv.reader(io.StringIO(data[:start].decode('utf-8'), newline='')), [])
+    # Read header row and remove leading empty field
+    header = [h.strip() for h in header_row[1:]]
+    print("Found header:", header)
+    ranges = split_chunks(data, start, workers * CHUNKS_PER_WORKER)
+    del data
+    print(f"Parsing {len(ranges)} chunks with {workers} workers")
+
+    entries = [] if return_entries else None
+    converted = 0
+    fragments = []
+    stage = ValidationStage(None)
+    row_offset = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(header,)) as executor, \
+            DeadLetterFile(dead_letter_file, source=csv_file) as dead_letter:
+        for result in executor.map(_parse_chunk, [(csv_file, begin, end, return_entries) for begin, end in ranges]):
+            for row, record, reasons in result['rejects']:
+                dead_letter.write(row + row_offset, record, reasons)
+                stage.reasons.update(reason.split(':', 1)[0] for reason in reasons)
+                print(f"Skipping row {row + row_offset}: {'; '.join(reasons)}")
+            stage.accepted += result['accepted']
+            stage.rejected += len(result['rejects'])
+            row_offset += result['rows']
+            converted += result['accepted']
+            if return_entries:
+                entries.extend(result['entries'])
+            if result['fragment']:
+                fragments.append(result['fragment'])
+        stage.dead_letter = dead_letter
+
+    with open(json_file, 'w') as f:
+        f.write('[\n' + ',\n'.join(fragments) + '\n]' if fragments else '[]')
+    clear_state(json_file)
+
+    print("\nConversion complete:")
+    print(f"Total rows processed: {stage.accepted + stage.rejected}")
+    print(f"Total entries converted: {converted}")
+    print(f"Output written to: {json_file}")
+    stage.print_summary()
+    return entries
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Convert a large Sheets CSV export to JSON on several cores')
+    parser.add_argument('csv_file')
+    parser.add_argument('--output', default='financial_entries.json')
+    parser.add_argument('--dead_letter', help='Rejected rows JSON Lines (default: <output>_rejected.jsonl)')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    args = parser.parse_args(argv)
+    start = time.perf_counter()
+    convert_csv_parallel(args.csv_file, args.output, args.dead_letter, args.workers)
+    print(f"Finished in {time.perf_counter() - start:.2f}s")
+
+if __name__ == '__main__':
+    main()
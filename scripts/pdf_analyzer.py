@@ -1,37 +1,51 @@
 from PyPDF2 import PdfReader
-import pdfplumber
 import sys
 import json
 from typing import Dict, Any
 
+from pdf_source import pdf_reader
+from word_cache import get_word_cache
+
 def get_field_context(pdf_path: str, page_num: int, rect: list, margin: int = 20) -> str:
     """Extract text near a field's rectangle to identify its purpose"""
     if not rect:
         return ""
     
     try:
-        with pdfplumber.open(pdf_path) as pdf:
-            page = pdf.pages[page_num]
-            x1, y1, x2, y2 = rect
-            
-            # Extract words near the field
-            words = page.extract_words()
-            nearby_words = []
-            
-            for word in words:
-                word_x = (word['x0'] + word['x1']) / 2
-                word_y = (word['y0'] + word['y1']) / 2
-                
-                # Check if word is near the field
-                if (x1 - margin <= word_x <= x2 + margin and
-                    y1 - margin <= word_y <= y2 + margin):
-                    nearby_words.append(word['text'])
+        # Word boxes come from the persistent cache, so repeat runs skip text extraction
+        page = get_word_cache().page(pdf_path, page_num)
+        x1, y1, x2, y2 = rect
+        nearby_words = []
+        
+        for word in page.words:
+            # Word boxes are measured from the top of the page, field rects from the bottom
+            word_x = (word['x0'] + word['x1']) / 2
+            word_y = page.height - (word['top'] + word['bottom']) / 2
             
-            return ' '.join(nearby_words)
+            # Check if word is near the field
+            if (x1 - margin <= word_x <= x2 + margin and
+                y1 - margin <= word_y <= y2 + margin):
+                nearby_words.append(word['text'])
+        
+        return ' '.join(nearby_words)
     except Exception as e:
         print(f"Error getting context: {str(e)}")
         return ""
 
+def get_widget_positions(pdf: PdfReader) -> Dict[str, tuple]:
+    """Maps field names to (page number, rect) of their first widget"""
+    positions = {}
+    for page_num, page in enumerate(pdf.pages):
+        annots = page.get('/Annots')
+        for annot in (annots.get_object() if annots else []):
+            widget = annot.get_object()
+            name = widget.get('/T')
+            if name is None and '/Parent' in widget:
+                name = widget['/Parent'].get_object().get('/T')
+            if name is not None and name not in positions:
+                positions[name] = (page_num, [float(v) for v in widget.get('/Rect', [])])
+    return positions
+
 def analyze_pdf_form(pdf_path: str) -> Dict[str, Any]:
     """
     Analyzes a PDF form and returns detailed information about its fields.
@@ -43,22 +57,27 @@ def analyze_pdf_form(pdf_path: str) -> Dict[str, Any]:
         Dictionary containing form field information
     """
     try:
-        pdf = PdfReader(pdf_path)
+        pdf = pdf_reader(pdf_path)
         fields = pdf.get_fields()
         
         if not fields:
             print(f"No form fields found in {pdf_path}")
             return {}
             
+        # get_fields() leaves out the widget page and rect, so read them from the pages
+        positions = get_widget_positions(pdf)
+        
         # Create a detailed analysis of each field
         field_analysis = {}
         for field_name, field_properties in fields.items():
             # Get the page number
             page_ref = field_properties.get('/P')
-            page_num = 0 if page_ref is None else pdf.get_page_number(page_ref)
+            page_num, rect = positions.get(field_name, (0, []))
+            if page_ref is not None:
+                page_num = pdf.get_page_number(page_ref)
             
             # Get field rectangle
-            rect = field_properties.get('/Rect', [])
+            rect = field_properties.get('/Rect', rect)
             
             # Try to get context from surrounding text
             context = get_field_context(pdf_path, page_num, rect) if rect else ""
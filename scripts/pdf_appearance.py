@@ -0,0 +1,286 @@
+import re
+from functools import lru_cache
+from typing import Dict, List, Tuple
+
+from PyPDF2.generic import (ArrayObject, DictionaryObject, FloatObject, IndirectObject, NameObject,
+                            StreamObject)
+
+# Helvetica advance widths (1/1000 em) for ASCII 32-126, from the standard 14 font AFM
+_HELVETICA_ASCII = [
+    278, 278, 355, 556, 556, 889, 667, 191, 333, 333, 389, 584, 278, 333, 278, 278,
+    556, 556, 556, 556, 556, 556, 556, 556, 556, 556, 278, 278, 584, 584, 584, 556,
+    1015, 667, 667, 722, 722, 667, 611, 778, 722, 278, 500, 667, 556, 833, 722, 778,
+    667, 778, 722, 667, 611, 722, 667, 944, 667, 667, 611, 278, 278, 278, 469, 556,
+    333, 556, 556, 500, 556, 556, 278, 556, 556, 222, 222, 500, 222, 833, 556, 556,
+    556, 556, 333, 500, 278, 556, 500, 722, 500, 500, 500, 334, 260, 334, 584,
+]
+HELVETICA_WIDTHS = {32 + i: w for i, w in enumerate(_HELVETICA_ASCII)}
+HELVETICA_DEFAULT_WIDTH = 556
+# Ascender and descender of Helvetica, in 1/1000 em
+HELVETICA_ASCENT = 718
+HELVETICA_DESCENT = 207
+
+PADDING = 2.0
+V_PADDING = 1.0
+MAX_AUTO_SIZE = 12.0
+MIN_AUTO_SIZE = 4.0
+MULTILINE = 1 << 12
+HIDDEN = 1 << 1
+
+_DA_FONT_RE = re.compile(r'/([^\s/]+)\s+([\d.]+)\s+Tf')
+
+@lru_cache(maxsize=None)
+def font_widths(font_name: str) -> Dict[int, int]:
+    """
+    Width table for a form font. Forms here only use the base 14 Helvetica
+    (/Helv); other fonts fall back to Helvetica metrics.
+    """
+    return HELVETICA_WIDTHS
+
+@lru_cache(maxsize=65536)
+def text_width(font_name: str, text: str) -> float:
+    """Width of text in 1/1000 em"""
+    widths = font_widths(font_name)
+    return float(sum(widths.get(ord(c), HELVETICA_DEFAULT_WIDTH) for c in text))
+
+@lru_cache(maxsize=4096)
+def field_layout(font_name: str, size: float, width: float, height: float, multiline: bool) -> Tuple[float, float]:
+    """
+    (font size, baseline) for a field rect. A /DA size of 0 means auto: the
+    largest size whose line fits the box height, capped like Acrobat does.
+    Fixed sizes taller than a single-line box are reduced to fit it rather
+    than clipped.
+    """
+    line_height = (HELVETICA_ASCENT + HELVETICA_DESCENT) / 1000.0
+    fit = max(MIN_AUTO_SIZE, (height - 2 * V_PADDING) / line_height)
+    if size == 0:
+        size = MAX_AUTO_SIZE if multiline else fit
+        size = max(MIN_AUTO_SIZE, min(MAX_AUTO_SIZE, size))
+    elif not multiline:
+        size = min(size, fit)
+    if multiline:
+        baseline = height - V_PADDING - size * HELVETICA_ASCENT / 1000.0
+    else:
+        baseline = (height - size * line_height) / 2 + size * HELVETICA_DESCENT / 1000.0
+    return size, baseline
+
+def _escape(text: str) -> bytes:
+    data = text.encode('latin-1', errors='replace')
+    return data.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+
+def _wrap(font_name: str, text: str, size: float, max_width: float) -> List[str]:
+    lines = []
+    for paragraph in text.splitlines() or ['']:
+        line = ''
+        for word in paragraph.split(' '):
+            candidate = f"{line} {word}" if line else word
+            if line and text_width(font_name, candidate) * size / 1000.0 > max_width:
+                lines.append(line)
+                line = word
+            else:
+                line = candidate
+        lines.append(line)
+    return lines
+
+@lru_cache(maxsize=8192)
+def appearance_content(value: str, da: str, width: float, height: float, quadding: int, multiline: bool) -> bytes:
+    """
+    Content stream for a text field appearance. Memoized on everything that
+    affects the output, so recurring values (council name, number, year) are
+    laid out once per field size.
+    """
+    match = _DA_FONT_RE.search(da)
+    font, da_size = (match.group(1), float(match.group(2))) if match else ('Helv', 0.0)
+    size, baseline = field_layout(font, da_size, width, height, multiline)
+    inner = width - 2 * PADDING
+
+    if multiline:
+        lines = _wrap(font, value, size, inner)
+    else:
+        lines = [value]
+        if da_size == 0:
+            # Auto size also shrinks long single-line values to the box width
+            line_width = text_width(font, value) * size / 1000.0
+            if line_width > inner > 0:
+                size = max(MIN_AUTO_SIZE, size * inner / line_width)
+                _, baseline = field_layout(font, size, width, height, False)
+
+    da_ops = _DA_FONT_RE.sub(f'/{font} {size:.2f} Tf', da) if match else f'/{font} {size:.2f} Tf 0 g'
+    parts = [b'/Tx BMC q', f'{PADDING:.2f} {V_PADDING:.2f} {inner:.2f} {height - 2 * V_PADDING:.2f} re W n'.encode(),
+             b'BT', da_ops.strip().encode('latin-1')]
+    leading = size * (HELVETICA_ASCENT + HELVETICA_DESCENT) / 1000.0
+    y = baseline
+    for line in lines:
+        line_width = text_width(font, line) * size / 1000.0
+        if quadding == 1:
+            x = (width - line_width) / 2
+        elif quadding == 2:
+            x = width - PADDING - line_width
+        else:
+            x = PADDING
+        parts.append(f'1 0 0 1 {x:.2f} {y:.2f} Tm ('.encode() + _escape(line) + b') Tj')
+        y -= leading
+    parts += [b'ET Q EMC']
+    return b'\n'.join(parts)
+
+def _inherited(field, key: str, default=None):
+    while field is not None:
+        if key in field:
+            return field[key]
+        parent = field.get('/Parent')
+        field = parent.get_object() if parent is not None else None
+    return default
+
+def text_appearance(widget: DictionaryObject, value: str, da: str, font_resources) -> StreamObject:
+    """Builds the /N appearance stream (a form XObject) for a text widget"""
+    rect = [float(v) for v in widget['/Rect']]
+    width, height = round(abs(rect[2] - rect[0]), 2), round(abs(rect[3] - rect[1]), 2)
+    quadding = int(_inherited(widget, '/Q', 0))
+    multiline = bool(int(_inherited(widget, '/Ff', 0)) & MULTILINE)
+
+    stream = StreamObject()
+    stream[NameObject('/Type')] = NameObject('/XObject')
+    stream[NameObject('/Subtype')] = NameObject('/Form')
+    stream[NameObject('/BBox')] = ArrayObject([FloatObject(0), FloatObject(0), FloatObject(width), FloatObject(height)])
+    if font_resources is not None:
+        resources = DictionaryObject()
+        resources[NameObject('/Font')] = font_resources
+        stream[NameObject('/Resources')] = resources
+    stream._data = appearance_content(value, da, width, height, quadding, multiline)
+    return stream
+
+def generate_appearances(writer, default_da: str, font_resources) -> int:
+    """
+    Sets an /N appearance on every filled text widget of a PdfWriter. Widgets
+    with identical appearances share one stream object.
+    """
+    shared: Dict[tuple, IndirectObject] = {}
+    count = 0
+    for page in writer.pages:
+        annots = page.get('/Annots')
+        for annot_ref in (annots.get_object() if annots is not None else []):
+            widget = annot_ref.get_object()
+            if widget.get('/Subtype') != '/Widget' or _inherited(widget, '/FT') != '/Tx':
+                continue
+            value = _inherited(widget, '/V')
+            if value is None:
+                continue
+            stream = text_appearance(widget, str(value), _inherited(widget, '/DA', default_da), font_resources)
+            key = (stream._data, tuple(stream['/BBox']))
+            if key not in shared:
+                shared[key] = writer._add_object(stream)
+            appearance = DictionaryObject()
+            appearance[NameObject('/N')] = shared[key]
+            widget[NameObject('/AP')] = appearance
+            count += 1
+    return count
+
+def _normal_appearance(widget):
+    ap = widget.get('/AP')
+    normal = ap.get_object().get('/N') if ap is not None else None
+    if normal is None:
+        return None, None
+    normal_ref = ap.get_object().raw_get('/N')
+    normal = normal.get_object()
+    if not isinstance(normal, StreamObject):
+        # Checkbox or radio: pick the stream for the current /AS state
+        state = widget.get('/AS')
+        if state is None or state not in normal:
+            return None, None
+        normal_ref = normal.raw_get(state)
+        normal = normal_ref.get_object()
+    return normal_ref, normal
+
+def _placement(rect, appearance) -> List[float]:
+    # Maps the appearance's transformed BBox onto the annotation rect (PDF 32000 12.5.5)
+    x1, y1, x2, y2 = [float(v) for v in rect]
+    bx1, by1, bx2, by2 = [float(v) for v in appearance.get('/BBox', [0, 0, x2 - x1, y2 - y1])]
+    a, b, c, d, e, f = [float(v) for v in appearance.get('/Matrix', [1, 0, 0, 1, 0, 0])]
+    corners = [(a * x + c * y + e, b * x + d * y + f) for x in (bx1, bx2) for y in (by1, by2)]
+    tx1, tx2 = min(p[0] for p in corners), max(p[0] for p in corners)
+    ty1, ty2 = min(p[1] for p in corners), max(p[1] for p in corners)
+    sx = (max(x1, x2) - min(x1, x2)) / (tx2 - tx1) if tx2 > tx1 else 1.0
+    sy = (max(y1, y2) - min(y1, y2)) / (ty2 - ty1) if ty2 > ty1 else 1.0
+    return [sx, 0.0, 0.0, sy, min(x1, x2) - sx * tx1, min(y1, y2) - sy * ty1]
+
+def _content_stream(writer, data: bytes) -> IndirectObject:
+    stream = StreamObject()
+    stream._data = data
+    return writer._add_object(stream)
+
+def flatten_page(writer, page) -> set:
+    """
+    Draws every widget's normal appearance into the page content and removes
+    the widgets from /Annots. Returns the object numbers of removed widgets.
+    """
+    annots = page.get('/Annots')
+    if not annots:
+        return set()
+    resources = page.get('/Resources')
+    if resources is None:
+        resources = DictionaryObject()
+        page[NameObject('/Resources')] = resources
+    resources = resources.get_object()
+    if '/XObject' not in resources:
+        resources[NameObject('/XObject')] = DictionaryObject()
+    xobjects = resources['/XObject'].get_object()
+
+    keep = ArrayObject()
+    removed = set()
+    draws = []
+    for annot_ref in annots.get_object():
+        widget = annot_ref.get_object()
+        if widget.get('/Subtype') != '/Widget':
+            keep.append(annot_ref)
+            continue
+        removed.add(annot_ref.idnum)
+        if int(widget.get('/F', 0)) & HIDDEN:
+            continue
+        appearance_ref, appearance = _normal_appearance(widget)
+        if appearance is None:
+            continue
+        if not isinstance(appearance_ref, IndirectObject):
+            appearance_ref = writer._add_object(appearance)
+        name = f'/FlatAP{annot_ref.idnum}'
+        xobjects[NameObject(name)] = appearance_ref
+        matrix = ' '.join(f'{v:.4f}' for v in _placement(widget['/Rect'], appearance))
+        draws.append(f'q {matrix} cm {name} Do Q')
+    if not removed:
+        return removed
+
+    if draws:
+        contents = page.raw_get('/Contents') if '/Contents' in page else None
+        original = contents.get_object() if contents is not None else None
+        new_contents = ArrayObject([_content_stream(writer, b'q')])
+        if isinstance(original, ArrayObject):
+            new_contents.extend(original)
+        elif contents is not None:
+            new_contents.append(contents)
+        new_contents.append(_content_stream(writer, ('Q\n' + '\n'.join(draws)).encode()))
+        page[NameObject('/Contents')] = new_contents
+    if keep:
+        page[NameObject('/Annots')] = keep
+    else:
+        del page['/Annots']
+    return removed
+
+def flatten_form(writer, default_da: str = '/Helv 0 Tf 0 g', font_resources=None) -> int:
+    """
+    Generates appearances for the filled text fields, flattens every widget into
+    the page content and drops the interactive form. Returns the widgets flattened.
+    """
+    generate_appearances(writer, default_da, font_resources)
+    removed = set()
+    for page in writer.pages:
+        removed |= flatten_page(writer, page)
+    if '/AcroForm' in writer._root_object:
+        del writer._root_object['/AcroForm']
+    return len(removed)
+
+def cache_info() -> dict:
+    """Hit/miss counters for the metric, layout and stream caches"""
+    return {
+        'text_width': text_width.cache_info()._asdict(),
+        'field_layout': field_layout.cache_info()._asdict(),
+        'appearance_content': appearance_content.cache_info()._asdict(),
+    }
@@ -1,9 +1,13 @@
-import pdfplumber
 import json
-from typing import Dict, List, Tuple
+from typing import Any, Dict, List, Tuple
 import re
 
-def get_text_near_position(page, x: float, y: float, width: float, height: float, margin: float = 50) -> List[str]:
+from word_cache import get_word_cache
+
+# extract_words parameters; part of the word cache key
+WORD_PARAMS = {'x_tolerance': 3, 'y_tolerance': 3, 'keep_blank_chars': False, 'use_text_flow': True}
+
+def get_text_near_position(words: List[Dict[str, Any]], x: float, y: float, width: float, height: float, margin: float = 50) -> List[str]:
     """
     Extract text near a given position on the page.
     """
@@ -15,14 +19,6 @@ def get_text_near_position(page, x: float, y: float, width: float, height: float
         y + height + margin   # top
     )
     
-    # Extract words in the search area
-    words = page.extract_words(
-        x_tolerance=3,
-        y_tolerance=3,
-        keep_blank_chars=False,
-        use_text_flow=True
-    )
-    
     # Filter words within the search area
     nearby_words = []
     for word in words:
@@ -45,32 +41,34 @@ def analyze_pdf_fields(input_path: str, mapping_path: str):
     
     field_analysis = {}
     
-    with pdfplumber.open(input_path) as pdf:
-        for page_num, page in enumerate(pdf.pages):
-            print(f"\nAnalyzing page {page_num + 1}")
-            
-            # Process each field
-            for field_name, field_info in field_mapping.items():
-                if 'position' not in field_info:
-                    continue
-                    
-                pos = field_info['position']
-                
-                # Get text near the field
-                nearby_text = get_text_near_position(
-                    page,
-                    pos['x'],
-                    pos['y'],
-                    pos['width'],
-                    pos['height']
-                )
+    # Words for every page are extracted once and reused across runs from the word cache
+    document = get_word_cache().document(input_path, **WORD_PARAMS)
+    for page_num in range(document.page_count):
+        words = document.page(page_num).words
+        print(f"\nAnalyzing page {page_num + 1}")
+        
+        # Process each field
+        for field_name, field_info in field_mapping.items():
+            if 'position' not in field_info:
+                continue
                 
-                # Store analysis
-                field_analysis[field_name] = {
-                    'type': field_info['type'],
-                    'position': field_info['position'],
-                    'nearby_text': nearby_text
-                }
+            pos = field_info['position']
+            
+            # Get text near the field
+            nearby_text = get_text_near_position(
+                words,
+                pos['x'],
+                pos['y'],
+                pos['width'],
+                pos['height']
+            )
+            
+            # Store analysis
+            field_analysis[field_name] = {
+                'type': field_info['type'],
+                'position': field_info['position'],
+                'nearby_text': nearby_text
+            }
     
     # Save the analysis
     analysis_path = input_path.replace('.pdf', '_analysis.json')
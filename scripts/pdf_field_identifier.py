@@ -1,46 +1,134 @@
+import argparse
+import json
+from io import BytesIO
+from typing import Any, Dict, Optional
+
 from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import NameObject
+
+from pdf_field_reader import field_values
+from pdf_incremental import write_pdf_incremental
+from pdf_source import pdf_reader
+
+def _widget_name(widget) -> Optional[str]:
+    # The /T update_page_form_field_values matches: the widget's own or its parent field's
+    name = widget.get('/T')
+    if name is None and '/Parent' in widget:
+        name = widget['/Parent'].get_object().get('/T')
+    return name
 
-def fill_fields_with_names(input_path: str, output_path: str):
+def _widget_type(widget) -> Optional[str]:
+    field_type = widget.get('/FT')
+    if field_type is None and '/Parent' in widget:
+        field_type = widget['/Parent'].get_object().get('/FT')
+    return field_type
+
+def identify_fields(input_path: str, output_path: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
     """
-    Creates a new PDF where each form field is filled with its own name
-    for easy identification.
+    Fills every field with its own name and reads the result back, all in
+    memory, returning the field catalog: for each field the value read back,
+    its type, the page and rect of its first widget and whether the value
+    came back as the name. Each page is filled with a single
+    update_page_form_field_values call. The filled PDF is only written to
+    disk when output_path is given.
     """
-    print(f"Reading PDF: {input_path}")
-    
-    # Open the PDF
-    reader = PdfReader(input_path)
+    reader = pdf_reader(input_path)
+    if not reader.get_fields():
+        print("No form fields found")
+        return {}
+
     writer = PdfWriter()
-    
-    # Copy all pages to the writer
     for page in reader.pages:
         writer.add_page(page)
-        
-    # Get form fields
-    fields = reader.get_fields()
-    if not fields:
-        print("No form fields found")
+    # add_page leaves the form dictionary behind; its fields clone onto the widgets already copied
+    writer._root_object[NameObject('/AcroForm')] = reader.trailer['/Root']['/AcroForm'].clone(writer)
+
+    positions = {}
+    for page_num, page in enumerate(writer.pages):
+        names = {}
+        annots = page.get('/Annots')
+        for annot in (annots.get_object() if annots else []):
+            widget = annot.get_object()
+            name = _widget_name(widget)
+            if name is None:
+                continue
+            positions.setdefault(name, (page_num, [float(v) for v in widget.get('/Rect', [])]))
+            # Buttons take the value as an appearance state name, which cannot hold a field name
+            if _widget_type(widget) != '/Btn':
+                names[name] = name
+        if names:
+            writer.update_page_form_field_values(page, names)
+
+    buffer = BytesIO()
+    writer.write(buffer)
+    if output_path:
+        with open(output_path, 'wb') as output_file:
+            output_file.write(buffer.getbuffer())
+
+    buffer.seek(0)
+    fields = PdfReader(buffer).get_fields() or {}
+    values = field_values(fields)
+    catalog = {}
+    for field_name, field in fields.items():
+        label = field_name.rsplit('.', 1)[-1]
+        page_num, rect = positions.get(label, (None, []))
+        catalog[field_name] = {
+            'value': values[field_name],
+            'type': field.get('/FT', 'Unknown'),
+            'page_number': page_num,
+            'rect': rect,
+            'identified': values[field_name] == label,
+        }
+    return catalog
+
+def fill_fields_with_names(input_path: str, output_path: str, incremental: bool = False):
+    """
+    Creates a new PDF where each form field is filled with its own name
+    for easy identification. With incremental=True only the field changes
+    are appended to the original bytes.
+    """
+    print(f"Reading PDF: {input_path}")
+
+    if incremental:
+        names = list(pdf_reader(input_path).get_fields() or {})
+        filled = write_pdf_incremental(input_path, output_path, {name: name for name in names})
+        print(f"\nFilled {len(filled)} fields with their names; saved to: {output_path}")
+        return
+
+    catalog = identify_fields(input_path, output_path)
+    if catalog:
+        print(f"\nFilled {sum(f['identified'] for f in catalog.values())} of {len(catalog)} fields "
+              f"with their names; saved to: {output_path}")
+        print("Done! Open the output PDF to see field names in their locations.")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Map form fields by filling each with its own name')
+    parser.add_argument('pdf', nargs='?', default='audit2_1295_p.pdf')
+    parser.add_argument('--output', help='Also write the filled PDF here to see the names in place')
+    parser.add_argument('--catalog', help='Write the field catalog to this JSON file')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Append the names to a copy of the PDF as an incremental update instead')
+    args = parser.parse_args(argv)
+
+    if args.incremental:
+        fill_fields_with_names(args.pdf, args.output or args.pdf.replace('.pdf', '_identified.pdf'), True)
         return
-        
-    print(f"\nFound {len(fields)} fields. Filling each with its name...")
-    
-    # Fill each field with its name
-    for field_name in fields:
-        try:
-            writer.update_page_form_field_values(
-                writer.pages[0],  # Assuming all fields are on first page
-                {field_name: field_name}
-            )
-        except Exception as e:
-            print(f"Error filling field {field_name}: {str(e)}")
-            
-    # Save the filled PDF
-    print(f"\nSaving filled PDF to: {output_path}")
-    with open(output_path, "wb") as output_file:
-        writer.write(output_file)
-    
-    print("Done! Open the output PDF to see field names in their locations.")
+    catalog = identify_fields(args.pdf, args.output)
+    for field_name, field in catalog.items():
+        if field['identified']:
+            status = ''
+        elif field['type'] == '/Btn':
+            status = ' (button: located, not filled)'
+        else:
+            status = f" (read back {field['value']!r})"
+        print(f"{field_name}: {field['type']} page {field['page_number']} {field['rect']}{status}")
+    print(f"\n{sum(f['identified'] for f in catalog.values())} of {len(catalog)} fields identified")
+    if args.output:
+        print(f"Filled PDF saved to: {args.output}")
+    if args.catalog:
+        with open(args.catalog, 'w') as f:
+            json.dump(catalog, f, indent=2)
+        print(f"Field catalog saved to: {args.catalog}")
 
 if __name__ == "__main__":
-    input_pdf = "audit2_1295_p.pdf"
-    output_pdf = "audit2_1295_p_identified.pdf"
-    fill_fields_with_names(input_pdf, output_pdf) 
\ No newline at end of file
+    main()
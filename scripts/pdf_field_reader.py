@@ -1,6 +1,7 @@
-from PyPDF2 import PdfReader
 import json
 
+from pdf_source import pdf_reader
+
 def read_mapped_pdf(pdf_path: str) -> dict:
     """
     Reads the mapped PDF and creates a mapping of field names to their full values.
@@ -8,14 +9,17 @@ def read_mapped_pdf(pdf_path: str) -> dict:
     print(f"Reading mapped PDF: {pdf_path}")
     
     # Open the PDF
-    reader = PdfReader(pdf_path)
+    reader = pdf_reader(pdf_path)
     fields = reader.get_fields()
     
     if not fields:
         print("No form fields found")
         return {}
     
-    # Create mapping of field names to their values
+    return field_values(fields)
+
+def field_values(fields: dict) -> dict:
+    """Maps the field names of reader.get_fields() output to their full values"""
     field_mapping = {}
     for field_name, field in fields.items():
         # Get the full value, not just what's visible
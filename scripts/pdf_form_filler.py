@@ -1,15 +1,27 @@
-from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2 import PdfWriter
 import json
 from datetime import datetime
 
-def fill_pdf_form(input_path: str, output_path: str, data: dict):
+from pdf_incremental import write_pdf_incremental
+from pdf_source import pdf_reader
+
+def fill_pdf_form(input_path: str, output_path: str, data: dict, incremental: bool = False):
     """
     Fill out a PDF form with the provided data.
+    With incremental=True the changes are appended to the original bytes
+    instead of rewriting the whole document.
     """
     print(f"Reading PDF: {input_path}")
     
+    if incremental:
+        filled = write_pdf_incremental(input_path, output_path, {k: str(v) for k, v in data.items()})
+        for field_name in filled:
+            print(f"Filled field: {field_name} = {data[field_name]}")
+        print(f"\nFilled form saved to: {output_path} (incremental update, {len(filled)} fields)")
+        return
+    
     # Open the PDF
-    reader = PdfReader(input_path)
+    reader = pdf_reader(input_path)
     writer = PdfWriter()
     
     # Copy all pages to the writer
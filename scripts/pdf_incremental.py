@@ -0,0 +1,179 @@
+import re
+import struct
+import zlib
+from io import BytesIO
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import BooleanObject, DictionaryObject, IndirectObject, NameObject, TextStringObject
+
+from pdf_appearance import text_appearance
+from pdf_source import open_source
+
+_STARTXREF_RE = re.compile(rb'startxref\s+(\d+)\s+%%EOF', re.S)
+
+def _walk_fields(refs, parent_name: str = '') -> Iterator[Tuple[str, IndirectObject, DictionaryObject]]:
+    # Yields (full name, reference, field dict) for every terminal field
+    for ref in refs:
+        field = ref.get_object()
+        name = field.get('/T')
+        full_name = f"{parent_name}.{name}" if parent_name and name else (name or parent_name)
+        kids = field.get('/Kids')
+        if kids and any('/T' in kid.get_object() for kid in kids):
+            yield from _walk_fields(kids, full_name)
+        else:
+            yield full_name, ref, field
+
+def _inherited(field: DictionaryObject, key: str, default=None):
+    while field is not None:
+        if key in field:
+            return field[key]
+        parent = field.get('/Parent')
+        field = parent.get_object() if parent is not None else None
+    return default
+
+def _serialize(obj) -> bytes:
+    out = BytesIO()
+    obj.write_to_stream(out, None)
+    return out.getvalue()
+
+def _uses_xref_stream(data: bytes, startxref: int) -> bool:
+    return not data[startxref:startxref + 4] == b'xref'
+
+def _xref_stream_section(entries: Dict[int, int], xref_num: int, xref_offset: int, trailer: Dict[str, bytes],
+                         prev: int) -> bytes:
+    """Serializes a cross-reference stream covering `entries` (object number -> offset)"""
+    entries = dict(entries)
+    entries[xref_num] = xref_offset
+    numbers = sorted(entries)
+    # Group consecutive object numbers into /Index subsections
+    index, rows = [], b''
+    for num in numbers:
+        if index and index[-2] + index[-1] == num:
+            index[-1] += 1
+        else:
+            index += [num, 1]
+        rows += struct.pack('>BIH', 1, entries[num], 0)
+    body = zlib.compress(rows)
+    header = (f"<< /Type /XRef /Size {xref_num + 1} /Index [{' '.join(map(str, index))}] /W [1 4 2] "
+              f"/Filter /FlateDecode /Length {len(body)} /Prev {prev}").encode()
+    for key, value in trailer.items():
+        header += f" {key} ".encode() + value
+    return f"{xref_num} 0 obj\n".encode() + header + b" >>\nstream\n" + body + b"\nendstream\nendobj\n"
+
+def _xref_table_section(entries: Dict[int, int], size: int, trailer: Dict[str, bytes], prev: int) -> bytes:
+    """Serializes a classic cross-reference table and trailer covering `entries`"""
+    out = b'xref\n'
+    numbers = sorted(entries)
+    start = 0
+    while start < len(numbers):
+        end = start
+        while end + 1 < len(numbers) and numbers[end + 1] == numbers[end] + 1:
+            end += 1
+        out += f"{numbers[start]} {end - start + 1}\n".encode()
+        for num in numbers[start:end + 1]:
+            out += f"{entries[num]:010d} 00000 n \n".encode()
+        start = end + 1
+    out += f"trailer\n<< /Size {size} /Prev {prev}".encode()
+    for key, value in trailer.items():
+        out += f" {key} ".encode() + value
+    return out + b" >>\n"
+
+def fill_pdf_incremental(source: Union[str, bytes], values: Dict[str, str],
+                         need_appearances: bool = True) -> Tuple[bytes, List[str]]:
+    """
+    Fills text fields by appending an incremental update to the original PDF.
+
+    Only the changed field dictionaries, their new appearance streams and (for
+    NeedAppearances) the AcroForm are written after the original bytes,
+    followed by a cross-reference section with /Prev pointing at the original
+    one. The update uses a cross-reference stream when the original does. The
+    cost scales with the number of changed fields, not the document size.
+    Returns the new PDF bytes and the names of the fields that were filled.
+    """
+    if isinstance(source, str):
+        # Parsed from a memory map; the fields are modified, so the reader is private
+        pdf = open_source(source)
+        data = pdf.view()
+        reader = pdf.new_reader()
+    else:
+        data = source
+        reader = PdfReader(BytesIO(data))
+    if reader.is_encrypted:
+        raise ValueError("Incremental filling of encrypted PDFs is not supported")
+
+    matches = list(_STARTXREF_RE.finditer(data[-1024:]))
+    if not matches:
+        raise ValueError("startxref not found")
+    prev = int(matches[-1].group(1))
+
+    root_ref = reader.trailer.raw_get('/Root')
+    root = root_ref.get_object()
+    if '/AcroForm' not in root:
+        return bytes(data), []
+    acroform_ref = root.raw_get('/AcroForm')
+    acroform = acroform_ref.get_object()
+    default_da = acroform.get('/DA', '/Helv 0 Tf 0 g')
+    dr = acroform.get('/DR')
+    font_resources = dr.get_object().raw_get('/Font') if dr is not None and '/Font' in dr.get_object() else None
+
+    # PyPDF2 drops /Size from cross-reference stream trailers, so also count the known objects
+    known = [num for table in reader.xref.values() for num in table] + list(reader.xref_objStm)
+    next_num = max([int(reader.trailer.get('/Size', 0))] + [num + 1 for num in known])
+    changed: Dict[int, Tuple[int, object]] = {}
+    filled = []
+    for name, ref, field in _walk_fields(acroform.get('/Fields', [])):
+        if name not in values or _inherited(field, '/FT') != '/Tx':
+            continue
+        value = str(values[name])
+        da = _inherited(field, '/DA', default_da)
+        field[NameObject('/V')] = TextStringObject(value)
+        changed[ref.idnum] = (ref.generation, field)
+        widgets = [kid for kid in field['/Kids']] if '/Kids' in field else [ref]
+        for widget_ref in widgets:
+            widget = widget_ref.get_object()
+            appearance = DictionaryObject()
+            appearance[NameObject('/N')] = IndirectObject(next_num, 0, reader)
+            changed[next_num] = (0, text_appearance(widget, value, da, font_resources))
+            next_num += 1
+            widget[NameObject('/AP')] = appearance
+            changed[widget_ref.idnum] = (widget_ref.generation, widget)
+        filled.append(name)
+    if not filled:
+        return bytes(data), []
+
+    if need_appearances and not acroform.get('/NeedAppearances'):
+        acroform[NameObject('/NeedAppearances')] = BooleanObject(True)
+        if isinstance(acroform_ref, IndirectObject):
+            changed[acroform_ref.idnum] = (acroform_ref.generation, acroform)
+        else:
+            changed[root_ref.idnum] = (root_ref.generation, root)
+
+    out = bytearray(data)
+    if not out.endswith(b'\n') and not out.endswith(b'\r'):
+        out += b'\n'
+    offsets = {}
+    for num in sorted(changed):
+        generation, obj = changed[num]
+        offsets[num] = len(out)
+        out += f"{num} {generation} obj\n".encode() + _serialize(obj) + b"\nendobj\n"
+
+    trailer = {'/Root': _serialize(root_ref)}
+    for key in ('/Info', '/ID'):
+        if key in reader.trailer:
+            trailer[key] = _serialize(reader.trailer.raw_get(key))
+    xref_offset = len(out)
+    if _uses_xref_stream(data, prev):
+        out += _xref_stream_section(offsets, next_num, xref_offset, trailer, prev)
+    else:
+        out += _xref_table_section(offsets, next_num, trailer, prev)
+    out += f"startxref\n{xref_offset}\n%%EOF\n".encode()
+    return bytes(out), filled
+
+def write_pdf_incremental(input_path: str, output_path: str, values: Dict[str, str],
+                          need_appearances: bool = True) -> Optional[List[str]]:
+    """Fills input_path incrementally and saves the result to output_path"""
+    pdf_bytes, filled = fill_pdf_incremental(input_path, values, need_appearances)
+    with open(output_path, 'wb') as f:
+        f.write(pdf_bytes)
+    return filled
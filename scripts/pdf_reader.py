@@ -1,7 +1,8 @@
-from PyPDF2 import PdfReader
 import json
 from datetime import datetime
 
+from pdf_source import pdf_reader
+
 def read_pdf_form(input_path: str, mapping_path: str = None):
     """
     Reads values from a filled PDF form and returns them in a structured format.
@@ -20,7 +21,7 @@ def read_pdf_form(input_path: str, mapping_path: str = None):
             print(f"Error loading mapping file: {str(e)}")
     
     # Read the PDF
-    reader = PdfReader(input_path)
+    reader = pdf_reader(input_path)
     fields = reader.get_fields()
     
     if not fields:
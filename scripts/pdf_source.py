@@ -0,0 +1,95 @@
+import mmap
+import os
+from collections import OrderedDict
+from io import BytesIO
+from typing import Optional, Tuple, Union
+
+from PyPDF2 import PdfReader
+
+# Sources kept open per process; the least recently used is closed beyond this
+MAX_OPEN_SOURCES = 64
+
+class PdfSource:
+    """
+    A PDF file opened once through a read-only memory map.
+
+    Parsers get their own mapping of the file from stream() (an mmap has its
+    own read position, so several parsers can read at once), which shares the
+    OS page cache instead of copying the file into a private buffer. view()
+    exposes the bytes as a zero-copy memoryview for hashing and slicing.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        stat = os.fstat(self._file.fileno())
+        self.size = stat.st_size
+        self.key = (os.path.realpath(path), stat.st_size, stat.st_mtime_ns)
+        # Empty files cannot be mapped
+        self._map = self._new_map() if self.size else None
+        self._reader: Optional[PdfReader] = None
+
+    def _new_map(self) -> mmap.mmap:
+        return mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def stream(self) -> Union[mmap.mmap, BytesIO]:
+        """A new seekable binary stream over the file for a parser"""
+        return self._new_map() if self.size else BytesIO()
+
+    def view(self) -> memoryview:
+        return memoryview(self._map) if self._map is not None else memoryview(b'')
+
+    def reader(self) -> PdfReader:
+        """
+        A PdfReader shared by every caller in this process. Callers that
+        modify the parsed objects must use new_reader() instead.
+        """
+        if self._reader is None:
+            self._reader = self.new_reader()
+        return self._reader
+
+    def new_reader(self) -> PdfReader:
+        return PdfReader(self.stream())
+
+    def close(self):
+        # Readers and views still holding the mappings keep them alive
+        self._reader = None
+        self._map = None
+        self._file.close()
+
+_sources: 'OrderedDict[str, PdfSource]' = OrderedDict()
+
+def _current_key(path: str) -> Tuple[str, int, int]:
+    stat = os.stat(path)
+    return os.path.realpath(path), stat.st_size, stat.st_mtime_ns
+
+def open_source(path: str) -> PdfSource:
+    """
+    The process-wide source for path, reopened when the file has changed on
+    disk since it was mapped.
+    """
+    key = _current_key(path)
+    source = _sources.get(key[0])
+    if source is not None and source.key == key:
+        _sources.move_to_end(key[0])
+        return source
+    if source is not None:
+        source.close()
+    source = PdfSource(path)
+    _sources[key[0]] = source
+    while len(_sources) > MAX_OPEN_SOURCES:
+        _sources.popitem(last=False)[1].close()
+    return source
+
+def pdf_reader(path: str) -> PdfReader:
+    """Shared, memory-mapped PdfReader for path (see PdfSource.reader)"""
+    return open_source(path).reader()
+
+def open_plumber(path: str):
+    """pdfplumber.open over a memory map of path; close it (or use with) as usual"""
+    import pdfplumber
+    return pdfplumber.open(open_source(path).stream())
+
+def close_sources():
+    while _sources:
+        _sources.popitem()[1].close()
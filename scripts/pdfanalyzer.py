@@ -1,7 +1,7 @@
-from PyPDF2 import PdfReader
+from pdf_source import pdf_reader
 
 # Update this line with your PDF filename
-pdf = PdfReader("audit2_1295_p.pdf")
+pdf = pdf_reader("audit2_1295_p.pdf")
 fields = pdf.get_fields()
 
 if fields:
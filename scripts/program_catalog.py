@@ -0,0 +1,269 @@
+import argparse
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+from firebase_app import get_db, server_timestamp
+from program_matcher import DEFAULT_SYSTEM_PROGRAMS, load_custom_programs, load_system_programs, normalize
+
+DEFAULT_FORM1728P_PROGRAMS = os.path.join(os.path.dirname(DEFAULT_SYSTEM_PROGRAMS), 'form1728p_programs.json')
+
+# Firestore allows at most 500 writes per batch
+BATCH_SIZE = 500
+
+# Council programs the importer needs that the app does not ship
+MISSING_PROGRAMS = [
+    {'name': 'Dues', 'category': 'council', 'financialType': 'both'},
+    {'name': 'Council Insurance', 'category': 'council', 'financialType': 'expenseOnly'},
+    {'name': 'Interest', 'category': 'council', 'financialType': 'incomeOnly'},
+    {'name': 'Convention', 'category': 'council', 'financialType': 'expenseOnly'},
+    {'name': 'Conference', 'category': 'council', 'financialType': 'expenseOnly'},
+]
+
+# Fields the sync owns on a program document
+MANAGED_FIELDS = ('name', 'category', 'financialType', 'isSystemDefault', 'isAssembly')
+
+_NON_ID_RE = re.compile(r'[^a-z0-9]+')
+
+def program_doc_id(name: str) -> str:
+    """Document id for a program name, sanitized the same way as the app's addCustomProgram"""
+    return _NON_ID_RE.sub('_', name.lower()).strip('_')
+
+def program_key(name: str, is_assembly: bool) -> tuple:
+    return normalize(name), bool(is_assembly)
+
+def load_form1728p_programs(path: str = DEFAULT_FORM1728P_PROGRAMS) -> List[Dict[str, Any]]:
+    """
+    Flattens form1728p_programs.json (category -> [{id, name}]) into programs.
+    The app offers these to councils and assemblies alike, so they carry no isAssembly.
+    """
+    with open(path, 'r') as f:
+        data = json.load(f)
+    return [{'id': program['id'], 'name': program['name'], 'category': category, 'source': 'form1728p'}
+            for category, items in data.items() for program in items]
+
+def load_app_programs(is_assembly: bool, system_programs: str = DEFAULT_SYSTEM_PROGRAMS,
+                      form1728p_programs: str = DEFAULT_FORM1728P_PROGRAMS) -> List[Dict[str, Any]]:
+    """
+    The programs the app ships for a council or an assembly, shaped like
+    Firestore programs so entries can reference them by id.
+    """
+    programs = [p for p in load_system_programs(system_programs) if p['isAssembly'] == is_assembly]
+    programs += [dict(p, financialType='both', isAssembly=is_assembly)
+                 for p in load_form1728p_programs(form1728p_programs)]
+    return [dict(p, isSystemDefault=True, isEnabled=True) for p in programs]
+
+def build_catalog(system_programs: Optional[str] = DEFAULT_SYSTEM_PROGRAMS,
+                  form1728p_programs: Optional[str] = DEFAULT_FORM1728P_PROGRAMS,
+                  custom_programs: Optional[str] = None,
+                  include_missing: bool = True) -> Dict[tuple, Dict[str, Any]]:
+    """
+    The programs the app does not ship, keyed by (normalized name, isAssembly):
+    the built-in missing programs and the custom programs file.
+
+    The app loads system_programs.json and form1728p_programs.json itself and
+    lists every document of the programs collection as a custom program, so
+    those files are only used to leave out programs the app already has and
+    to keep their ids free. A program listed twice keeps its first definition
+    in the order missing, custom.
+    """
+    known = set()
+    used_ids = set()
+    if system_programs:
+        for program in load_system_programs(system_programs):
+            known.add(program_key(program['name'], program['isAssembly']))
+            used_ids.add(program['id'])
+    if form1728p_programs:
+        for program in load_form1728p_programs(form1728p_programs):
+            known.update(program_key(program['name'], is_assembly) for is_assembly in (False, True))
+            used_ids.add(program['id'])
+
+    sources = []
+    if include_missing:
+        sources.append([dict(p, isAssembly=False, isSystemDefault=True, source='missing') for p in MISSING_PROGRAMS])
+    if custom_programs:
+        sources.append([dict(p, isAssembly=p.get('isAssembly', False), isSystemDefault=False)
+                        for p in load_custom_programs(custom_programs)])
+
+    catalog = {}
+    for programs in sources:
+        for program in programs:
+            key = program_key(program['name'], program['isAssembly'])
+            if key in catalog or key in known:
+                continue
+            doc_id = program_doc_id(program['name'])
+            if doc_id in used_ids:
+                doc_id = f"{doc_id}_{'assembly' if program['isAssembly'] else 'council'}"
+            used_ids.add(doc_id)
+            catalog[key] = {
+                'id': doc_id,
+                'name': program['name'],
+                'category': program['category'].lower(),
+                'financialType': program.get('financialType'),
+                'isSystemDefault': program['isSystemDefault'],
+                'isAssembly': bool(program['isAssembly']),
+                'source': program['source'],
+            }
+    return catalog
+
+def diff_catalog(catalog: Dict[tuple, Dict[str, Any]], existing: Dict[str, Dict[str, Any]],
+                 prune: bool = False) -> Dict[str, list]:
+    """
+    Computes the minimal changeset that brings `existing` (doc id -> data) in
+    line with `catalog`.
+
+    Existing documents are matched to catalog programs by id, then by name.
+    Only documents an earlier sync created (those with a catalogSource) are
+    ever written: they are updated to the catalog, disabled when they
+    duplicate another document of the same program or a program the app
+    ships, and with prune disabled once their program left the catalog files.
+    Documents the app created are never written; where they differ from the
+    catalog or duplicate a program the difference is reported as a conflict.
+    """
+    by_id = {program['id']: key for key, program in catalog.items()}
+    matched = {}
+    duplicates = []
+    unmatched = []
+    # Id matches claim their program first, then documents the app created, so a sync
+    # duplicate cannot take a program the treasurer already has
+    ordered = sorted(existing.items(), key=lambda item: (item[0] not in by_id, bool(item[1].get('catalogSource'))))
+    for doc_id, data in ordered:
+        key = by_id.get(doc_id)
+        if key is None and data.get('name'):
+            key = program_key(data['name'], data.get('isAssembly', False))
+            key = key if key in catalog else None
+        if key is None:
+            unmatched.append((doc_id, data))
+        elif key in matched:
+            duplicates.append((doc_id, data, key))
+        else:
+            matched[key] = (doc_id, data)
+
+    creates, updates, disables, conflicts = [], [], [], []
+    for key, program in catalog.items():
+        if key not in matched:
+            creates.append(program)
+            continue
+        doc_id, data = matched[key]
+        changes = {field: program[field] for field in MANAGED_FIELDS
+                   if program[field] is not None and data.get(field) != program[field]}
+        if not data.get('catalogSource'):
+            if changes:
+                conflicts.append((doc_id, ', '.join(f"{field} {data.get(field)!r} (catalog {value!r})"
+                                                    for field, value in changes.items())))
+            continue
+        if data.get('disabledBySync'):
+            changes['isEnabled'] = True
+            changes['disabledBySync'] = False
+        if changes:
+            updates.append((doc_id, changes))
+
+    for doc_id, data, key in duplicates:
+        if not data.get('catalogSource'):
+            conflicts.append((doc_id, f"duplicate of {matched[key][0]}"))
+        elif data.get('isEnabled', True):
+            disables.append((doc_id, 'duplicate'))
+    for doc_id, data in unmatched:
+        if not data.get('catalogSource') or not data.get('isEnabled', True):
+            continue
+        if data['catalogSource'] in ('system', 'form1728p'):
+            # Written by syncs that still copied the programs the app ships
+            disables.append((doc_id, 'shipped with the app'))
+        elif prune:
+            disables.append((doc_id, 'removed from catalog'))
+    return {'create': creates, 'update': updates, 'disable': disables, 'conflict': conflicts}
+
+def apply_changeset(db, programs_ref, changeset: Dict[str, list], batch_size: int = BATCH_SIZE) -> int:
+    """Writes a changeset in batches of up to batch_size writes, returning the number of writes"""
+    writes = []
+    for program in changeset['create']:
+        data = {
+            'id': program['id'],
+            'name': program['name'],
+            'category': program['category'],
+            'isSystemDefault': program['isSystemDefault'],
+            'financialType': program['financialType'] or 'both',
+            'isEnabled': True,
+            'isAssembly': program['isAssembly'],
+            'catalogSource': program['source'],
+            'createdAt': server_timestamp(),
+            'updatedAt': server_timestamp(),
+        }
+        writes.append(('set', programs_ref.document(program['id']), data))
+    for doc_id, changes in changeset['update']:
+        writes.append(('update', programs_ref.document(doc_id), dict(changes, updatedAt=server_timestamp())))
+    for doc_id, _ in changeset['disable']:
+        writes.append(('update', programs_ref.document(doc_id),
+                       {'isEnabled': False, 'disabledBySync': True, 'updatedAt': server_timestamp()}))
+
+    for start in range(0, len(writes), batch_size):
+        batch = db.batch()
+        for op, ref, data in writes[start:start + batch_size]:
+            if op == 'set':
+                batch.set(ref, data)
+            else:
+                batch.update(ref, data)
+        batch.commit()
+        print(f"Committed {min(start + batch_size, len(writes))}/{len(writes)} program writes")
+    return len(writes)
+
+def print_changeset(changeset: Dict[str, list]):
+    for program in changeset['create']:
+        print(f"  create  {program['id']}: {program['name']} ({program['category']}, {program['source']})")
+    for doc_id, changes in changeset['update']:
+        print(f"  update  {doc_id}: {', '.join(f'{k}={v!r}' for k, v in changes.items())}")
+    for doc_id, reason in changeset['disable']:
+        print(f"  disable {doc_id}: {reason}")
+    for doc_id, reason in changeset['conflict']:
+        print(f"  keep    {doc_id}: created in the app; {reason}")
+
+def changeset_writes(changeset: Dict[str, list]) -> int:
+    """Documents a changeset writes (conflicts are only reported)"""
+    return sum(len(changeset[kind]) for kind in ('create', 'update', 'disable'))
+
+def sync_program_catalog(db, organization_id: str, catalog: Dict[tuple, Dict[str, Any]],
+                         prune: bool = False, dry_run: bool = False) -> Dict[str, list]:
+    """
+    Brings an organization's programs collection in line with `catalog`.
+
+    The collection is read once and only the differences are written, so a run
+    with nothing to change costs a single collection read and no writes.
+    """
+    programs_ref = db.collection('organizations').document(organization_id).collection('programs')
+    existing = {}
+    for doc in programs_ref.get():
+        # The states document holds enable/financial type overrides, not a program
+        if doc.id != 'states':
+            existing[doc.id] = doc.to_dict() or {}
+    print(f"Read {len(existing)} programs for organization {organization_id}; {len(catalog)} programs to sync")
+
+    changeset = diff_catalog(catalog, existing, prune)
+    print(f"Changes: {len(changeset['create'])} create, {len(changeset['update'])} update, "
+          f"{len(changeset['disable'])} disable, {len(changeset['conflict'])} left to the app")
+    print_changeset(changeset)
+    if dry_run:
+        print("Dry run: nothing written")
+    elif changeset_writes(changeset):
+        apply_changeset(db, programs_ref, changeset)
+    return changeset
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Sync the programs collection with the local catalog files')
+    parser.add_argument('--organization_id', default='C015857')
+    parser.add_argument('--system_programs', default=DEFAULT_SYSTEM_PROGRAMS,
+                        help='Programs the app ships; never written, only left out of the sync')
+    parser.add_argument('--form1728p_programs', default=DEFAULT_FORM1728P_PROGRAMS,
+                        help='Form 1728P programs the app ships; never written, only left out of the sync')
+    parser.add_argument('--custom_programs', help='Custom programs JSON ({"programs": [...]})')
+    parser.add_argument('--no_missing', action='store_true', help='Leave out the built-in missing programs')
+    parser.add_argument('--prune', action='store_true',
+                        help='Disable synced programs that are no longer in any catalog file')
+    parser.add_argument('--dry_run', action='store_true', help='Print the changeset without writing')
+    args = parser.parse_args(argv)
+
+    catalog = build_catalog(args.system_programs, args.form1728p_programs, args.custom_programs, not args.no_missing)
+    sync_program_catalog(get_db(), args.organization_id, catalog, args.prune, args.dry_run)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+import argparse
+import json
+import os
+import re
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from ledger import read_transactions_csv
+
+DEFAULT_SYSTEM_PROGRAMS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                       'assets', 'data', 'system_programs.json')
+MIN_SCORE = 0.5
+
+# Sheets categories start with R- (revenue) or E- (expense)
+_PREFIX_RE = re.compile(r'^\s*[RE]\s*-\s*', re.IGNORECASE)
+_NON_WORD_RE = re.compile(r'[^a-z0-9]+')
+# The financialType that rules a program out for an income or expense entry
+_EXCLUDED_TYPES = {'income': 'expenseOnly', 'expense': 'incomeOnly'}
+
+def normalize(text: str) -> str:
+    return _NON_WORD_RE.sub(' ', text.lower()).strip()
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def split_category(category: str):
+    """
+    Splits a Sheets category into (category hint, program text).
+
+    'E-Council - Per Capita' -> ('council', 'per capita'),
+    'R-Membership Dues' -> ('', 'membership dues').
+    """
+    text = _PREFIX_RE.sub('', category)
+    parts = [p for p in re.split(r'\s*-\s*', text, maxsplit=1) if p.strip()]
+    if len(parts) == 2:
+        return normalize(parts[0]), normalize(parts[1])
+    return '', normalize(text)
+
+def category_direction(category: str, amount=None) -> Optional[str]:
+    """'income' or 'expense' from a category's R-/E- prefix, else from the amount's sign, else None"""
+    prefix = _PREFIX_RE.match(category)
+    if prefix:
+        return 'income' if prefix.group(0).strip()[0].upper() == 'R' else 'expense'
+    if amount:
+        return 'expense' if amount < 0 else 'income'
+    return None
+
+def allows(program: Dict[str, Any], direction: Optional[str]) -> bool:
+    """Whether a program's financialType accepts an entry of the given direction"""
+    return direction is None or program.get('financialType') != _EXCLUDED_TYPES[direction]
+
+def load_system_programs(path: str = DEFAULT_SYSTEM_PROGRAMS) -> List[Dict[str, Any]]:
+    """Flattens system_programs.json into a list of programs"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    programs = []
+    for group, categories in data.items():
+        for category, items in categories.items():
+            for program in items:
+                programs.append({
+                    'id': program['id'],
+                    'name': program['name'],
+                    'category': category,
+                    'financialType': program.get('financialType', 'both'),
+                    'isAssembly': group == 'assembly_programs',
+                    'source': 'system',
+                })
+    return programs
+
+def load_custom_programs(path: str) -> List[Dict[str, Any]]:
+    """Reads a custom programs file ({'programs': [...]}) as used by import_custom_programs.py"""
+    with open(path, 'r') as f:
+        data = json.load(f)
+    return [dict(program, category=program['category'].lower(), source='custom') for program in data['programs']]
+
+def load_firestore_programs(db, organization_id: str) -> List[Dict[str, Any]]:
+    """Reads an organization's programs collection once"""
+    programs_ref = db.collection('organizations').document(organization_id).collection('programs')
+    programs = []
+    for doc in programs_ref.get():
+        # The states document holds enable/financial type overrides, not a program
+        if doc.id == 'states':
+            continue
+        data = doc.to_dict()
+        programs.append({
+            'id': doc.id,
+            'name': data['name'],
+            'category': data.get('category', ''),
+            'isSystemDefault': data.get('isSystemDefault', False),
+            'financialType': data.get('financialType', 'both'),
+            'isEnabled': data.get('isEnabled', True),
+            'source': 'firestore',
+        })
+    return programs
+
+class ProgramMatcher:
+    """
+    Resolves free-form category strings to programs.
+
+    The catalog is indexed once by character trigram and word token. A lookup
+    only scores programs that share a trigram with the query, ranks them by
+    trigram Dice coefficient plus token and category bonuses, and is memoized
+    per distinct query string, so mapping an import costs one lookup per
+    distinct category rather than a catalog scan per row.
+
+    Candidates must accept the entry's direction (income or expense, from the
+    category's R-/E- prefix or the amount's sign), and a tie between the best
+    candidates is reported as ambiguous rather than broken arbitrarily.
+    """
+
+    def __init__(self, programs: Iterable[Dict[str, Any]]):
+        self.programs = []
+        self._names = []
+        self._trigram_counts = []
+        self._tokens = []
+        self._exact = defaultdict(list)
+        self._by_trigram = defaultdict(list)
+        self._cache = {}
+        for program in programs:
+            name = normalize(program['name'])
+            i = len(self.programs)
+            self.programs.append(program)
+            self._names.append(name)
+            grams = trigrams(name)
+            self._trigram_counts.append(len(grams))
+            self._tokens.append(set(name.split()))
+            self._exact[name].append(i)
+            for gram in grams:
+                self._by_trigram[gram].append(i)
+
+    def rank(self, category: str, limit: int = 5, amount=None) -> List[Dict[str, Any]]:
+        """Returns the best candidates for a category string, highest score first"""
+        direction = category_direction(category, amount)
+        hint, text = split_category(category)
+        if not text:
+            return []
+        grams = trigrams(text)
+        shared = defaultdict(int)
+        for gram in grams:
+            for i in self._by_trigram.get(gram, ()):
+                shared[i] += 1
+
+        tokens = set(text.split())
+        scored = []
+        for i, count in shared.items():
+            if not allows(self.programs[i], direction):
+                continue
+            score = 2.0 * count / (len(grams) + self._trigram_counts[i])
+            if tokens and self._tokens[i]:
+                score += 0.25 * len(tokens & self._tokens[i]) / len(tokens | self._tokens[i])
+            if hint and normalize(self.programs[i].get('category', '')) == hint:
+                score += 0.1
+            if self._names[i] == text:
+                score += 1.0
+            scored.append((score, i))
+        scored.sort(key=lambda s: (-s[0], s[1]))
+        return [dict(self.programs[i], score=round(score, 3)) for score, i in scored[:limit]]
+
+    def resolve(self, category: str, min_score: float = MIN_SCORE,
+                amount=None) -> Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        (program, candidates) for a category string: the best program, or None
+        with the equally good candidates when several tie (or none when nothing
+        scores above min_score). amount (signed) gives the direction of a
+        category without an R-/E- prefix.
+        """
+        direction = category_direction(category, amount)
+        key = (category, min_score, direction)
+        if key in self._cache:
+            return self._cache[key]
+        hint, text = split_category(category)
+        full = normalize(_PREFIX_RE.sub('', category))
+        # Program names that contain a dash (e.g. 'Per Capita - State') match on the full text first
+        exact = [i for i in self._exact.get(full) or self._exact.get(text, ()) if allows(self.programs[i], direction)]
+        if exact:
+            # Same-named programs (e.g. council and assembly Postage) are told apart by the category hint
+            hinted = [i for i in exact if normalize(self.programs[i].get('category', '')) == hint] or exact
+            candidates = [dict(self.programs[i], score=2.0) for i in hinted]
+        else:
+            ranked = [c for c in self.rank(category, amount=amount) if c['score'] >= min_score]
+            # Candidates tie when the query's words and category hint cannot tell them apart, e.g.
+            # 'Per Capita' against 'Per Capita - State' and 'Per Capita - Supreme'
+            tokens = set(text.split())
+
+            def evidence(program: Dict[str, Any]) -> tuple:
+                return (frozenset(tokens & set(normalize(program['name']).split())),
+                        normalize(program.get('category', '')) == hint)
+
+            candidates = [c for c in ranked if c['score'] == ranked[0]['score']
+                          or (evidence(c) == evidence(ranked[0]) and evidence(c)[0])]
+        result = (candidates[0] if len(candidates) == 1 else None, candidates)
+        self._cache[key] = result
+        return result
+
+    def match(self, category: str, min_score: float = MIN_SCORE, amount=None) -> Optional[Dict[str, Any]]:
+        """Best program for a category string, or None when nothing scores above min_score or the best tie"""
+        return self.resolve(category, min_score, amount)[0]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Map Sheets categories to programs')
+    parser.add_argument('--csv', default='2025 Council 15857 Finances - Transactions.csv',
+                        help='Sheets CSV export to map')
+    parser.add_argument('--system_programs', default=DEFAULT_SYSTEM_PROGRAMS)
+    parser.add_argument('--custom_programs', help='Custom programs JSON ({"programs": [...]})')
+    parser.add_argument('--mirror', help='Also index programs from this local SQLite mirror')
+    parser.add_argument('--organization_id', default='C015857', help='Organization to read from the mirror')
+    parser.add_argument('--min_score', type=float, default=MIN_SCORE)
+    parser.add_argument('--output', help='Write the category -> program mapping to this JSON file')
+    args = parser.parse_args(argv)
+
+    programs = load_system_programs(args.system_programs)
+    if args.custom_programs:
+        programs += load_custom_programs(args.custom_programs)
+    if args.mirror:
+        from local_mirror import list_programs, open_mirror
+        programs += list_programs(open_mirror(args.mirror), args.organization_id)
+    matcher = ProgramMatcher(programs)
+    print(f"Indexed {len(programs)} programs")
+
+    mapping = {}
+    for row in read_transactions_csv(args.csv):
+        category = row['category']
+        if category in mapping:
+            continue
+        program, candidates = matcher.resolve(category, args.min_score, row['cents'])
+        mapping[category] = program
+        if program:
+            print(f"{category} -> {program['name']} ({program['category']}, score {program['score']:.2f})")
+        elif candidates:
+            print(f"{category} -> AMBIGUOUS: {' | '.join(c['name'] for c in candidates)} "
+                  f"(score {candidates[0]['score']:.2f})")
+        else:
+            print(f"{category} -> NO MATCH")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(mapping, f, indent=2)
+        print(f"\nMapping saved to: {args.output}")
+
+if __name__ == '__main__':
+    main()
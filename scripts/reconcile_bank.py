@@ -0,0 +1,200 @@
+import argparse
+import csv
+import json
+import re
+from collections import defaultdict
+from typing import Any, Dict, List
+
+from ledger import load_ledger, parse_date, to_cents
+
+DATE_WINDOW_DAYS = 5
+MIN_SIMILARITY = 0.0
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+def tokenize(text: str) -> frozenset:
+    return frozenset(_TOKEN_RE.findall(text.lower()))
+
+def similarity(a: frozenset, b: frozenset) -> float:
+    """Token Jaccard similarity between two descriptions"""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def read_statement_csv(csv_file: str) -> List[Dict[str, Any]]:
+    """
+    Reads bank statement lines from a CSV with Date, Description and either
+    Amount or Debit/Credit columns. A Balance column is kept when present.
+    """
+    lines = []
+    with open(csv_file, 'r', newline='') as f:
+        reader = csv.DictReader(f)
+        columns = {name.strip().lower(): name for name in reader.fieldnames or []}
+        for row_number, row in enumerate(reader, start=2):
+            def value(key: str) -> str:
+                return (row.get(columns[key]) or '').strip() if key in columns else ''
+            if not value('date'):
+                continue
+            if value('amount'):
+                cents = to_cents(value('amount'))
+            else:
+                cents = to_cents(value('credit') or 0) - to_cents(value('debit') or 0)
+            lines.append({
+                'row': row_number,
+                'date': parse_date(value('date')).date(),
+                'cents': cents,
+                'description': value('description'),
+                'balance': value('balance'),
+            })
+    return lines
+
+def load_statement(path: str) -> List[Dict[str, Any]]:
+    """Loads statement lines from a bank CSV, a statement PDF or ledger-shaped JSON/JSON Lines"""
+    if path.endswith('.csv'):
+        return read_statement_csv(path)
+    if path.lower().endswith('.pdf'):
+        from statement_extractor import extract_statements
+        return extract_statements([path], workers=1)['records']
+    return load_ledger(path)
+
+def reconcile(statement: List[Dict[str, Any]], ledger: List[Dict[str, Any]],
+              window_days: int = DATE_WINDOW_DAYS, min_similarity: float = MIN_SIMILARITY) -> Dict[str, Any]:
+    """
+    Matches statement lines to ledger rows.
+
+    Ledger rows are indexed by (amount in cents, date bucket) with buckets
+    `window_days` wide, so each statement line only looks at the three buckets
+    that can hold a row inside its date window. Statement lines are resolved in
+    date order and each ledger row is matched at most once; among candidates the
+    best description similarity wins, then the closest date.
+    """
+    bucket_size = max(window_days, 1)
+    index = defaultdict(list)
+    ledger_tokens = []
+    for i, entry in enumerate(ledger):
+        index[(entry['cents'], entry['date'].toordinal() // bucket_size)].append(i)
+        ledger_tokens.append(tokenize(entry['description']))
+
+    matched_ledger = set()
+    matches = []
+    unmatched_statement = []
+    for line in sorted(statement, key=lambda l: (l['date'], l['row'])):
+        day = line['date'].toordinal()
+        tokens = tokenize(line['description'])
+        best = None
+        best_key = None
+        for bucket in (day // bucket_size - 1, day // bucket_size, day // bucket_size + 1):
+            for i in index.get((line['cents'], bucket), ()):
+                if i in matched_ledger:
+                    continue
+                days_apart = abs(ledger[i]['date'].toordinal() - day)
+                if days_apart > window_days:
+                    continue
+                score = similarity(tokens, ledger_tokens[i])
+                if score < min_similarity:
+                    continue
+                key = (score, -days_apart, -i)
+                if best_key is None or key > best_key:
+                    best, best_key = i, key
+        if best is None:
+            unmatched_statement.append(line)
+            continue
+        matched_ledger.add(best)
+        matches.append({
+            'statement': line,
+            'ledger': ledger[best],
+            'similarity': round(best_key[0], 3),
+            'days_apart': -best_key[1],
+        })
+
+    # Ledger rows inside the statement period that did not clear
+    if statement:
+        start = min(l['date'] for l in statement)
+        end = max(l['date'] for l in statement)
+    else:
+        start = end = None
+    outstanding = [
+        entry for i, entry in enumerate(ledger)
+        if i not in matched_ledger and not entry['cleared'] and start is not None and entry['date'] <= end
+    ]
+    matched_rows = {m['ledger']['row'] for m in matches}
+    return {
+        'matches': matches,
+        'unmatched_statement': unmatched_statement,
+        'outstanding_ledger': outstanding,
+        # Marked Cleared in the sheet but not found on this statement
+        'cleared_not_on_statement': [e for e in ledger if e['cleared'] and e['row'] not in matched_rows
+                                     and start is not None and start <= e['date'] <= end],
+        # On the statement but not yet marked Cleared in the sheet
+        'newly_cleared': [m['ledger'] for m in matches if not m['ledger']['cleared']],
+        'statement_start': start,
+        'statement_end': end,
+    }
+
+def _format_cents(cents: int) -> str:
+    sign = '-' if cents < 0 else ''
+    return f"{sign}${abs(cents) / 100:,.2f}"
+
+def print_report(result: Dict[str, Any]):
+    """Prints a reconciliation summary and the items that need attention"""
+    print("\nReconciliation Report:")
+    print("=" * 50)
+    print(f"Statement period: {result['statement_start']} to {result['statement_end']}")
+    print(f"Matched: {len(result['matches'])}")
+    print(f"Newly cleared: {len(result['newly_cleared'])}")
+
+    sections = [
+        ('Statement lines with no ledger entry', result['unmatched_statement']),
+        ('Outstanding ledger entries (not on statement)', result['outstanding_ledger']),
+        ('Marked Cleared but not on statement', result['cleared_not_on_statement']),
+    ]
+    for title, items in sections:
+        print(f"\n{title}: {len(items)}")
+        print("-" * 30)
+        for item in items:
+            print(f"  row {item['row']}: {item['date']} {_format_cents(item['cents'])} {item['description']}")
+
+def save_report(result: Dict[str, Any], output_path: str):
+    """Saves the reconciliation result to a JSON file"""
+    with open(output_path, 'w') as f:
+        json.dump(result, f, indent=2, default=str)
+
+def write_cleared_csv(csv_file: str, output_path: str, cleared_rows: set):
+    """Copies the Sheets export, marking the Cleared column for matched rows"""
+    with open(csv_file, 'r', newline='') as f:
+        rows = list(csv.reader(f))
+    cleared_col = rows[0].index('Cleared')
+    for row_number, row in enumerate(rows[1:], start=2):
+        if row_number in cleared_rows and len(row) > cleared_col:
+            row[cleared_col] = 'X'
+    with open(output_path, 'w', newline='') as f:
+        csv.writer(f).writerows(rows)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Reconcile bank statement lines against the ledger')
+    parser.add_argument('statement', help='Bank statement CSV (Date, Description, Amount or Debit/Credit) or PDF')
+    parser.add_argument('--ledger', default='2025 Council 15857 Finances - Transactions.csv',
+                        help='Sheets CSV export, financial_entries.json or ledger JSON Lines')
+    parser.add_argument('--window_days', type=int, default=DATE_WINDOW_DAYS,
+                        help='Maximum days between statement and ledger dates')
+    parser.add_argument('--min_similarity', type=float, default=MIN_SIMILARITY,
+                        help='Minimum description similarity (0-1) for a match')
+    parser.add_argument('--report', default='reconciliation_report.json', help='Path for the JSON report')
+    parser.add_argument('--mark_cleared', help='Write a copy of the CSV ledger with Cleared set on matched rows')
+    args = parser.parse_args(argv)
+
+    statement = load_statement(args.statement)
+    ledger = load_ledger(args.ledger)
+    print(f"Loaded {len(statement)} statement lines and {len(ledger)} ledger entries")
+
+    result = reconcile(statement, ledger, args.window_days, args.min_similarity)
+    print_report(result)
+    save_report(result, args.report)
+    print(f"\nReport saved to: {args.report}")
+
+    if args.mark_cleared and args.ledger.endswith('.csv'):
+        write_cleared_csv(args.ledger, args.mark_cleared, {m['ledger']['row'] for m in result['matches']})
+        print(f"Cleared ledger written to: {args.mark_cleared}")
+
+if __name__ == '__main__':
+    main()
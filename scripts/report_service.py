@@ -0,0 +1,398 @@
+import argparse
+import json
+import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import BytesIO
+from typing import Any, Dict, Tuple
+
+from PyPDF2 import PdfReader, PdfWriter
+from PyPDF2.generic import ArrayObject, BooleanObject, DictionaryObject, NameObject
+
+from form1728_rollup import form1728_fields, load_form1728_lines
+from ledger import program_name, to_seconds
+from pdf_appearance import flatten_form
+
+TEMPLATES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'functions')
+
+# Endpoint -> (template file, error message), matching functions/index.js
+ENDPOINTS = {
+    'fillForm1728': ('fraternal_survey1728_p.pdf', 'Failed to fill PDF'),
+    'fillAuditReport': ('audit2_1295_p.pdf', 'Failed to fill audit report PDF'),
+    'fillIndividualSurveyReport': ('individual_survey1728a_p.pdf', 'Failed to fill individual survey PDF'),
+}
+
+AUDIT_PERIODS = {
+    'January-June': ((1, 1), (6, 30)),
+    'July-December': ((7, 1), (12, 31)),
+}
+
+# Survey line key ('faith.a', 'faith.total', 'total') -> (disbursement field, hours field)
+FORM1728_FIELDS = form1728_fields(load_form1728_lines())
+
+_NUMBER_RE = re.compile(r'^\s*[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?')
+
+class FillError(Exception):
+    """A request the fill endpoints reject with a client error"""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(status, message)
+        self.status = status
+        self.message = message
+
+class Template:
+    """A form template parsed once and reused for every fill"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self.data = f.read()
+        self.reader = PdfReader(BytesIO(self.data))
+        root = self.reader.trailer['/Root']
+        self.acroform = root['/AcroForm'] if '/AcroForm' in root else DictionaryObject()
+        self.field_names = set((self.reader.get_fields() or {}).keys())
+
+    def fill(self, values: Dict[str, str], flatten: bool = True) -> bytes:
+        """
+        Returns the template with the given text field values set. Like the
+        Cloud Functions, the form is flattened unless flatten is False.
+        """
+        writer = PdfWriter()
+        for page in self.reader.pages:
+            writer.add_page(page)
+
+        # add_page copies pages but not the form, so rebuild the AcroForm from the copied widgets
+        fields = ArrayObject()
+        seen = set()
+        for page in writer.pages:
+            annots = page.get('/Annots')
+            for annot_ref in (annots.get_object() if annots is not None else []):
+                field_ref = annot_ref
+                while '/Parent' in field_ref.get_object():
+                    field_ref = field_ref.get_object().raw_get('/Parent')
+                if field_ref.idnum not in seen:
+                    seen.add(field_ref.idnum)
+                    fields.append(field_ref)
+        acroform = DictionaryObject()
+        acroform[NameObject('/Fields')] = fields
+        # Cloned so the fonts referenced by generated appearances carry the writer's object numbers
+        for key in ('/DA', '/DR'):
+            if key in self.acroform:
+                acroform[NameObject(key)] = self.acroform.raw_get(key).clone(writer)
+        acroform[NameObject('/NeedAppearances')] = BooleanObject(True)
+        writer._root_object[NameObject('/AcroForm')] = writer._add_object(acroform)
+
+        values = {name: value for name, value in values.items() if name in self.field_names}
+        for page in writer.pages:
+            if page.get('/Annots'):
+                writer.update_page_form_field_values(page, values)
+        if flatten:
+            dr = acroform.get('/DR')
+            font_resources = dr.get_object().raw_get('/Font') if dr is not None and '/Font' in dr.get_object() else None
+            flatten_form(writer, self.acroform.get('/DA', '/Helv 0 Tf 0 g'), font_resources)
+
+        output = BytesIO()
+        writer.write(output)
+        return output.getvalue()
+
+def _js_string(value) -> str:
+    # String(value) as the Cloud Function would render it
+    if value is None:
+        return 'null'
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+def _text(body: Dict[str, Any], key: str, default: str = '') -> str:
+    # `body[key] || default`
+    value = body.get(key)
+    return _js_string(value) if value not in (None, '', 0, False) else default
+
+def _number(value) -> float:
+    # `parseFloat(value) || 0`
+    if isinstance(value, bool) or value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = _NUMBER_RE.match(str(value))
+    return float(match.group(0)) if match else 0.0
+
+def _fixed(value: float) -> str:
+    return f"{value:.2f}"
+
+def _entry_date(raw) -> datetime:
+    if not raw:
+        return datetime(1900, 1, 1, tzinfo=timezone.utc)
+    try:
+        return datetime.fromtimestamp(to_seconds(raw), tz=timezone.utc)
+    except (TypeError, ValueError):
+        return datetime(1900, 1, 1, tzinfo=timezone.utc)
+
+def form1728_values(body: Dict[str, Any]) -> Tuple[Dict[str, str], str]:
+    # Text1/Text2 are the two "20__" year blanks and Text3/Text4 the council
+    # number and jurisdiction; councilNumber/yearStart keep index.js's mapping
+    year = _text(body, 'surveyYear')[-2:]
+    values = {
+        'Text1': _text(body, 'councilNumber', year),
+        'Text2': _text(body, 'yearStart', year),
+    }
+    for field, key in (('Text3', 'council'), ('Text4', 'jurisdiction')):
+        if body.get(key):
+            values[field] = _text(body, key)
+    # Optional survey lines ({'faith.a': {'disbursement': 12.5, 'hours': 4}}, as
+    # written by form1728_rollup.py); section and form totals are summed here
+    lines = body.get('lines') or {}
+    if lines:
+        fields = FORM1728_FIELDS
+        totals = {}
+        for key, line in lines.items():
+            if key not in fields or not isinstance(line, dict):
+                continue
+            section = key.split('.', 1)[0]
+            for column, name in enumerate(('disbursement', 'hours')):
+                amount = _number(line.get(name))
+                if not amount:
+                    continue
+                values[fields[key][column]] = _fixed(amount) if column == 0 else _js_string(amount)
+                for total in (f"{section}.total", 'total'):
+                    totals[total, column] = totals.get((total, column), 0) + amount
+        for (total, column), amount in totals.items():
+            values[fields[total][column]] = _fixed(amount) if column == 0 else _js_string(amount)
+    return values, 'Form1728P_filled.pdf'
+
+def audit_values(body: Dict[str, Any]) -> Tuple[Dict[str, str], str]:
+    period = body.get('period')
+    if period not in AUDIT_PERIODS:
+        raise FillError(400, 'Invalid period. Must be January-June or July-December')
+    if not body.get('year'):
+        raise FillError(400, 'Year is required')
+    year = int(str(body['year']))
+    (start_month, start_day), (end_month, end_day) = AUDIT_PERIODS[period]
+    period_start = datetime(year, start_month, start_day, tzinfo=timezone.utc)
+    period_end = datetime(year, end_month, end_day, 23, 59, 59, tzinfo=timezone.utc)
+
+    values = {
+        'Text1': _text(body, 'council_number'),
+        'Text2': _text(body, 'auditor_name'),
+        'Text3': str(body['year'])[-2:],
+        'Text4': _text(body, 'organization_name'),
+    }
+
+    # Text51-Text58: membership dues, top two income programs and the rest
+    entries = list(body.get('income') or []) + list(body.get('expenses') or [])
+    period_entries = [e for e in entries if period_start <= _entry_date(e.get('date')) <= period_end]
+    text51 = sum(_number(e.get('amount')) for e in period_entries
+                 if 'membership dues' in program_name(e).lower())
+    income_by_program = {}
+    for entry in period_entries:
+        if entry.get('isExpense') or 'membership dues' in program_name(entry).lower():
+            continue
+        name = program_name(entry) or 'Unknown'
+        income_by_program[name] = income_by_program.get(name, 0.0) + _number(entry.get('amount'))
+    ranked = sorted(income_by_program.items(), key=lambda p: -p[1])
+    top1 = ranked[0] if ranked else ('', 0.0)
+    top2 = ranked[1] if len(ranked) > 1 else ('', 0.0)
+    others = ranked[2:]
+    text57 = sum(total for _, total in others)
+    text58 = _number(body.get('Text50')) + text51 + top1[1] + top2[1] + text57
+    values.update({
+        'Text51': _fixed(text51),
+        'Text52': top1[0],
+        'Text53': _fixed(top1[1]),
+        'Text54': top2[0],
+        'Text55': _fixed(top2[1]),
+        'Text56': 'Other' if others else '',
+        'Text57': _fixed(text57),
+        'Text58': _fixed(text58),
+    })
+
+    values['Text59'] = _text(body, 'manual_income_2')
+    values['Text60'] = _fixed(text58 - _number(body.get('manual_income_2')))
+
+    # Interest and per capita
+    values['Text64'] = _text(body, 'interest_earned')
+    total_interest = (_number(body.get('interest_earned')) + _number(body.get('manual_interest_1'))
+                      + _number(body.get('manual_interest_2')))
+    values['Text65'] = _fixed(total_interest)
+    values['Text66'] = _text(body, 'supreme_per_capita')
+    values['Text67'] = _text(body, 'state_per_capita')
+    values['Text68'] = _text(body, 'other_council_programs')
+    values['Text69'] = _text(body, 'manual_expense_1')
+    values['Text70'] = _text(body, 'manual_expense_2', '0')
+    total_expenses = (_number(body.get('other_council_programs')) + _number(body.get('manual_expense_1'))
+                      + _number(body.get('manual_expense_2')))
+    values['Text71'] = _fixed(total_expenses)
+    net_council = float(_fixed(total_interest)) - float(_fixed(total_expenses))
+    values['Text72'] = _fixed(net_council)
+    values['Text73'] = _fixed(net_council)
+
+    # Membership
+    for i, field in enumerate(['Text74', 'Text75', 'Text76'], start=1):
+        values[field] = _text(body, f'manual_membership_{i}')
+    values['Text77'] = _text(body, 'membership_count')
+    values['Text78'] = _text(body, 'membership_dues_total')
+    total_membership = float(_fixed(net_council)) + sum(_number(body.get(key)) for key in [
+        'manual_membership_1', 'manual_membership_2', 'manual_membership_3',
+        'membership_count', 'membership_dues_total'])
+    values['Text79'] = _fixed(total_membership)
+    values['Text80'] = _text(body, 'total_disbursements_sum')
+    net_membership = float(_fixed(total_membership)) - _number(body.get('total_disbursements_sum'))
+    values['Text83'] = _fixed(net_membership)
+
+    # Disbursements
+    for i, field in enumerate(['Text84', 'Text85', 'Text86', 'Text87'], start=1):
+        values[field] = _text(body, f'manual_disbursement_{i}')
+    values['Text88'] = _fixed(float(_fixed(net_membership)) + sum(
+        _number(body.get(f'manual_disbursement_{i}')) for i in range(1, 5)))
+
+    manual_fields = ['Text89', 'Text90', 'Text91', 'Text92', 'Text93', 'Text95', 'Text96',
+                     'Text97', 'Text98', 'Text99', 'Text100', 'Text101', 'Text102']
+    for i, field in enumerate(manual_fields, start=1):
+        values[field] = _text(body, f'manual_field_{i}', '0' if field == 'Text92' else '')
+    values['Text103'] = _fixed(sum(_number(body.get(f'manual_field_{i}')) for i in [1, 2, 3, 4, 5, 6, 7, 9, 11, 13]))
+
+    # Any request key that names a field is filled as-is
+    for key, value in body.items():
+        values[key] = _js_string(value)
+
+    filename = f"audit_report_{period.replace(' ', '_', 1)}_{body['year']}.pdf"
+    return values, filename
+
+def individual_survey_values(body: Dict[str, Any]) -> Tuple[Dict[str, str], str]:
+    if not body.get('year'):
+        raise FillError(400, 'Year is required')
+    year_digits = str(body['year'])[-2:]
+    values = {'Text1': year_digits, 'undefined': year_digits}
+    for i in range(2, 42):
+        values[f'Text{i}'] = _js_string(body.get(f'council_activity_{i - 1}') or 0)
+    for i in range(42, 80):
+        values[f'Text{i}'] = _js_string(body.get(f'assembly_activity_{i - 41}') or 0)
+    values['TOTAL'] = _js_string(body['council_total']) if body.get('council_total') is not None else '0'
+    values['TOTAL_2'] = _js_string(body['assembly_total']) if body.get('assembly_total') is not None else '0'
+    return values, f"individual_survey_{body['year']}.pdf"
+
+FILLERS = {
+    'fillForm1728': form1728_values,
+    'fillAuditReport': audit_values,
+    'fillIndividualSurveyReport': individual_survey_values,
+}
+
+# Per-process warm state, populated by load_templates()
+_templates: Dict[str, Template] = {}
+
+def load_templates(templates_dir: str = TEMPLATES_DIR):
+    """Parses every template once for this process"""
+    for endpoint, (filename, _) in ENDPOINTS.items():
+        if endpoint not in _templates:
+            _templates[endpoint] = Template(os.path.join(templates_dir, filename))
+
+def fill_report(endpoint: str, body: Dict[str, Any], flatten: bool = True) -> Tuple[bytes, str]:
+    """Computes field values for a request and fills the warm template"""
+    if not _templates:
+        load_templates()
+    values, filename = FILLERS[endpoint](body)
+    return _templates[endpoint].fill(values, flatten), filename
+
+class ReportRequestHandler(BaseHTTPRequestHandler):
+    pool = None
+    flatten = True
+
+    def _send(self, status: int, body: bytes, content_type: str = 'text/plain; charset=utf-8', headers=None):
+        self.send_response(status)
+        self.send_header('Access-Control-Allow-Origin', self.headers.get('Origin') or '*')
+        self.send_header('Vary', 'Origin')
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _endpoint(self):
+        name = self.path.split('?', 1)[0].rstrip('/').rsplit('/', 1)[-1]
+        return name if name in ENDPOINTS else None
+
+    def do_OPTIONS(self):
+        self._send(204, b'', headers={
+            'Access-Control-Allow-Methods': 'GET,HEAD,PUT,PATCH,POST,DELETE',
+            'Access-Control-Allow-Headers': self.headers.get('Access-Control-Request-Headers', ''),
+        })
+
+    def do_GET(self):
+        if self.path.rstrip('/') == '/health':
+            self._send(200, json.dumps({'templates': sorted(ENDPOINTS)}).encode(), 'application/json')
+        elif self._endpoint():
+            self._send(405, b'Method Not Allowed')
+        else:
+            self._send(404, b'Not Found')
+
+    def do_POST(self):
+        endpoint = self._endpoint()
+        if endpoint is None:
+            self._send(404, b'Not Found')
+            return
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}')
+            if self.pool is not None:
+                pdf_bytes, filename = self.pool.submit(fill_report, endpoint, body, self.flatten).result()
+            else:
+                pdf_bytes, filename = fill_report(endpoint, body, self.flatten)
+        except FillError as e:
+            self._send(e.status, e.message.encode())
+            return
+        except Exception as e:
+            print(f"Error filling {endpoint}: {str(e)}", file=sys.stderr)
+            self._send(500, ENDPOINTS[endpoint][1].encode())
+            return
+        self._send(200, pdf_bytes, 'application/pdf', {'Content-Disposition': f'attachment; filename={filename}'})
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+def serve(host: str, port: int, workers: int, verbose: bool = False, flatten: bool = True):
+    """
+    Serves the fill endpoints over HTTP. Requests are handled on threads and
+    filled on a pool of worker processes that each parse the templates once at
+    startup; with workers=0 fills run on the request threads.
+    """
+    pool = None
+    if workers > 0:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=load_templates)
+        # Start every worker now so the first requests do not pay template parsing
+        for future in [pool.submit(load_templates) for _ in range(workers)]:
+            future.result()
+    else:
+        load_templates()
+    ReportRequestHandler.pool = pool
+    ReportRequestHandler.flatten = flatten
+    server = ThreadingHTTPServer((host, port), ReportRequestHandler)
+    server.verbose = verbose
+    print(f"Report service listening on http://{host}:{port} with {workers or 'no'} worker processes")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if pool is not None:
+            pool.shutdown()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Serve the report fill endpoints with warm templates')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8080)))
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='Worker processes for filling (0 fills on the request threads)')
+    parser.add_argument('--verbose', action='store_true', help='Log every request')
+    parser.add_argument('--editable', action='store_true', help='Leave the form fields editable instead of flattening')
+    args = parser.parse_args(argv)
+    serve(args.host, args.port, args.workers, args.verbose, not args.editable)
+
+if __name__ == '__main__':
+    main()
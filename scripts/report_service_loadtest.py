@@ -0,0 +1,109 @@
+import argparse
+import http.client
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+# Representative request bodies for each endpoint
+SAMPLE_BODIES = {
+    'fillForm1728': {'councilNumber': '15857', 'yearStart': '2025'},
+    'fillAuditReport': {
+        'period': 'January-June', 'year': 2025, 'council_number': '15857',
+        'organization_name': 'Council 15857', 'Text50': '1250.00',
+        'interest_earned': '3.12', 'supreme_per_capita': '412.50', 'state_per_capita': '137.50',
+        'income': [
+            {'date': '2025-01-14', 'amount': 420.0, 'programName': 'Membership Dues'},
+            {'date': '2025-02-09', 'amount': 1063.0, 'programName': 'Fish Fry'},
+            {'date': '2025-03-16', 'amount': 655.0, 'programName': 'Tootsie Roll Drive'},
+            {'date': '2025-04-27', 'amount': 210.0, 'programName': 'Pancake Breakfast'},
+        ],
+        'expenses': [
+            {'date': '2025-02-10', 'amount': -47.02, 'programName': 'Fish Fry', 'isExpense': True},
+        ],
+    },
+    'fillIndividualSurveyReport': {
+        'year': 2025, 'council_total': 212, 'assembly_total': 40,
+        **{f'council_activity_{i}': i * 2 for i in range(1, 41)},
+        **{f'assembly_activity_{i}': i for i in range(1, 39)},
+    },
+}
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+def send_request(url: str, payload: bytes) -> Dict:
+    request = urllib.request.Request(url, data=payload, headers={'Content-Type': 'application/json'})
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=60) as response:
+            size = len(response.read())
+            status = response.status
+    except urllib.error.HTTPError as e:
+        size = len(e.read())
+        status = e.code
+    except (OSError, http.client.HTTPException):
+        # Refused or reset connections, read timeouts and truncated responses count as errors
+        size = 0
+        status = 0
+    return {'status': status, 'latency': time.perf_counter() - start, 'bytes': size}
+
+def run_load_test(base_url: str, endpoint: str, requests: int, concurrency: int, body: Dict) -> Dict:
+    """Fires `requests` POSTs at an endpoint from `concurrency` threads and summarizes latency"""
+    url = f"{base_url.rstrip('/')}/{endpoint}"
+    payload = json.dumps(body).encode()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(lambda _: send_request(url, payload), range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(r['latency'] * 1000 for r in results if r['status'] == 200)
+    return {
+        'endpoint': endpoint,
+        'requests': requests,
+        'concurrency': concurrency,
+        'ok': len(latencies),
+        'errors': requests - len(latencies),
+        'seconds': elapsed,
+        'throughput': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': latencies[-1] if latencies else 0.0,
+    }
+
+def print_summary(summary: Dict):
+    print(f"\n{summary['endpoint']}: {summary['requests']} requests, concurrency {summary['concurrency']}")
+    print(f"  ok: {summary['ok']}  errors: {summary['errors']}  time: {summary['seconds']:.2f}s")
+    print(f"  throughput: {summary['throughput']:.1f} req/s")
+    print(f"  latency ms  p50: {summary['p50_ms']:.1f}  p95: {summary['p95_ms']:.1f}  "
+          f"p99: {summary['p99_ms']:.1f}  max: {summary['max_ms']:.1f}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the report fill service')
+    parser.add_argument('--url', default='http://127.0.0.1:8080', help='Base URL of the service')
+    parser.add_argument('--endpoints', nargs='*', default=list(SAMPLE_BODIES), choices=list(SAMPLE_BODIES))
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--body', help='JSON request body to send instead of the sample body')
+    parser.add_argument('--warmup', type=int, default=10, help='Unmeasured requests sent first')
+    args = parser.parse_args(argv)
+
+    body_override = None
+    if args.body:
+        with open(args.body, 'r') as f:
+            body_override = json.load(f)
+
+    for endpoint in args.endpoints:
+        body = body_override or SAMPLE_BODIES[endpoint]
+        if args.warmup:
+            run_load_test(args.url, endpoint, args.warmup, min(args.warmup, args.concurrency), body)
+        print_summary(run_load_test(args.url, endpoint, args.requests, args.concurrency, body))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,496 @@
+import argparse
+import re
+import sqlite3
+import time
+from collections import OrderedDict, defaultdict
+from datetime import date, datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from ledger import parse_date, to_cents
+from program_matcher import normalize
+
+# Stored in the local mirror database next to the entries table. Doc ids are
+# never reused, so every posting list stays sorted and new entries are
+# appended as deltas. Triggers log every changed entry key; the index catches
+# up from the log instead of rereading the ledger.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS search_docs (
+    doc INTEGER PRIMARY KEY AUTOINCREMENT,
+    organization_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    year TEXT NOT NULL,
+    id TEXT NOT NULL,
+    date INTEGER NOT NULL,
+    amount_cents INTEGER NOT NULL
+);
+CREATE UNIQUE INDEX IF NOT EXISTS search_docs_by_key ON search_docs (organization_id, type, year, id);
+
+CREATE TABLE IF NOT EXISTS search_terms (
+    term TEXT PRIMARY KEY,
+    last_doc INTEGER NOT NULL,
+    postings BLOB NOT NULL
+) WITHOUT ROWID;
+
+-- Doc ids of edited or deleted entries, still present in posting lists until a rebuild
+CREATE TABLE IF NOT EXISTS search_stale (doc INTEGER PRIMARY KEY);
+
+CREATE TABLE IF NOT EXISTS search_log (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    organization_id TEXT NOT NULL,
+    type TEXT NOT NULL,
+    year TEXT NOT NULL,
+    id TEXT NOT NULL
+);
+CREATE TRIGGER IF NOT EXISTS entries_search_insert AFTER INSERT ON entries BEGIN
+    INSERT INTO search_log (organization_id, type, year, id)
+    VALUES (NEW.organization_id, NEW.type, NEW.year, NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_search_update AFTER UPDATE ON entries BEGIN
+    INSERT INTO search_log (organization_id, type, year, id)
+    VALUES (OLD.organization_id, OLD.type, OLD.year, OLD.id);
+    INSERT INTO search_log (organization_id, type, year, id)
+    VALUES (NEW.organization_id, NEW.type, NEW.year, NEW.id);
+END;
+CREATE TRIGGER IF NOT EXISTS entries_search_delete AFTER DELETE ON entries BEGIN
+    INSERT INTO search_log (organization_id, type, year, id)
+    VALUES (OLD.organization_id, OLD.type, OLD.year, OLD.id);
+END;
+"""
+
+# Program names and payment methods are indexed under field prefixes; a bare
+# query word matches descriptions, programs and payment methods
+FIELDS = {'desc': '', 'description': '', 'program': 'program:', 'method': 'method:', 'payment': 'method:'}
+BARE_PREFIXES = ('', 'program:', 'method:')
+# Decoded posting bitmaps kept in memory
+CACHE_SIZE = 512
+# Docs checked against search_docs per statement when filtering by exact amount
+SQL_BATCH = 500
+
+_QUERY_TOKEN_RE = re.compile(r'\(|\)|[^\s()]+')
+_NONZERO_RE = re.compile(rb'[^\x00]')
+
+def entry_terms(description: str, program: str, payment_method: str) -> Set[str]:
+    """The text terms of one ledger entry"""
+    terms = set(normalize(description or '').split())
+    terms.update('program:' + word for word in normalize(program or '').split())
+    terms.update('method:' + word for word in normalize(payment_method or '').split())
+    return terms
+
+def filter_terms(organization_id: str, entry_type: str, seconds: int, cents: int) -> List[str]:
+    """
+    Terms for the filters: organization, type, month and day, and the power
+    of two bucket of the absolute amount (amount:N holds 2**(N-1) to 2**N - 1
+    cents).
+    """
+    day = datetime.fromtimestamp(seconds, tz=timezone.utc).date().isoformat()
+    return [f"org:{organization_id}", f"type:{entry_type}", f"month:{day[:7]}", f"day:{day}",
+            f"amount:{abs(cents).bit_length():02d}"]
+
+def encode_postings(docs: Iterable[int], last_doc: int = 0) -> bytes:
+    """Ascending doc ids as LEB128 varint deltas from last_doc"""
+    out = bytearray()
+    for doc in docs:
+        delta = doc - last_doc
+        last_doc = doc
+        while delta > 0x7f:
+            out.append(delta & 0x7f | 0x80)
+            delta >>= 7
+        out.append(delta)
+    return bytes(out)
+
+def decode_postings(data: bytes) -> List[int]:
+    docs = []
+    doc = value = shift = 0
+    for byte in data:
+        if byte & 0x80:
+            value |= (byte & 0x7f) << shift
+            shift += 7
+        else:
+            doc += value | byte << shift
+            docs.append(doc)
+            value = shift = 0
+    return docs
+
+def postings_bitmap(data: bytes, last_doc: int) -> int:
+    """Decodes a posting list straight into an int with bit `doc` set for each doc"""
+    bits = bytearray(last_doc // 8 + 1)
+    doc = value = shift = 0
+    for byte in data:
+        if byte & 0x80:
+            value |= (byte & 0x7f) << shift
+            shift += 7
+        else:
+            doc += value | byte << shift
+            bits[doc >> 3] |= 1 << (doc & 7)
+            value = shift = 0
+    return int.from_bytes(bits, 'little')
+
+def bitmap_docs(bits: int) -> List[int]:
+    """Ascending doc ids of the set bits; runs of empty bytes are skipped in C"""
+    data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+    docs = []
+    for match in _NONZERO_RE.finditer(data):
+        base = match.start() * 8
+        byte = data[match.start()]
+        while byte:
+            low = byte & -byte
+            docs.append(base + low.bit_length() - 1)
+            byte ^= low
+    return docs
+
+def count_docs(bits: int) -> int:
+    return bin(bits).count('1')
+
+def parse_query(text: str):
+    """
+    Parses a search query into a tree of ('and'|'or', [nodes]), ('not', node)
+    and ('term'|'prefix', term) nodes.
+
+    Words are ANDed; OR, NOT (or a leading -) and parentheses combine them.
+    A trailing * matches a prefix, and program:, method: or desc: restricts
+    a word to that field.
+    """
+    tokens = _QUERY_TOKEN_RE.findall(text)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def parse_or():
+        nonlocal pos
+        nodes = [parse_and()]
+        while peek() == 'OR':
+            pos += 1
+            nodes.append(parse_and())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+    def parse_and():
+        nonlocal pos
+        nodes = []
+        while peek() not in (None, ')', 'OR'):
+            if peek() == 'AND':
+                pos += 1
+                continue
+            nodes.append(parse_not())
+        if not nodes:
+            raise ValueError(f"Expected a search term in {text!r}")
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+    def parse_not():
+        nonlocal pos
+        token = peek()
+        if token == 'NOT':
+            pos += 1
+            return ('not', parse_not())
+        if token == '(':
+            pos += 1
+            node = parse_or()
+            if peek() != ')':
+                raise ValueError(f"Unbalanced parentheses in {text!r}")
+            pos += 1
+            return node
+        pos += 1
+        if token.startswith('-') and len(token) > 1:
+            return ('not', parse_word(token[1:]))
+        return parse_word(token)
+
+    def parse_word(word: str):
+        field, _, value = word.rpartition(':')
+        if field.lower() not in FIELDS:
+            field, value = '', word
+        prefixes = (FIELDS[field.lower()],) if field else BARE_PREFIXES
+        prefix = value.endswith('*')
+        words = normalize(value.rstrip('*')).split()
+        if not words:
+            raise ValueError(f"Empty search term {word!r}")
+        # A word with punctuation (st.joseph) matches all of its parts
+        nodes = [('or', [('prefix' if prefix and i == len(words) - 1 else 'term', p + w) for p in prefixes])
+                 for i, w in enumerate(words)]
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+    tree = parse_or() if tokens else None
+    if pos < len(tokens):
+        raise ValueError(f"Unexpected {tokens[pos]!r} in {text!r}")
+    return tree
+
+def has_search_index(conn: sqlite3.Connection) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'search_terms'").fetchone()
+    return row is not None
+
+class SearchIndex:
+    """
+    Inverted index over the mirrored ledger of every organization.
+
+    Text terms (description words, program:, method:) and filter terms (org:,
+    type:, month:, day:, amount:) all map to varint-delta posting lists of doc
+    ids. Queries decode the lists they touch into int bitmaps, cached per
+    term, so boolean operators and filters are single big-integer operations.
+
+    Each entry version gets a new doc id. The ids of edited or deleted entries
+    stay in the posting lists but are masked out of every result, and
+    rebuild() compacts them away.
+    """
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+        self._cache: 'OrderedDict[str, int]' = OrderedDict()
+        self._universe: Optional[int] = None
+        if not has_search_index(conn):
+            conn.executescript(SCHEMA)
+            self.rebuild()
+
+    def rebuild(self) -> int:
+        """Reindexes every mirrored entry from scratch"""
+        conn = self.conn
+        with conn:
+            for table in ('search_docs', 'search_terms', 'search_stale', 'search_log'):
+                conn.execute(f'DELETE FROM {table}')
+            # Number docs from 1 again so the bitmaps stay as small as the live index
+            conn.execute("DELETE FROM sqlite_sequence WHERE name IN ('search_docs', 'search_log')")
+            count = self._index(conn.execute(
+                'SELECT organization_id, type, year, id, date, amount_cents, description, program_name, '
+                'payment_method FROM entries ORDER BY date, organization_id, id'))
+        self._cache.clear()
+        self._universe = None
+        return count
+
+    def update(self) -> int:
+        """Indexes the entries changed since the last update; returns how many were applied"""
+        conn = self.conn
+        changes = conn.execute('SELECT seq, organization_id, type, year, id FROM search_log ORDER BY seq').fetchall()
+        if not changes:
+            return 0
+        keys = list(OrderedDict.fromkeys(tuple(row)[1:] for row in changes))
+        with conn:
+            entries = []
+            for key in keys:
+                old = conn.execute('SELECT doc FROM search_docs '
+                                   'WHERE organization_id = ? AND type = ? AND year = ? AND id = ?', key).fetchone()
+                if old is not None:
+                    conn.execute('DELETE FROM search_docs WHERE doc = ?', (old['doc'],))
+                    conn.execute('INSERT INTO search_stale VALUES (?)', (old['doc'],))
+                row = conn.execute(
+                    'SELECT organization_id, type, year, id, date, amount_cents, description, program_name, '
+                    'payment_method FROM entries WHERE organization_id = ? AND type = ? AND year = ? AND id = ?',
+                    key).fetchone()
+                if row is not None:
+                    entries.append(row)
+            self._index(entries)
+            conn.execute('DELETE FROM search_log WHERE seq <= ?', (changes[-1]['seq'],))
+        self._universe = None
+        # Compact once most doc ids in the posting lists are stale
+        stale = conn.execute('SELECT COUNT(*) FROM search_stale').fetchone()[0]
+        live = conn.execute('SELECT COUNT(*) FROM search_docs').fetchone()[0]
+        if stale > live + 1000:
+            self.rebuild()
+        return len(keys)
+
+    def _index(self, rows: Iterable[sqlite3.Row]) -> int:
+        conn = self.conn
+        postings = defaultdict(list)
+        count = 0
+        for row in rows:
+            doc = conn.execute(
+                'INSERT INTO search_docs (organization_id, type, year, id, date, amount_cents) '
+                'VALUES (?, ?, ?, ?, ?, ?)', tuple(row)[:6]).lastrowid
+            for term in entry_terms(row['description'], row['program_name'], row['payment_method']):
+                postings[term].append(doc)
+            for term in filter_terms(row['organization_id'], row['type'], row['date'], row['amount_cents']):
+                postings[term].append(doc)
+            count += 1
+        for term, docs in postings.items():
+            stored = conn.execute('SELECT last_doc, postings FROM search_terms WHERE term = ?', (term,)).fetchone()
+            if stored is None:
+                conn.execute('INSERT INTO search_terms VALUES (?, ?, ?)', (term, docs[-1], encode_postings(docs)))
+            else:
+                conn.execute('UPDATE search_terms SET last_doc = ?, postings = ? WHERE term = ?',
+                             (docs[-1], stored['postings'] + encode_postings(docs, stored['last_doc']), term))
+            self._cache.pop(term, None)
+        return count
+
+    def _bitmap(self, term: str) -> int:
+        if term in self._cache:
+            self._cache.move_to_end(term)
+            return self._cache[term]
+        row = self.conn.execute('SELECT last_doc, postings FROM search_terms WHERE term = ?', (term,)).fetchone()
+        bits = postings_bitmap(row['postings'], row['last_doc']) if row else 0
+        self._cache[term] = bits
+        while len(self._cache) > CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return bits
+
+    def _terms(self, low: str, high: str) -> List[str]:
+        """Terms from low up to and including high"""
+        return [row['term'] for row in self.conn.execute(
+            'SELECT term FROM search_terms WHERE term >= ? AND term <= ? ORDER BY term', (low, high))]
+
+    def _prefix_bitmap(self, prefix: str) -> int:
+        bits = 0
+        for term in self._terms(prefix, prefix + '\U0010ffff'):
+            # Description words never contain ':', so a bare prefix skips the field terms
+            if ':' in prefix or ':' not in term:
+                bits |= self._bitmap(term)
+        return bits
+
+    def universe(self) -> int:
+        """Bitmap of every current doc, built from the live doc ids (edited and deleted ones are gone)"""
+        if self._universe is None:
+            docs = [row['doc'] for row in self.conn.execute('SELECT doc FROM search_docs ORDER BY doc')]
+            self._universe = postings_bitmap(encode_postings(docs), docs[-1]) if docs else 0
+        return self._universe
+
+    def _evaluate(self, node) -> int:
+        kind, value = node
+        if kind == 'term':
+            return self._bitmap(value)
+        if kind == 'prefix':
+            return self._prefix_bitmap(value)
+        if kind == 'not':
+            return self.universe() & ~self._evaluate(value)
+        bits = self._evaluate(value[0])
+        for child in value[1:]:
+            if kind == 'or':
+                bits |= self._evaluate(child)
+            elif bits:
+                bits &= self._evaluate(child)
+        return bits
+
+    def _date_bitmap(self, start: Optional[date], end: Optional[date]) -> int:
+        # Whole months from the month terms, partial months from their day terms
+        first = start.isoformat() if start else '0000-00-00'
+        last = end.isoformat() if end else '9999-99-99'
+        bits = 0
+        for term in self._terms(f"month:{first[:7]}", f"month:{last[:7]}"):
+            month = term[6:]
+            if first <= f"{month}-01" and f"{month}-31" <= last:
+                bits |= self._bitmap(term)
+            else:
+                for day in self._terms(f"day:{max(first, month)}", f"day:{min(last, month + '-99')}"):
+                    bits |= self._bitmap(day)
+        return bits
+
+    def _amount_filter(self, bits: int, low: int, high: Optional[int]) -> int:
+        # Whole buckets by bitmap; the docs of partial buckets are checked in search_docs
+        kept = 0
+        partial = []
+        for term in self._terms('amount:', 'amount:99'):
+            size = int(term[7:])
+            bucket_low, bucket_high = (1 << size - 1 if size else 0), (1 << size) - 1
+            if bucket_high < low or high is not None and bucket_low > high:
+                continue
+            bucket = bits & self._bitmap(term)
+            if not bucket:
+                continue
+            if low <= bucket_low and (high is None or bucket_high <= high):
+                kept |= bucket
+            else:
+                partial.extend(bitmap_docs(bucket))
+        for i in range(0, len(partial), SQL_BATCH):
+            batch = partial[i:i + SQL_BATCH]
+            for row in self.conn.execute(
+                    f"SELECT doc FROM search_docs WHERE doc IN ({','.join('?' * len(batch))}) "
+                    'AND ABS(amount_cents) BETWEEN ? AND ?', batch + [low, high if high is not None else 1 << 62]):
+                kept |= 1 << row['doc']
+        return kept
+
+    def search(self, query: str = '', start: Optional[date] = None, end: Optional[date] = None,
+               min_cents: Optional[int] = None, max_cents: Optional[int] = None,
+               organization_id: Optional[str] = None, entry_type: Optional[str] = None) -> int:
+        """
+        Bitmap of the docs matching the query and filters (see count_docs and
+        newest). Amount bounds apply to the absolute amount; start and end are
+        inclusive dates.
+        """
+        self.update()
+        bits = self.universe()
+        tree = parse_query(query)
+        if tree is not None:
+            bits &= self._evaluate(tree)
+        if organization_id and bits:
+            bits &= self._bitmap(f"org:{organization_id}")
+        if entry_type and bits:
+            bits &= self._bitmap(f"type:{entry_type}")
+        if (start or end) and bits:
+            bits &= self._date_bitmap(start, end)
+        if (min_cents is not None or max_cents is not None) and bits:
+            bits = self._amount_filter(bits, min_cents or 0, max_cents)
+        return bits
+
+    def newest(self, bits: int, limit: Optional[int] = None) -> List[int]:
+        """Doc ids of a result bitmap, newest first"""
+        if limit is not None and count_docs(bits) > limit:
+            # Only the latest months that hold `limit` docs need sorting
+            kept = 0
+            for month in reversed(self._terms('month:', 'month:9999-99')):
+                in_month = bits & self._bitmap(month)
+                kept |= in_month
+                if in_month and count_docs(kept) >= limit:
+                    break
+            bits = kept
+        dated = []
+        docs = bitmap_docs(bits)
+        for i in range(0, len(docs), SQL_BATCH):
+            batch = docs[i:i + SQL_BATCH]
+            dated.extend((row['date'], row['doc']) for row in self.conn.execute(
+                f"SELECT date, doc FROM search_docs WHERE doc IN ({','.join('?' * len(batch))})", batch))
+        dated.sort(reverse=True)
+        return [doc for _, doc in dated[:limit]]
+
+    def entries(self, docs: List[int]) -> List[Dict[str, Any]]:
+        """The mirrored entries for doc ids, in the same order"""
+        rows = []
+        for doc in docs:
+            row = self.conn.execute(
+                'SELECT e.* FROM search_docs d JOIN entries e USING (organization_id, type, year, id) '
+                'WHERE d.doc = ?', (doc,)).fetchone()
+            if row is not None:
+                rows.append(dict(row))
+        return rows
+
+def update_search_index(conn: sqlite3.Connection) -> int:
+    """Catches an existing index up with the mirror; does nothing when no index was built"""
+    if not has_search_index(conn):
+        return 0
+    return SearchIndex(conn).update()
+
+def _dollars(cents: int) -> str:
+    sign = '-' if cents < 0 else ''
+    return f"{sign}${abs(cents) / 100:,.2f}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Full-text search over the mirrored ledger')
+    parser.add_argument('query', nargs='*', help='Search words; OR, NOT/-word, (), word* and program:/method:/desc:')
+    parser.add_argument('--mirror', help='SQLite mirror path (default: the local mirror)')
+    parser.add_argument('--organization_id', help='Only this organization (default: all)')
+    parser.add_argument('--type', choices=['income', 'expenses'])
+    parser.add_argument('--start', help='First date (MM/DD/YYYY)')
+    parser.add_argument('--end', help='Last date (MM/DD/YYYY)')
+    parser.add_argument('--min_amount', help='Smallest absolute amount')
+    parser.add_argument('--max_amount', help='Largest absolute amount')
+    parser.add_argument('--limit', type=int, default=50, help='Entries to print')
+    parser.add_argument('--rebuild', action='store_true', help='Reindex the whole mirror first')
+    args = parser.parse_args(argv)
+
+    from local_mirror import DEFAULT_MIRROR, open_mirror
+    conn = open_mirror(args.mirror or DEFAULT_MIRROR)
+    index = SearchIndex(conn)
+    if args.rebuild:
+        print(f"Indexed {index.rebuild()} entries")
+
+    start = time.perf_counter()
+    bits = index.search(' '.join(args.query),
+                        start=parse_date(args.start).date() if args.start else None,
+                        end=parse_date(args.end).date() if args.end else None,
+                        min_cents=to_cents(args.min_amount) if args.min_amount else None,
+                        max_cents=to_cents(args.max_amount) if args.max_amount else None,
+                        organization_id=args.organization_id, entry_type=args.type)
+    docs = index.newest(bits, args.limit)
+    elapsed = time.perf_counter() - start
+    print(f"{count_docs(bits)} matching entries ({elapsed * 1000:.1f} ms)")
+    for entry in index.entries(docs):
+        entry_date = datetime.fromtimestamp(entry['date'], tz=timezone.utc).date()
+        print(f"  {entry_date} {entry['organization_id']} {_dollars(entry['amount_cents']):>12} "
+              f"{entry['program_name']} | {entry['payment_method']} | {entry['description']}")
+
+if __name__ == '__main__':
+    main()
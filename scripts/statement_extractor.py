@@ -0,0 +1,351 @@
+import argparse
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from ledger import to_cents
+from pdf_source import open_plumber, pdf_reader
+
+DEFAULT_LAYOUTS = os.environ.get('COUNCILFINANCES_STATEMENT_LAYOUTS') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.statement_layouts.json')
+
+# Words whose tops are this close (points) are on one line
+LINE_TOLERANCE = 3.0
+# Amounts whose right edges are this close belong to one column
+COLUMN_TOLERANCE = 6.0
+# Fragments of one amount touch ('3' ',049.00'); a larger gap starts a new word
+FRAGMENT_GAP = 1.0
+# A column header word is centered at most this far from its column's right edge
+HEADER_DISTANCE = 60.0
+# A line without date or amount this close below a transaction continues its description
+CONTINUATION_GAP = 14.0
+
+_DATE_RE = re.compile(r'^(\d{1,2})/(\d{1,2})(?:/(\d{4}|\d{2}))?$')
+_FRAGMENT_RE = re.compile(r'^[$()\-\d,.]+$')
+_MONEY_RE = re.compile(r'^\(?-?\$?-?[\d,]*\.\d{2}\)?-?$')
+_YEAR_RE = re.compile(r'\b(?:19|20)\d{2}\b')
+_WORD_RE = re.compile(r'[a-z]+')
+
+# Section headings and column headers that set the sign of the amounts under them
+CREDIT_WORDS = {'income', 'deposits', 'deposit', 'credits', 'credit', 'receipts', 'additions'}
+DEBIT_WORDS = {'expenses', 'expense', 'withdrawals', 'withdrawal', 'debits', 'debit', 'payments', 'checks',
+               'subtractions', 'fees'}
+HEADING_MAX_WORDS = 4
+BALANCE_LABELS = {'beginning balance': 'beginning', 'opening balance': 'beginning', 'previous balance': 'beginning',
+                  'ending balance': 'ending', 'closing balance': 'ending', 'new balance': 'ending'}
+
+def _split_amounts(words: List[Dict[str, Any]]) -> Tuple[List[Dict[str, Any]], List[Tuple[float, str]]]:
+    """
+    Splits a line's words into text words and amounts. Touching numeric
+    fragments are joined first, since statements often space out the digits
+    of an amount; only groups that look like money ('1,234.56') are amounts,
+    so numbers in descriptions (check numbers, dates) stay text.
+    """
+    groups: List[List[Dict[str, Any]]] = []
+    for word in words:
+        numeric = bool(_FRAGMENT_RE.match(word['text']))
+        if (groups and numeric and _FRAGMENT_RE.match(groups[-1][-1]['text'])
+                and word['x0'] - groups[-1][-1]['x1'] <= FRAGMENT_GAP):
+            groups[-1].append(word)
+        else:
+            groups.append([word])
+    text_words, amounts = [], []
+    for group in groups:
+        joined = ''.join(word['text'] for word in group)
+        if _MONEY_RE.match(joined):
+            amounts.append((round(group[-1]['x1'], 1), joined))
+        elif joined != '$':
+            text_words.extend(group)
+    return text_words, amounts
+
+def page_lines(words: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Groups a page's words into lines: leading date, text, word positions and (right edge, amount) pairs"""
+    rows: List[List[Dict[str, Any]]] = []
+    for word in sorted(words, key=lambda w: (w['top'], w['x0'])):
+        if rows and abs(word['top'] - rows[-1][0]['top']) <= LINE_TOLERANCE:
+            rows[-1].append(word)
+        else:
+            rows.append([word])
+    lines = []
+    for row in rows:
+        row.sort(key=lambda w: w['x0'])
+        text_words, amounts = _split_amounts(row)
+        line_date = None
+        if text_words and _DATE_RE.match(text_words[0]['text']):
+            line_date = text_words.pop(0)['text']
+        lines.append({
+            'top': round(row[0]['top'], 1),
+            'x0': round(text_words[0]['x0'], 1) if text_words else None,
+            'date': line_date,
+            'text': ' '.join(word['text'] for word in text_words),
+            'words': [(word['text'], round((word['x0'] + word['x1']) / 2, 1)) for word in text_words],
+            'amounts': amounts,
+        })
+    return lines
+
+def statement_signature(lines: List[Dict[str, Any]], width: float, height: float) -> str:
+    """Identifies a statement format by its first heading (without digits) and page size"""
+    heading = next((line['text'] for line in lines if line['text']), '')
+    return f"{' '.join(_WORD_RE.findall(heading.lower()))}|{int(width)}x{int(height)}"
+
+# Per-process pdfplumber documents, reused by the pages of a statement
+_documents: Dict[str, Any] = {}
+
+def _read_page(task: Tuple[str, int]) -> Dict[str, Any]:
+    path, page_num = task
+    if path not in _documents:
+        _documents[path] = open_plumber(path)
+    page = _documents[path].pages[page_num]
+    lines = page_lines(page.extract_words())
+    result = {'path': path, 'page': page_num, 'lines': lines}
+    if page_num == 0:
+        result['signature'] = statement_signature(lines, float(page.width), float(page.height))
+    return result
+
+def _close_documents():
+    while _documents:
+        _documents.popitem()[1].close()
+
+def _heading_sign(line: Dict[str, Any]) -> int:
+    words = _WORD_RE.findall(line['text'].lower())
+    if not words or len(words) > HEADING_MAX_WORDS:
+        return 0
+    if DEBIT_WORDS.intersection(words):
+        return -1
+    if CREDIT_WORDS.intersection(words):
+        return 1
+    return 0
+
+def _column_role(words: List[Tuple[str, float]], right: float) -> Optional[str]:
+    # Role of the column header word nearest to a column's right edge
+    best = None
+    for text, center in words:
+        word = text.lower().strip(':')
+        role = ('balance' if word == 'balance' else 'debit' if word in DEBIT_WORDS
+                else 'credit' if word in CREDIT_WORDS else 'amount' if word == 'amount' else None)
+        if role and abs(right - center) <= HEADER_DISTANCE and (best is None or abs(right - center) < best[0]):
+            best = (abs(right - center), role)
+    return best[1] if best else None
+
+def learn_layout(pages: List[List[Dict[str, Any]]], signature: str) -> Dict[str, Any]:
+    """
+    Learns a statement format's amount columns from its dated lines: amount
+    right edges are clustered into columns, which take their role (amount,
+    debit, credit or balance) from a header line above the first transaction
+    when there is one, and otherwise from their count and position.
+    """
+    edges = sorted(right for lines in pages for line in lines if line['date'] for right, _ in line['amounts'])
+    clusters: List[List[float]] = []
+    for right in edges:
+        if clusters and right - clusters[-1][-1] <= COLUMN_TOLERANCE:
+            clusters[-1].append(right)
+        else:
+            clusters.append([right])
+    columns = [round(sum(c) / len(c), 1) for c in clusters]
+
+    header = []
+    for lines in pages:
+        for line in lines:
+            if line['date']:
+                break
+            if not line['amounts'] and any(_column_role(line['words'], right) for right in columns):
+                header = line['words']
+        else:
+            continue
+        break
+    roles = [_column_role(header, right) for right in columns] if header else []
+    if not roles or not all(roles) or len(set(roles)) < len(roles):
+        roles = {1: ['amount'], 2: ['amount', 'balance'], 3: ['debit', 'credit', 'balance']}.get(
+            len(columns), ['amount'] * len(columns))
+    return {'signature': signature, 'columns': [{'right': right, 'role': role} for right, role in zip(columns, roles)]}
+
+def load_layouts(path: str) -> Dict[str, Dict[str, Any]]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r') as f:
+        return json.load(f)
+
+def save_layouts(layouts: Dict[str, Dict[str, Any]], path: str):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(layouts, f, indent=2)
+    os.replace(tmp_path, path)
+
+def _parse_date(text: str, year: int) -> date:
+    month, day, year_text = _DATE_RE.match(text).groups()
+    if year_text:
+        year = int(year_text) + (2000 if len(year_text) == 2 else 0)
+    return date(year, int(month), int(day))
+
+def _signed_cents(text: str) -> int:
+    negative = text.startswith(('(', '-')) or text.endswith((')', '-'))
+    cents = to_cents(text.strip('()-').replace('$', '').replace('-', ''))
+    return -cents if negative else cents
+
+def apply_layout(layout: Dict[str, Any], pages: List[List[Dict[str, Any]]], statement: str,
+                 year: int) -> Dict[str, Any]:
+    """
+    Turns a statement's lines into ledger rows (the load_ledger shape, plus the
+    running balance and where the line came from). Amounts take their sign from
+    a debit or credit column, or else from the section heading above them,
+    which carries over page breaks.
+    """
+    columns = layout['columns']
+    records = []
+    balances = {}
+    sign = 1
+    for page_num, lines in enumerate(pages):
+        previous = None
+        for line in lines:
+            if not line['date']:
+                label = ' '.join(_WORD_RE.findall(line['text'].lower()))
+                if label in BALANCE_LABELS and line['amounts']:
+                    balances[BALANCE_LABELS[label]] = _signed_cents(line['amounts'][-1][1])
+                elif not line['amounts'] and _heading_sign(line):
+                    sign = _heading_sign(line)
+                elif (not line['amounts'] and previous is not None and line['x0'] is not None
+                      and line['x0'] >= previous['x0'] - 2 and line['top'] - previous['top'] <= CONTINUATION_GAP):
+                    records[-1]['description'] += f" {line['text']}"
+                    previous = line
+                    continue
+                previous = None
+                continue
+            values = {}
+            for right, text in line['amounts']:
+                column = min(columns, key=lambda c: abs(c['right'] - right), default=None)
+                if column is not None and abs(column['right'] - right) <= 3 * COLUMN_TOLERANCE:
+                    values[column['role']] = _signed_cents(text)
+            if 'debit' in values or 'credit' in values:
+                cents = values.get('credit', 0) - abs(values.get('debit', 0))
+            elif 'amount' in values:
+                cents = sign * values['amount']
+            else:
+                previous = None
+                continue
+            records.append({
+                'row': len(records) + 1,
+                'date': _parse_date(line['date'], year),
+                'cents': cents,
+                'category': '',
+                'description': line['text'],
+                'paymentMethod': '',
+                'cleared': True,
+                'combinedTotal': '',
+                'balance': values.get('balance'),
+                'statement': statement,
+                'page': page_num + 1,
+            })
+            previous = line
+    result = {'records': records, 'beginning_balance': balances.get('beginning'),
+              'ending_balance': balances.get('ending'), 'balanced': None}
+    if 'beginning' in balances and 'ending' in balances:
+        result['balanced'] = balances['beginning'] + sum(r['cents'] for r in records) == balances['ending']
+    return result
+
+def extract_statements(paths: List[str], workers: Optional[int] = None, layouts_path: str = DEFAULT_LAYOUTS,
+                       relearn: bool = False) -> Dict[str, Any]:
+    """
+    Extracts the transactions of bank statement PDFs.
+
+    The pages of every statement are read in parallel on a process pool (each
+    worker keeps its pdfplumber documents open across pages). A statement's
+    format is recognized by its first heading and page size; its column
+    layout is learned from the first statement of that format and saved, so
+    later statements, including months whose lines only use some of the
+    columns, are read with the same columns. Records are renumbered across
+    all statements in the order given.
+    """
+    workers = workers or os.cpu_count() or 1
+    tasks = [(path, page_num) for path in paths for page_num in range(len(pdf_reader(path).pages))]
+    if workers > 1 and len(tasks) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as executor:
+            results = list(executor.map(_read_page, tasks, chunksize=max(1, len(tasks) // (workers * 4))))
+    else:
+        results = [_read_page(task) for task in tasks]
+        _close_documents()
+
+    by_path = defaultdict(list)
+    signatures = {}
+    for result in results:
+        by_path[result['path']].append(result['lines'])
+        if 'signature' in result:
+            signatures[result['path']] = result['signature']
+
+    layouts = {} if relearn else load_layouts(layouts_path)
+    learned = 0
+    statements = {}
+    records = []
+    for path in paths:
+        pages = by_path[path]
+        signature = signatures[path]
+        layout = layouts.get(signature)
+        if layout is None:
+            layout = dict(learn_layout(pages, signature), learned_from=os.path.basename(path))
+            # A statement without transactions has nothing to learn from; the next one of its format will
+            if layout['columns']:
+                layouts[signature] = layout
+                learned += 1
+        text = ' '.join(line['text'] for lines in pages[:1] for line in lines)
+        years = _YEAR_RE.findall(text)
+        year = int(years[0]) if years else date.fromtimestamp(os.path.getmtime(path)).year
+        statement = apply_layout(layout, pages, os.path.basename(path), year)
+        statement.update(format=signature, pages=len(pages))
+        for record in statement['records']:
+            record['row'] = len(records) + 1
+            records.append(record)
+        statements[path] = statement
+    if learned:
+        save_layouts(layouts, layouts_path)
+    return {'statements': statements, 'records': records, 'layouts_learned': learned}
+
+def to_compact_entry(record: Dict[str, Any]) -> Dict[str, Any]:
+    """A statement record in the compact ledger format (financial_entries.json / ledger JSON Lines)"""
+    day = record['date']
+    seconds = int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+    return {
+        'date': {'_seconds': seconds, '_nanoseconds': 0},
+        'amount': record['cents'] / 100,
+        'description': record['description'],
+        'programId': '',
+        'programName': '',
+        'paymentMethod': '',
+        'cleared': True,
+        'statement': record['statement'],
+        'page': record['page'],
+    }
+
+def _format_cents(cents: Optional[int]) -> str:
+    if cents is None:
+        return 'n/a'
+    return f"{'-' if cents < 0 else ''}${abs(cents) / 100:,.2f}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Extract transactions from bank statement PDFs')
+    parser.add_argument('statements', nargs='+', help='Statement PDFs, e.g. one per month')
+    parser.add_argument('--output', default='statement_entries.jsonl', help='Ledger JSON Lines output')
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--layouts', default=DEFAULT_LAYOUTS, help='Learned column layouts file')
+    parser.add_argument('--relearn', action='store_true', help='Learn the column layouts again')
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    result = extract_statements(args.statements, args.workers, args.layouts, args.relearn)
+    for path, statement in result['statements'].items():
+        balanced = {None: 'no balances found', True: 'balances', False: 'DOES NOT BALANCE'}[statement['balanced']]
+        print(f"{path}: {len(statement['records'])} transactions on {statement['pages']} pages "
+              f"[{statement['format']}], {_format_cents(statement['beginning_balance'])} -> "
+              f"{_format_cents(statement['ending_balance'])} ({balanced})")
+    with open(args.output, 'w') as f:
+        for record in result['records']:
+            f.write(json.dumps(to_compact_entry(record)) + '\n')
+    print(f"\n{len(result['records'])} transactions from {len(args.statements)} statements in "
+          f"{time.perf_counter() - start:.2f}s ({result['layouts_learned']} layouts learned)")
+    print(f"Ledger entries written to: {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Tests for the running-balance index, checked against plain sums:
+
+    python -m pytest scripts/test_balance_index.py
+"""
+import random
+import unittest
+from datetime import date, timedelta
+
+from balance_index import BalanceIndex, _Fenwick, audit_cash_on_hand, monthly_balance_sheet
+
+def brute_balance(entries: dict, opening: int, as_of: date) -> int:
+    return opening + sum(cents for day, cents in entries.values() if day <= as_of)
+
+def brute_totals(entries: dict, start: date, end: date):
+    income = sum(cents for day, cents in entries.values() if start <= day <= end and cents >= 0)
+    expenses = sum(-cents for day, cents in entries.values() if start <= day <= end and cents < 0)
+    return income, expenses
+
+class FenwickTest(unittest.TestCase):
+    def test_prefix_sums(self):
+        rng = random.Random(1)
+        values = [rng.randint(-500, 500) for _ in range(37)]
+        tree = _Fenwick(values)
+        for _ in range(200):
+            slot = rng.randrange(len(values))
+            delta = rng.randint(-100, 100)
+            tree.add(slot, delta)
+            values[slot] += delta
+            probe = rng.randrange(len(values))
+            self.assertEqual(tree.prefix(probe), sum(values[:probe + 1]))
+        # Past the last slot the prefix is the total
+        self.assertEqual(tree.prefix(len(values) + 10), sum(values))
+
+class BalanceIndexTest(unittest.TestCase):
+    def assert_matches(self, index: BalanceIndex, entries: dict, opening: int, days):
+        for day in days:
+            self.assertEqual(index.balance_as_of(day), brute_balance(entries, opening, day), day)
+            end = day + timedelta(days=45)
+            self.assertEqual(index.totals_between(day, end), brute_totals(entries, day, end), day)
+
+    def test_random_edits_match_brute_force(self):
+        rng = random.Random(7)
+        start = date(2025, 1, 1)
+        index = BalanceIndex(opening_cents=10_000, start=start, days=30)
+        entries = {}
+        for step in range(400):
+            action = rng.random()
+            if action < 0.6 or not entries:
+                # Mostly inside the year, sometimes well before the start or past the end to force rebuilds
+                day = start + timedelta(days=rng.choice([rng.randint(0, 364), rng.randint(-400, -1),
+                                                         rng.randint(365, 900)]))
+                cents = rng.choice([1, -1]) * rng.randint(1, 50_000)
+                index.add(step, day, cents)
+                entries[step] = (day, cents)
+            elif action < 0.8:
+                entry_id = rng.choice(list(entries))
+                index.remove(entry_id)
+                del entries[entry_id]
+            else:
+                entry_id = rng.choice(list(entries))
+                day = entries[entry_id][0] + timedelta(days=rng.randint(-200, 200))
+                cents = -entries[entry_id][1]
+                index.update(entry_id, day, cents)
+                entries[entry_id] = (day, cents)
+            if step % 50 == 0:
+                self.assert_matches(index, entries, 10_000, [start + timedelta(days=d) for d in range(-420, 920, 37)])
+        self.assert_matches(index, entries, 10_000, [start + timedelta(days=d) for d in range(-420, 920, 7)])
+
+    def test_rebuild_keeps_existing_entries(self):
+        index = BalanceIndex(start=date(2025, 6, 1), days=10)
+        index.add('a', date(2025, 6, 5), 1_000)
+        index.add('b', date(2024, 1, 1), -300)    # before the start
+        index.add('c', date(2027, 3, 1), 500)     # past the end
+        self.assertEqual(index.balance_as_of(date(2023, 12, 31)), 0)
+        self.assertEqual(index.balance_as_of(date(2024, 1, 1)), -300)
+        self.assertEqual(index.balance_as_of(date(2025, 6, 5)), 700)
+        self.assertEqual(index.balance_as_of(date(2030, 1, 1)), 1_200)
+        self.assertEqual(index.totals_between(date(2024, 1, 1), date(2027, 3, 1)), (1_500, 300))
+
+    def test_duplicate_id_rejected(self):
+        index = BalanceIndex(start=date(2025, 1, 1))
+        index.add(1, date(2025, 1, 2), 100)
+        with self.assertRaises(ValueError):
+            index.add(1, date(2025, 1, 3), 100)
+
+    def test_from_ledger_and_reports(self):
+        rows = [
+            {'row': 1, 'date': date(2025, 1, 15), 'cents': 20_000},
+            {'row': 2, 'date': date(2025, 2, 1), 'cents': -5_000},
+            {'row': 3, 'date': date(2025, 7, 4), 'cents': 1_250},
+            {'row': 4, 'date': date(2025, 12, 31), 'cents': -250},
+        ]
+        index = BalanceIndex.from_ledger(rows, opening_cents=1_000)
+        months = monthly_balance_sheet(index, 2025)
+        self.assertEqual(months[0], {'month': 1, 'opening': 1_000, 'income': 20_000, 'expenses': 0, 'closing': 21_000})
+        self.assertEqual(months[1]['closing'], 16_000)
+        self.assertEqual(months[11]['closing'], 17_000)
+        self.assertEqual(audit_cash_on_hand(index, 2025, 'July-December'),
+                         {'cash_on_hand_start': 16_000, 'income': 1_250, 'expenses': 250, 'cash_on_hand_end': 17_000})
+        with self.assertRaises(ValueError):
+            audit_cash_on_hand(index, 2025, 'Q3')
+
+if __name__ == '__main__':
+    unittest.main()
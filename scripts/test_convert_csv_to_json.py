@@ -0,0 +1,109 @@
+"""
+Tests for the Sheets CSV conversion and its incremental mode:
+
+    python -m pytest scripts/test_convert_csv_to_json.py
+"""
+import json
+import os
+import tempfile
+import unittest
+
+from convert_csv_to_json import convert_csv_to_json, state_paths
+
+HEADER = ',Category,Date,Recipient/Cause,Amount,Transaction Type,Cleared,Combined Total\r\n'
+
+def csv_row(i: int, amount: str = None) -> str:
+    if amount is None:
+        amount = f"${i}.25" if i % 3 else f"-${i},000.50"
+    if ',' in amount:
+        amount = f'"{amount}"'
+    category = 'E-Council - Postage' if '-' in amount else 'R-Membership Dues'
+    return f",{category},1/{i % 28 + 1}/2025,\"Payee {i}, \"\"quoted\"\"\",{amount},Check,,\r\n"
+
+class ConvertIncrementalTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_file = os.path.join(self.tmp.name, 'export.csv')
+        self.json_file = os.path.join(self.tmp.name, 'entries.json')
+        self.dead_letter = os.path.join(self.tmp.name, 'rejected.jsonl')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_csv(self, rows, newline_at_end: bool = True):
+        text = HEADER + ''.join(rows)
+        with open(self.csv_file, 'w', newline='') as f:
+            f.write(text if newline_at_end else text.rstrip('\r\n'))
+
+    def convert(self, incremental: bool = True):
+        return convert_csv_to_json(self.csv_file, self.json_file, self.dead_letter, incremental=incremental)
+
+    def read_output(self) -> bytes:
+        with open(self.json_file, 'rb') as f:
+            return f.read()
+
+    def full_output(self) -> bytes:
+        """What a plain conversion of the current CSV writes, for comparison"""
+        reference = os.path.join(self.tmp.name, 'reference.json')
+        convert_csv_to_json(self.csv_file, reference, os.path.join(self.tmp.name, 'reference_rejected.jsonl'))
+        with open(reference, 'rb') as f:
+            return f.read()
+
+    def test_appended_rows_are_appended(self):
+        rows = [csv_row(i) for i in range(1, 41)]
+        self.write_csv(rows)
+        self.assertEqual(len(self.convert()), 40)
+
+        rows += [csv_row(i) for i in range(41, 46)] + [csv_row(46, '$0.00')]
+        self.write_csv(rows)
+        new = self.convert()
+        self.assertEqual([entry['Recipient/Cause'] for entry in new], [f'Payee {i}, "quoted"' for i in range(41, 46)])
+        # Appending in place gives the same bytes as converting everything again
+        self.assertEqual(self.read_output(), self.full_output())
+        with open(self.dead_letter) as f:
+            # Data rows are numbered from 1, after the header
+            self.assertEqual([json.loads(line)['row'] for line in f], [46])
+
+    def test_last_row_without_newline(self):
+        rows = [csv_row(i) for i in range(1, 6)]
+        self.write_csv(rows, newline_at_end=False)
+        self.convert()
+        self.write_csv(rows + [csv_row(6)])
+        self.assertEqual(len(self.convert()), 1)
+        self.assertEqual(self.read_output(), self.full_output())
+
+    def test_edited_row_reconverts_and_reports_the_change(self):
+        rows = [csv_row(i) for i in range(1, 21)]
+        self.write_csv(rows)
+        self.convert()
+        rows[4] = csv_row(5, '$999.99')
+        self.write_csv(rows + [csv_row(21)])
+        new = self.convert()
+        self.assertEqual([entry['Recipient/Cause'] for entry in new], ['Payee 5, "quoted"', 'Payee 21, "quoted"'])
+        self.assertEqual(new[0]['Amount'], '999.99')
+        self.assertEqual(self.read_output(), self.full_output())
+
+    def test_plain_conversion_discards_state(self):
+        # A plain conversion rewrites the output, so the next incremental run must not append to it
+        self.write_csv([csv_row(i) for i in range(1, 41)])
+        self.convert()
+        self.write_csv([csv_row(i) for i in range(1, 61)])
+        self.convert(incremental=False)
+        self.assertFalse(any(os.path.exists(path) for path in state_paths(self.json_file)))
+        self.write_csv([csv_row(i) for i in range(1, 62)])
+        self.convert()
+        self.assertEqual(len(json.loads(self.read_output())), 61)
+        self.assertEqual(self.read_output(), self.full_output())
+
+    def test_output_edited_by_hand_is_not_appended_to(self):
+        self.write_csv([csv_row(i) for i in range(1, 11)])
+        self.convert()
+        # Still a valid array ending in "\n]", so only the saved digest can tell it changed
+        with open(self.json_file, 'w') as f:
+            json.dump([{'Category': 'edited'}], f, indent=2)
+        self.write_csv([csv_row(i) for i in range(1, 13)])
+        self.convert()
+        self.assertEqual(self.read_output(), self.full_output())
+
+if __name__ == '__main__':
+    unittest.main()
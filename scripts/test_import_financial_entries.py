@@ -0,0 +1,112 @@
+"""
+Offline regression tests for the entries import, run against FakeFirestore:
+
+    python -m pytest scripts/test_import_financial_entries.py
+"""
+import json
+import os
+import tempfile
+import unittest
+from datetime import datetime, timezone
+
+from fake_firestore import FakeFirestore, run_import_benchmark
+from import_financial_entries import import_financial_entries
+from local_mirror import open_mirror, sync_mirror
+
+ORGANIZATION_ID = 'C000001'
+
+def ledger_entry(day: int, amount: float, program_name: str, description: str) -> dict:
+    seconds = int(datetime(2025, 1, day, tzinfo=timezone.utc).timestamp())
+    return {
+        'date': {'_seconds': seconds, '_nanoseconds': 0},
+        'amount': amount,
+        'description': description,
+        'programId': '',
+        'programName': program_name,
+        'paymentMethod': 'Cash',
+        'createdAt': {'_seconds': seconds, '_nanoseconds': 0},
+        'updatedAt': {'_seconds': seconds, '_nanoseconds': 0},
+        'createdBy': 'system',
+        'updatedBy': 'system',
+    }
+
+ENTRIES = [
+    ledger_entry(2, 34.9, 'Dues', 'Dues Square'),
+    ledger_entry(3, 120.0, 'Dues', 'Dues check'),
+    ledger_entry(4, -250.0, 'Council Insurance', 'Insurance premium'),
+    ledger_entry(5, 10.0, 'No Such Program', 'Unknown program'),
+]
+
+class ImportFinancialEntriesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.json_file = os.path.join(self.tmp.name, 'entries.json')
+        self.dead_letter = os.path.join(self.tmp.name, 'rejected.jsonl')
+        with open(self.json_file, 'w') as f:
+            json.dump(ENTRIES, f)
+        self.db = FakeFirestore(seed=0)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def finance_docs(self, entry_type: str) -> list:
+        ref = self.db.collection('organizations').document(ORGANIZATION_ID).collection('finance')
+        return [doc.to_dict() for doc in ref.document(entry_type).collection('2025').stream()]
+
+    def test_documents_written(self):
+        result = run_import_benchmark(self.json_file, ORGANIZATION_ID, self.db, dead_letter_file=self.dead_letter)
+        self.assertEqual((result['imported'], result['rejected'], result['errors']), (3, 1, 0))
+
+        income = sorted(self.finance_docs('income'), key=lambda doc: doc['date'])
+        expenses = self.finance_docs('expenses')
+        self.assertEqual([doc['amount'] for doc in income], [34.9, 120.0])
+        self.assertEqual([doc['program']['name'] for doc in income], ['Dues', 'Dues'])
+        self.assertEqual(len(expenses), 1)
+        self.assertEqual((expenses[0]['amount'], expenses[0]['isExpense']), (250.0, True))
+        self.assertEqual(expenses[0]['program']['name'], 'Council Insurance')
+        self.assertEqual(income[0]['date'], datetime(2025, 1, 2, tzinfo=timezone.utc))
+        # updatedAt is the import's server time, the source's is kept apart
+        self.assertGreater(income[0]['updatedAt'], income[0]['sourceUpdatedAt'])
+
+        with open(self.dead_letter) as f:
+            rejected = [json.loads(line) for line in f]
+        self.assertEqual([r['record']['programName'] for r in rejected], ['No Such Program'])
+
+    def test_clean_run_leaves_no_rejects(self):
+        with open(self.dead_letter, 'w') as f:
+            f.write('{"row": 1, "reasons": ["left by an earlier run"]}\n')
+        with open(self.json_file, 'w') as f:
+            json.dump(ENTRIES[:3], f)
+        result = run_import_benchmark(self.json_file, ORGANIZATION_ID, self.db, dead_letter_file=self.dead_letter)
+        self.assertEqual((result['imported'], result['rejected']), (3, 0))
+        self.assertFalse(os.path.exists(self.dead_letter))
+
+    def test_firestore_usage(self):
+        programs = self.db.collection('organizations').document(ORGANIZATION_ID).collection('programs')
+        result = run_import_benchmark(self.json_file, ORGANIZATION_ID, self.db, dead_letter_file=self.dead_letter)
+        usage = result['firestore']
+        # One read of the programs collection, then one set and one update per imported entry
+        self.assertEqual(usage['reads'], len(programs.get()))
+        self.assertEqual(usage['writes'], 2 * result['imported'])
+        self.assertEqual(usage['calls'].get('set'), result['imported'])
+        self.assertEqual(usage['calls'].get('update'), result['imported'])
+        self.assertEqual(usage['calls'].get('get', 0), 0)
+        self.assertEqual(usage['deletes'], 0)
+
+    def test_reimport_skips_duplicates(self):
+        run_import_benchmark(self.json_file, ORGANIZATION_ID, self.db, dead_letter_file=self.dead_letter)
+        mirror_path = os.path.join(self.tmp.name, 'mirror.sqlite')
+        conn = open_mirror(mirror_path)
+        sync_mirror(self.db, conn, ORGANIZATION_ID)
+        conn.close()
+
+        self.db.stats.reset()
+        result = import_financial_entries(ORGANIZATION_ID, self.json_file, mirror_path=mirror_path, verbose=False,
+                                          dead_letter_file=self.dead_letter, duplicates='skip')
+        self.assertEqual((result['imported'], result['duplicates']), (0, 3))
+        # Programs and the existing ledger come from the mirror: no Firestore traffic at all
+        self.assertEqual(self.db.stats.snapshot()['rpcs'], 0)
+        self.assertEqual(len(self.finance_docs('income')) + len(self.finance_docs('expenses')), 3)
+
+if __name__ == '__main__':
+    unittest.main()
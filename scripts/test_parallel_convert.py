@@ -0,0 +1,94 @@
+"""
+Tests for the multi-core CSV conversion against the serial converter:
+
+    python -m pytest scripts/test_parallel_convert.py
+"""
+import os
+import tempfile
+import unittest
+
+import parallel_convert
+from convert_csv_to_json import convert_csv_to_json
+from parallel_convert import convert_csv_parallel, header_end, record_boundaries, split_chunks
+
+HEADER = ',Category,Date,Recipient/Cause,Amount,Transaction Type,Cleared,Combined Total\r\n'
+
+def csv_row(i: int) -> str:
+    if i % 17 == 0:
+        amount = '$0.00'                                   # rejected: zero amount
+    elif i % 3 == 0:
+        amount = f'"-${i},000.50"'
+    else:
+        amount = f'${i}.25'
+    if i % 5 == 0:
+        payee = f'"Payee {i}\nsecond line, with ""quotes"""'  # quoted newline inside a record
+    else:
+        payee = f'Payee {i} café'
+    return f",R-Membership Dues,1/{i % 28 + 1}/2025,{payee},{amount},Check,,\r\n"
+
+class RecordBoundariesTest(unittest.TestCase):
+    def test_quoted_newlines_are_not_boundaries(self):
+        data = b'h\n"a\nb",1\n"c""\n",2\nlast'
+        start = data.index(b'\n') + 1
+        self.assertEqual(record_boundaries(data, start, [start, start + 3, len(data) - 6]),
+                         [data.index(b',1\n') + 3, data.index(b',2\n') + 3, len(data)])
+
+class ParallelConvertTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.csv_file = os.path.join(self.tmp.name, 'export.csv')
+        # Small chunks so a short test file is still split many ways
+        self.min_chunk_bytes = parallel_convert.MIN_CHUNK_BYTES
+        parallel_convert.MIN_CHUNK_BYTES = 256
+
+    def tearDown(self):
+        parallel_convert.MIN_CHUNK_BYTES = self.min_chunk_bytes
+        self.tmp.cleanup()
+
+    def outputs(self, name: str):
+        with open(os.path.join(self.tmp.name, f'{name}.json'), 'rb') as f:
+            json_bytes = f.read()
+        rejected = os.path.join(self.tmp.name, f'{name}_rejected.jsonl')
+        with open(rejected, 'rb') as f:
+            return json_bytes, f.read()
+
+    def test_chunks_end_on_record_boundaries(self):
+        data = (HEADER + ''.join(csv_row(i) for i in range(1, 400))).encode('utf-8')
+        start = header_end(data)
+        ranges = split_chunks(data, start, 8)
+        self.assertEqual(len(ranges), 8)
+        self.assertEqual((ranges[0][0], ranges[-1][1]), (start, len(data)))
+        for (_, end), (begin, _) in zip(ranges, ranges[1:]):
+            self.assertEqual(end, begin)
+            # Quotes balance within every chunk, so none splits a quoted newline
+            self.assertEqual(data[start:end].count(b'"') % 2, 0)
+            self.assertEqual(data[end - 1:end], b'\n')
+
+    def check_identical(self, text: str, workers: int):
+        with open(self.csv_file, 'w', newline='', encoding='utf-8') as f:
+            f.write(text)
+        serial = convert_csv_to_json(self.csv_file, os.path.join(self.tmp.name, 'serial.json'))
+        parallel = convert_csv_parallel(self.csv_file, os.path.join(self.tmp.name, 'parallel.json'),
+                                        workers=workers, return_entries=True)
+        self.assertEqual(parallel, serial)
+        self.assertEqual(self.outputs('parallel'), self.outputs('serial'))
+
+    def test_byte_identical_to_serial(self):
+        rows = ''.join(csv_row(i) for i in range(1, 400))
+        for workers in (1, 3):
+            with self.subTest(workers=workers):
+                self.check_identical(HEADER + rows, workers)
+
+    def test_last_row_without_newline(self):
+        self.check_identical(HEADER + ''.join(csv_row(i) for i in range(1, 60)).rstrip('\r\n'), 2)
+
+    def test_header_only(self):
+        with open(self.csv_file, 'w', newline='') as f:
+            f.write(HEADER)
+        self.assertEqual(convert_csv_parallel(self.csv_file, os.path.join(self.tmp.name, 'parallel.json'),
+                                              workers=2, return_entries=True), [])
+        with open(os.path.join(self.tmp.name, 'parallel.json')) as f:
+            self.assertEqual(f.read(), '[]')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+Tests for incremental PDF form filling, on the Cloud Functions templates:
+
+    python -m pytest scripts/test_pdf_incremental.py
+"""
+import os
+import re
+import tempfile
+import unittest
+from io import BytesIO
+
+from PyPDF2 import PdfReader
+
+from pdf_incremental import fill_pdf_incremental, write_pdf_incremental
+from report_service import TEMPLATES_DIR, Template
+
+TEMPLATE = os.path.join(TEMPLATES_DIR, 'fraternal_survey1728_p.pdf')
+
+def field_values(data: bytes) -> dict:
+    return {name: field.get('/V') for name, field in (PdfReader(BytesIO(data), strict=True).get_fields() or {}).items()}
+
+def startxrefs(data: bytes) -> list:
+    return [int(offset) for offset in re.findall(rb'startxref\s+(\d+)\s+%%EOF', data)]
+
+class IncrementalFillTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(TEMPLATE, 'rb') as f:
+            cls.original = f.read()
+        # The templates use cross-reference streams; an unflattened fill is written with a classic xref table
+        cls.table_copy = Template(TEMPLATE).fill({}, flatten=False)
+
+    def check_round_trip(self, original: bytes, xref_stream: bool):
+        data, filled = fill_pdf_incremental(original, {'Text1': '25', 'Text3': '15857', 'Missing': 'x'})
+        self.assertEqual(sorted(filled), ['Text1', 'Text3'])
+        # The original bytes are untouched; the update is appended after them
+        self.assertTrue(data.startswith(original))
+        update = data[len(original):]
+        self.assertEqual(b'/Type /XRef' in update, xref_stream)
+        self.assertIn(f"/Prev {startxrefs(original)[-1]}".encode(), update)
+
+        values = field_values(data)
+        self.assertEqual((values['Text1'], values['Text3']), ('25', '15857'))
+        self.assertEqual(values['Text2'], field_values(original)['Text2'])
+        return data
+
+    def test_round_trip_xref_stream(self):
+        self.check_round_trip(self.original, xref_stream=True)
+
+    def test_round_trip_xref_table(self):
+        self.check_round_trip(self.table_copy, xref_stream=False)
+
+    def test_stacked_updates(self):
+        for original, xref_stream in ((self.original, True), (self.table_copy, False)):
+            with self.subTest(xref_stream=xref_stream):
+                first = self.check_round_trip(original, xref_stream)
+                second, filled = fill_pdf_incremental(first, {'Text1': '26', 'Text4': 'Texas'})
+                self.assertEqual(sorted(filled), ['Text1', 'Text4'])
+                self.assertTrue(second.startswith(first))
+                # Each update's /Prev points at the section before it
+                offsets = startxrefs(second)
+                self.assertEqual(len(offsets), len(startxrefs(original)) + 2)
+                self.assertIn(f"/Prev {offsets[-2]}".encode(), second[len(first):])
+                values = field_values(second)
+                self.assertEqual((values['Text1'], values['Text3'], values['Text4']), ('26', '15857', 'Texas'))
+
+    def test_nothing_to_fill_returns_original(self):
+        data, filled = fill_pdf_incremental(self.original, {'NoSuchField': 'x'})
+        self.assertEqual((data, filled), (self.original, []))
+
+    def test_write_from_path(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = os.path.join(tmp, 'filled.pdf')
+            filled = write_pdf_incremental(TEMPLATE, output_path, {'Text3': '15857'})
+            with open(output_path, 'rb') as f:
+                data = f.read()
+        self.assertEqual(filled, ['Text3'])
+        self.assertTrue(data.startswith(self.original))
+        self.assertEqual(field_values(data)['Text3'], '15857')
+
+if __name__ == '__main__':
+    unittest.main()
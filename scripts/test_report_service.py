@@ -0,0 +1,52 @@
+"""
+Offline tests for the report fill service:
+
+    python -m pytest scripts/test_report_service.py
+"""
+import unittest
+from io import BytesIO
+
+from PyPDF2 import PdfReader
+from PyPDF2.generic import DictionaryObject
+
+import report_service
+from report_service_loadtest import SAMPLE_BODIES
+
+def form_xobjects(resources, seen: set):
+    """Yields every form XObject reachable from a resources dictionary"""
+    xobjects = resources.get_object().get('/XObject') if resources is not None else None
+    for ref in (xobjects.get_object().values() if xobjects is not None else []):
+        if ref.idnum in seen:
+            continue
+        seen.add(ref.idnum)
+        xobject = ref.get_object()
+        if xobject.get('/Subtype') == '/Form':
+            yield xobject
+            yield from form_xobjects(xobject.get('/Resources'), seen)
+
+class FlattenedFontsTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        report_service.load_templates()
+
+    def test_appearance_fonts_resolve(self):
+        for endpoint, body in SAMPLE_BODIES.items():
+            with self.subTest(endpoint=endpoint):
+                data, _ = report_service.fill_report(endpoint, body, flatten=True)
+                reader = PdfReader(BytesIO(data))
+                self.assertNotIn('/AcroForm', reader.trailer['/Root'])
+                fonts = 0
+                seen = set()
+                for page in reader.pages:
+                    for xobject in form_xobjects(page.get('/Resources'), seen):
+                        resources = xobject.get('/Resources')
+                        font_dict = resources.get_object().get('/Font') if resources is not None else None
+                        for name, ref in (font_dict.get_object().items() if font_dict is not None else []):
+                            font = ref.get_object()
+                            self.assertIsInstance(font, DictionaryObject, f"{endpoint} {name}")
+                            self.assertEqual(font.get('/Type'), '/Font', f"{endpoint} {name}")
+                            fonts += 1
+                self.assertGreater(fonts, 0)
+
+if __name__ == '__main__':
+    unittest.main()
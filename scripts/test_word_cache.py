@@ -0,0 +1,81 @@
+"""
+Tests for the persistent pdfplumber word cache:
+
+    python -m pytest scripts/test_word_cache.py
+"""
+import os
+import tempfile
+import unittest
+
+import pdfplumber
+
+from report_service import TEMPLATES_DIR
+from word_cache import ExtractedWords, WordCache, WordFile, encode_pages
+
+PDF = os.path.join(TEMPLATES_DIR, 'audit2_1295_p.pdf')
+
+def plumber_words(**params) -> list:
+    with pdfplumber.open(PDF) as pdf:
+        return [page.extract_words(**params) for page in pdf.pages]
+
+class WordCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def cached_words(self, **params) -> list:
+        cache = WordCache(self.tmp.name)
+        try:
+            document = cache.document(PDF, **params)
+            return [document.page(i).words for i in range(document.page_count)], (cache.hits, cache.misses)
+        finally:
+            cache.close()
+
+    def check_miss_then_hit(self, **params):
+        expected = plumber_words(**params)
+        self.assertEqual(self.cached_words(**params), (expected, (0, 1)))
+        # A fresh cache reads the file written by the first one
+        self.assertEqual(self.cached_words(**params), (expected, (1, 0)))
+
+    def test_default_words(self):
+        self.check_miss_then_hit()
+
+    def test_extra_attrs_survive_a_hit(self):
+        self.check_miss_then_hit(extra_attrs=['fontname', 'size', 'non_stroking_color', 'stroking_color'])
+
+    def test_return_chars_survive_a_hit(self):
+        self.check_miss_then_hit(return_chars=True)
+
+    def test_older_format_is_rewritten(self):
+        cache = WordCache(self.tmp.name)
+        path = cache.cache_path(PDF, {})
+        with open(path, 'wb') as f:
+            f.write(b'CFWORDS1' + bytes(8))
+        self.assertEqual(self.cached_words(), (plumber_words(), (0, 1)))
+
+    def test_non_literal_extras_are_not_written(self):
+        pages = [(612.0, 792.0, [{'text': 'a', 'x0': 1.0, 'x1': 2.0, 'top': 3.0, 'doctop': 3.0, 'bottom': 4.0,
+                                  'upright': True, 'height': 1.0, 'width': 1.0, 'direction': 'ltr',
+                                  'pattern': object()}])]
+        with self.assertRaises(ValueError):
+            encode_pages(pages)
+        self.assertEqual(ExtractedWords(pages).page(0).words, pages[0][2])
+
+    def test_file_round_trip(self):
+        pages = [(612.0, 792.0, [{'text': 'héllo', 'x0': 1.0, 'x1': 2.5, 'top': 3.0, 'doctop': 795.0,
+                                  'bottom': 4.0, 'upright': False, 'height': 1.0, 'width': 1.5, 'direction': 'ttb',
+                                  'size': 9.5, 'color': (0, 0.5), 'tags': ['a', None]}]),
+                 (612.0, 792.0, [])]
+        path = os.path.join(self.tmp.name, 'doc.words')
+        with open(path, 'wb') as f:
+            f.write(encode_pages(pages))
+        word_file = WordFile(path)
+        try:
+            self.assertEqual([word_file.page(i) for i in range(2)], [(w, h, words) for w, h, words in pages])
+        finally:
+            word_file.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,236 @@
+import json
+import math
+import os
+import re
+from collections import Counter
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+# PaymentMethod display names from lib/src/models/payment_method.dart, plus the
+# Interest transaction type the Sheets export uses for bank interest
+PAYMENT_METHODS = ('Cash', 'Check', 'Debit Card', 'Square', 'Interest')
+
+MIN_DATE = date(2000, 1, 1)
+
+_AMOUNT_RE = re.compile(r'^\s*(-\s*\$?|\$\s*-?)?\s*(\d{1,3}(,\d{3})+|\d+)?(\.\d+)?\s*$')
+_DATE_RE = re.compile(r'^\s*(\d{1,2})/(\d{1,2})/(\d{4}|\d{2})\s*$')
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# A check returns a reject reason ("kind: detail"), or None when the record passes
+Check = Callable[[Dict[str, Any]], Optional[str]]
+
+def compile_validator(required: Iterable[str] = (), nonempty: Iterable[str] = (),
+                      types: Optional[Dict[str, tuple]] = None,
+                      checks: Iterable[Check] = ()) -> Callable[[Dict[str, Any]], List[str]]:
+    """
+    Builds a validator that returns the reasons a record is rejected (empty if valid).
+
+    Field sets and type tables are frozen once here, so validating a record is a
+    set difference, a few isinstance calls and the checks. Checks only run when
+    every required field is present.
+    """
+    required = frozenset(required) | frozenset(nonempty)
+    nonempty = tuple(nonempty)
+    types = tuple((types or {}).items())
+    checks = tuple(checks)
+
+    def validate(record: Dict[str, Any]) -> List[str]:
+        missing = required.difference(record)
+        if missing:
+            return [f"missing field: {', '.join(sorted(missing))}"]
+        reasons = [f"empty field: {field}" for field in nonempty if not record[field]]
+        for field, field_types in types:
+            if not isinstance(record[field], field_types):
+                reasons.append(f"wrong type: {field} must be {' or '.join(t.__name__ for t in field_types)}")
+        if reasons:
+            return reasons
+        for check in checks:
+            reason = check(record)
+            if reason:
+                reasons.append(reason)
+        return reasons
+
+    return validate
+
+def _date_range_check(field: str, to_date: Callable[[Any], Optional[date]],
+                      min_date: date, max_date: date) -> Check:
+    def check(record):
+        value = to_date(record[field])
+        if value is None:
+            return f"bad date: {field} {record[field]!r}"
+        if not min_date <= value <= max_date:
+            return f"date out of range: {field} {value.isoformat()} not in {min_date}..{max_date}"
+        return None
+    return check
+
+def _payment_method_check(field: str, payment_methods: Iterable[str]) -> Check:
+    known = frozenset(m.lower() for m in payment_methods)
+
+    def check(record):
+        value = record[field]
+        if value.strip().lower() not in known:
+            return f"unknown payment method: {value!r}"
+        return None
+    return check
+
+def _program_check(field: str, program_exists: Callable[[str], bool]) -> Check:
+    def check(record):
+        if not program_exists(record[field]):
+            return f"unknown program: {record[field]!r}"
+        return None
+    return check
+
+def parse_sheet_date(value: str) -> Optional[date]:
+    """Parses M/D/YYYY or M/D/YY, returning None instead of raising"""
+    match = _DATE_RE.match(value)
+    if not match:
+        return None
+    month, day, year = match.groups()
+    try:
+        return date(int(year) + (2000 if len(year) == 2 else 0), int(month), int(day))
+    except ValueError:
+        return None
+
+def timestamp_date(value) -> Optional[date]:
+    """Date of a {'_seconds': ...} timestamp, or None"""
+    seconds = value.get('_seconds') if isinstance(value, dict) else None
+    if not isinstance(seconds, (int, float)) or isinstance(seconds, bool):
+        return None
+    return (_EPOCH + timedelta(seconds=seconds)).date()
+
+def default_max_date() -> date:
+    return date.today() + timedelta(days=366)
+
+def csv_row_validator(columns: Iterable[str] = (), payment_methods: Iterable[str] = PAYMENT_METHODS,
+                      min_date: date = MIN_DATE, max_date: Optional[date] = None, strict_signs: bool = False):
+    """
+    Validator for a Sheets export row as a header -> string dict. Every column
+    in `columns` must be present (rows shorter than the header are rejected).
+
+    Amounts must parse and be nonzero. With strict_signs, R- categories must be
+    positive and E- categories negative; the sheet records transfers against
+    the wrong sign, so this is off by default.
+    """
+    max_date = max_date or default_max_date()
+
+    def amount_check(record):
+        amount = record['Amount']
+        if not _AMOUNT_RE.match(amount) or not any(c.isdigit() for c in amount):
+            return f"bad amount: {amount!r}"
+        value = float(amount.replace('$', '').replace(',', '').replace(' ', ''))
+        if value == 0:
+            return "zero amount: Amount"
+        if strict_signs:
+            prefix = record['Category'].lstrip()[:2].upper()
+            if (prefix == 'R-' and value < 0) or (prefix == 'E-' and value > 0):
+                return f"wrong sign: {amount} for {record['Category']!r}"
+        return None
+
+    checks = [amount_check, _date_range_check('Date', parse_sheet_date, min_date, max_date)]
+    if payment_methods:
+        methods = _payment_method_check('Transaction Type', payment_methods)
+        checks.append(lambda record: methods(record) if record.get('Transaction Type') else None)
+    return compile_validator(required=columns, nonempty=('Category', 'Date', 'Amount'), checks=checks)
+
+def ledger_entry_validator(program_exists: Optional[Callable[[str], bool]] = None,
+                           payment_methods: Iterable[str] = PAYMENT_METHODS, min_date: date = MIN_DATE,
+                           max_date: Optional[date] = None):
+    """Validator for compact ledger entries (the financial_entries.json record format)"""
+    max_date = max_date or default_max_date()
+
+    def amount_check(record):
+        amount = record['amount']
+        if not math.isfinite(amount):
+            return f"bad amount: {amount!r}"
+        if amount == 0:
+            return "zero amount: amount"
+        return None
+
+    checks = [
+        amount_check,
+        _date_range_check('date', timestamp_date, min_date, max_date),
+        _payment_method_check('paymentMethod', payment_methods),
+    ]
+    if program_exists:
+        checks.append(_program_check('programName', program_exists))
+    return compile_validator(
+        required=('date', 'amount', 'description', 'programId', 'programName', 'paymentMethod'),
+        nonempty=('programName',),
+        types={'amount': (int, float), 'date': (dict,), 'description': (str,),
+               'programName': (str,), 'paymentMethod': (str,)},
+        checks=checks,
+    )
+
+class DeadLetterFile:
+    """
+    Writes rejected records with their reasons to a JSON Lines file. The file
+    is only opened on the first reject, so a clean run creates nothing; in 'w'
+    mode a file left by an earlier run is removed up front so it cannot be
+    mistaken for this run's rejects.
+    """
+
+    def __init__(self, path: str, source: str = '', mode: str = 'w'):
+        self.path = path
+        self.source = source
+        self.mode = mode
+        self.count = 0
+        self._file = None
+        if mode == 'w' and os.path.exists(path):
+            os.remove(path)
+
+    def write(self, row: int, record: Any, reasons: List[str]):
+        if self._file is None:
+            self._file = open(self.path, self.mode)
+        self._file.write(json.dumps({'source': self.source, 'row': row, 'reasons': reasons, 'record': record},
+                                    default=str))
+        self._file.write('\n')
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+class ValidationStage:
+    """
+    Streaming pipeline stage: pulls (row, record) pairs, yields the valid ones
+    and routes rejects to the dead-letter file with their reasons.
+    """
+
+    def __init__(self, validate: Callable[[Dict[str, Any]], List[str]],
+                 dead_letter: Optional[DeadLetterFile] = None, verbose: bool = True):
+        self.validate = validate
+        self.dead_letter = dead_letter
+        self.verbose = verbose
+        self.accepted = 0
+        self.rejected = 0
+        self.reasons = Counter()
+
+    def __call__(self, rows: Iterable[Tuple[int, Dict[str, Any]]]) -> Iterator[Tuple[int, Dict[str, Any]]]:
+        validate = self.validate
+        for row, record in rows:
+            reasons = validate(record)
+            if not reasons:
+                self.accepted += 1
+                yield row, record
+                continue
+            self.rejected += 1
+            for reason in reasons:
+                self.reasons[reason.split(':', 1)[0]] += 1
+            if self.dead_letter is not None:
+                self.dead_letter.write(row, record, reasons)
+            if self.verbose:
+                print(f"Skipping row {row}: {'; '.join(reasons)}")
+
+    def print_summary(self):
+        print(f"Validation: {self.accepted} accepted, {self.rejected} rejected")
+        for reason, count in self.reasons.most_common():
+            print(f"  {count:>6}  {reason}")
+        if self.dead_letter is not None and self.dead_letter.count:
+            print(f"Rejected rows written to: {self.dead_letter.path}")
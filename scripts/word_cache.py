@@ -0,0 +1,242 @@
+import argparse
+import ast
+import hashlib
+import json
+import mmap
+import os
+import struct
+from collections import namedtuple
+from typing import Any, Dict, List, Optional, Tuple
+
+from pdf_source import open_plumber, open_source
+
+DEFAULT_CACHE_DIR = os.environ.get('COUNCILFINANCES_WORD_CACHE') or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), '.word_cache')
+
+# File layout (little endian):
+#   header     magic, page count
+#   page table per page: width, height, first word index, word count
+#   words      fixed-size records: x0, x1, top, bottom, doctop, upright, direction, text offset, text length,
+#              extras offset, extras length
+#   text       UTF-8 word texts and extras, referenced by absolute offset
+# Extras hold the keys beyond the fixed ones (extra_attrs, return_chars) as a Python literal
+MAGIC = b'CFWORDS2'
+_HEADER = struct.Struct('<8sI')
+_PAGE = struct.Struct('<ddII')
+_WORD = struct.Struct('<dddddBBxxIIII')
+DIRECTIONS = ('ltr', 'rtl', 'ttb', 'btt')
+WORD_KEYS = frozenset(('text', 'x0', 'x1', 'top', 'doctop', 'bottom', 'upright', 'height', 'width', 'direction'))
+
+CachedPage = namedtuple('CachedPage', 'width height words')
+
+def params_key(params: Dict[str, Any]) -> str:
+    """Stable short hash of extract_words keyword arguments"""
+    return hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+def encode_pages(pages: List[Tuple[float, float, List[Dict[str, Any]]]]) -> bytes:
+    """
+    Serializes (width, height, words) per page into the cache file format.
+    Raises ValueError when a word's extra keys do not survive a literal round trip.
+    """
+    table, records, texts = [], [], []
+    text_offset = _HEADER.size + _PAGE.size * len(pages) + _WORD.size * sum(len(p[2]) for p in pages)
+    index = 0
+    for width, height, words in pages:
+        table.append(_PAGE.pack(width, height, index, len(words)))
+        for word in words:
+            text = word['text'].encode('utf-8')
+            extras = {key: value for key, value in word.items() if key not in WORD_KEYS}
+            extras_data = repr(extras).encode('utf-8') if extras else b''
+            if extras and _literal(extras_data) != extras:
+                raise ValueError(f"Word attributes cannot be cached: {sorted(extras)}")
+            direction = word.get('direction', 'ltr')
+            records.append(_WORD.pack(word['x0'], word['x1'], word['top'], word['bottom'], word['doctop'],
+                                      bool(word.get('upright', True)),
+                                      DIRECTIONS.index(direction) if direction in DIRECTIONS else 0,
+                                      text_offset, len(text), text_offset + len(text), len(extras_data)))
+            texts += [text, extras_data]
+            text_offset += len(text) + len(extras_data)
+        index += len(words)
+    return _HEADER.pack(MAGIC, len(pages)) + b''.join(table) + b''.join(records) + b''.join(texts)
+
+def _literal(data: bytes):
+    try:
+        return ast.literal_eval(data.decode('utf-8'))
+    except (ValueError, SyntaxError):
+        return None
+
+class WordFile:
+    """A memory-mapped cache file; pages are decoded on first access"""
+
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.page_count = _HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC:
+            self._map.close()
+            raise ValueError(f"Not a word cache file: {path}")
+        self._pages: Dict[int, CachedPage] = {}
+
+    def page(self, page_num: int) -> CachedPage:
+        if page_num in self._pages:
+            return self._pages[page_num]
+        if not 0 <= page_num < self.page_count:
+            raise IndexError(f"Page {page_num} out of range (document has {self.page_count} pages)")
+        width, height, first, count = _PAGE.unpack_from(self._map, _HEADER.size + _PAGE.size * page_num)
+        start = _HEADER.size + _PAGE.size * self.page_count + _WORD.size * first
+        data = self._map
+        words = []
+        for (x0, x1, top, bottom, doctop, upright, direction, offset, length,
+             extras_offset, extras_length) in _WORD.iter_unpack(data[start:start + _WORD.size * count]):
+            word = {
+                'text': data[offset:offset + length].decode('utf-8'),
+                'x0': x0, 'x1': x1, 'top': top, 'doctop': doctop, 'bottom': bottom,
+                'upright': bool(upright), 'height': bottom - top, 'width': x1 - x0,
+                'direction': DIRECTIONS[direction],
+            }
+            if extras_length:
+                word.update(ast.literal_eval(data[extras_offset:extras_offset + extras_length].decode('utf-8')))
+            words.append(word)
+        page = CachedPage(width, height, words)
+        self._pages[page_num] = page
+        return page
+
+    def close(self):
+        self._map.close()
+
+class ExtractedWords:
+    """Words held in memory, for extractions the file format cannot store"""
+
+    def __init__(self, pages: List[Tuple[float, float, List[Dict[str, Any]]]]):
+        self._pages = [CachedPage(*page) for page in pages]
+        self.page_count = len(self._pages)
+
+    def page(self, page_num: int) -> CachedPage:
+        if not 0 <= page_num < self.page_count:
+            raise IndexError(f"Page {page_num} out of range (document has {self.page_count} pages)")
+        return self._pages[page_num]
+
+    def close(self):
+        pass
+
+class WordCache:
+    """
+    Persistent cache of pdfplumber extract_words output.
+
+    Entries are keyed by the SHA-256 of the PDF bytes and the extraction
+    parameters, with every page of a document in one file. A miss extracts all
+    pages in a single pdfplumber pass; a hit maps the file and never opens the
+    PDF with pdfplumber. Files are written atomically, so concurrent analyses
+    can share the cache directory. Extra word keys (extra_attrs, return_chars)
+    are stored too; an extraction whose extras are not plain literals is only
+    kept in memory for this process.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.hits = 0
+        self.misses = 0
+        self._hashes: Dict[Tuple[str, int, int], str] = {}
+        self._files: Dict[str, WordFile] = {}
+
+    def content_hash(self, pdf_path: str) -> str:
+        stat = os.stat(pdf_path)
+        key = (os.path.abspath(pdf_path), stat.st_size, stat.st_mtime_ns)
+        if key not in self._hashes:
+            self._hashes[key] = hashlib.sha256(open_source(pdf_path).view()).hexdigest()
+        return self._hashes[key]
+
+    def cache_path(self, pdf_path: str, params: Dict[str, Any]) -> str:
+        return os.path.join(self.cache_dir, f"{self.content_hash(pdf_path)}-{params_key(params)}.words")
+
+    def document(self, pdf_path: str, **params):
+        """The cached words for every page of pdf_path, extracting them on a miss"""
+        path = self.cache_path(pdf_path, params)
+        if path in self._files:
+            self.hits += 1
+            return self._files[path]
+        word_file = self._open(path)
+        if word_file is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            pages = self._extract(pdf_path, params)
+            try:
+                data = encode_pages(pages)
+            except ValueError:
+                word_file = ExtractedWords(pages)
+            else:
+                self._write(path, data)
+                word_file = WordFile(path)
+        self._files[path] = word_file
+        return word_file
+
+    def page(self, pdf_path: str, page_num: int, **params) -> CachedPage:
+        return self.document(pdf_path, **params).page(page_num)
+
+    def extract_words(self, pdf_path: str, page_num: int, **params) -> List[Dict[str, Any]]:
+        """Drop-in for pdfplumber's page.extract_words(**params)"""
+        return self.page(pdf_path, page_num, **params).words
+
+    def _open(self, path: str) -> Optional[WordFile]:
+        # A file from an older format version counts as a miss and is rewritten
+        if not os.path.exists(path):
+            return None
+        try:
+            return WordFile(path)
+        except ValueError:
+            return None
+
+    def _extract(self, pdf_path: str, params: Dict[str, Any]) -> List[Tuple[float, float, List[Dict[str, Any]]]]:
+        with open_plumber(pdf_path) as pdf:
+            return [(float(page.width), float(page.height), page.extract_words(**params)) for page in pdf.pages]
+
+    def _write(self, path: str, data: bytes):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def close(self):
+        for word_file in self._files.values():
+            word_file.close()
+        self._files.clear()
+
+_default_cache: Optional[WordCache] = None
+
+def get_word_cache() -> WordCache:
+    """Process-wide cache in DEFAULT_CACHE_DIR"""
+    global _default_cache
+    if _default_cache is None:
+        _default_cache = WordCache()
+    return _default_cache
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Pre-extract or clear cached PDF page words')
+    parser.add_argument('pdfs', nargs='*', help='PDFs to extract into the cache')
+    parser.add_argument('--cache_dir', default=DEFAULT_CACHE_DIR)
+    parser.add_argument('--params', default='{}', help='extract_words keyword arguments as JSON')
+    parser.add_argument('--clear', action='store_true', help='Delete every cached file first')
+    args = parser.parse_args(argv)
+
+    if args.clear and os.path.isdir(args.cache_dir):
+        removed = 0
+        for name in os.listdir(args.cache_dir):
+            if name.endswith('.words'):
+                os.remove(os.path.join(args.cache_dir, name))
+                removed += 1
+        print(f"Removed {removed} cached files from {args.cache_dir}")
+
+    cache = WordCache(args.cache_dir)
+    params = json.loads(args.params)
+    for pdf_path in args.pdfs:
+        document = cache.document(pdf_path, **params)
+        words = sum(len(document.page(i).words) for i in range(document.page_count))
+        print(f"{pdf_path}: {document.page_count} pages, {words} words -> {cache.cache_path(pdf_path, params)}")
+    if args.pdfs:
+        print(f"Cache: {cache.hits} hits, {cache.misses} misses")
+    cache.close()
+
+if __name__ == '__main__':
+    main()